@@ -1,247 +1,8 @@
-from minizinc import Instance, Model, Solver
-import os
-import shutil
-import datetime
-import time
-import logging
-import json
-import re
-import math
 import sys
 
+# The manager and the solve helpers are shared with the interactive entry point
+from Main_MZN import MiniZinc_Mangager, WORKERS, get_solver_name, parse_instance_numbers
 
-TIMELIMIT = 300 # Secnonds
-
-class MiniZinc_Mangager:
-    def __init__(self,
-                solver='gecode',
-                solver_name=None,
-                instanse_path="Instances/Instances dzn Format/", 
-                model_path="Solvers/projectmodels"):
-        """
-        :param solver: the solver to be used; default is gecode
-        :param isntanse_path: the path to the instances parent directory
-        :param model_path: the path to the models parent directory
-        """
-        self.solver = solver
-        self.solver_name = solver_name
-
-        self.data_parent_directory = instanse_path
-        self.list_of_paths_of_dzn = sorted([f for f in os.listdir(self.data_parent_directory) if not f.startswith('.')])
-        
-        self.model_parent_directory = model_path
-        self.list_of_paths_of_models = sorted([f for f in os.listdir(self.model_parent_directory) if not f.startswith('.')])
-        # Create a mapping from input numbers to model paths
-        self.model_mapping = {f"{i+1:02}": model for i, model in enumerate(self.list_of_paths_of_models)}
-
-    def get_model_path(self, input_number):
-        """
-        Get the model path corresponding to the input number.
-        :param input_number: the input number as a string
-        :return: the model path
-        """
-        return self.model_mapping.get(input_number)
-
-    def create_model(self, path_to_model=None, data_instance_num: int=0):
-        """
-        :param path_to_model: path to the model file
-        :param data_instance: string of data; all the parameters define in that string with mzn rules
-        :return: the model instance for the provided data
-        """
-        self.selected_model_path = path_to_model
-        path_to_model = os.path.join(self.model_parent_directory, self.selected_model_path)
-        print(path_to_model)
-        self.model_instance = Model(path_to_model)
-        
-        path_to_dzn = os.path.join(self.data_parent_directory, self.list_of_paths_of_dzn[data_instance_num-1])
-        with open(path_to_dzn, 'r') as file:
-            dzn_file = file.read().replace('\n', '')
-
-        # Extract the number of couriers from the data
-        courier_string = dzn_file.split(";")[0]
-        match = re.search(r'\d+', courier_string)
-        self.couriers = None
-        if match:
-            self.couriers = int(match.group())
-
-        self.model_instance.add_string(dzn_file)
-
-        return self.model_instance
-
-    def solve_instance(self, model_instance=None):
-        """
-        :param model_instance: the created model with its data
-        :param solver: choice of solver; default is gecode
-        :return: the result of the solver
-        """
-        self.chosen_solver = self.solver
-        if model_instance == None:
-            self.solver = Solver.lookup(self.chosen_solver)
-            self.instance = Instance(self.solver, self.model_instance)
-            self.result = self.instance.solve(
-                                            timeout=datetime.timedelta(seconds=TIMELIMIT)) # , intermediate_solutions=True
-        else:
-            self.solver = Solver.lookup(self.chosen_solver)
-            self.instance = Instance(self.solver, model_instance)
-            self.result = self.instance.solve(
-                                            timeout=datetime.timedelta(seconds=TIMELIMIT)) # , intermediate_solutions=True
-        return self.result
-    
-    def found_courier_path(self):
-        """
-        Convert the path to a list of found routes for each courier.
-        """
-        if self.selected_model_path[:2] in ('01', '02', '03'):
-            self.solutions = self.result.solution
-            solution = self.solutions
-            sequences = solution.sequence
-            distribution_points = len(self.result.solution.sequence[0])
-            travel_route = []
-            for each_courier_sequence in sequences:
-                per_courier_path = [distribution_points]
-                per_courier_path.append(each_courier_sequence[per_courier_path[-1]-1])
-                while per_courier_path[-1] != distribution_points:
-                    per_courier_path.append(each_courier_sequence[per_courier_path[-1]-1])
-                travel_route.append(per_courier_path[1:-1])
-            return travel_route
-        elif self.selected_model_path[:2] in ('04', '05', '06'):
-            self.solutions = self.result.solution
-            solution = self.solutions
-            paths = solution.path
-            travel_route = []
-            distribution_points = len(paths)
-            for courier in range(1, self.couriers+1):
-                per_courier_path = [distribution_points]
-                per_courier_path.append(paths[distribution_points-1].index(courier)+1)
-                while per_courier_path[-1] != distribution_points:
-                    per_courier_path.append(paths[per_courier_path[-1]-1].index(courier)+1)
-                travel_route.append(per_courier_path[1:-1])
-            return travel_route
-        elif self.selected_model_path[:2] in ('07', '08', '09'):
-            self.solutions = self.result.solution
-            solution = self.solutions
-            sequences = solution.sequence
-            distribution_points = len(self.result.solution.sequence[0])
-            travel_route = []
-            for each_courier_sequence in sequences:
-                per_courier_path = [distribution_points]
-                per_courier_path.append(each_courier_sequence[per_courier_path[-1]-1])
-                while per_courier_path[-1] != distribution_points:
-                    per_courier_path.append(each_courier_sequence[per_courier_path[-1]-1])
-                travel_route.append(per_courier_path[1:-1])
-            return travel_route
-        elif self.selected_model_path[:2] in ('10', '11', '12', '13', '14', '15', '16'):
-            travel_route = []
-            for list_of_paths in self.result.solution.sequence:
-                per_courier_path = []
-                for point in list_of_paths:
-                    if point != 0:
-                        per_courier_path.append(point)
-                travel_route.append(per_courier_path[1:-1])
-            return travel_route
-    
-
-    def solution_to_dict(self, result=None, solution=None):
-        """
-        Convert a Solution object to a dictionary for JSON file.
-        """
-        if str(self.result.status) == 'UNSATISFIABLE' or str(self.result.status) == 'UNKNOWN':
-            return {f"{self.solver_name}":
-                    {
-                        "time": TIMELIMIT,
-                        "optimal": False,
-                        "obj": "N/A",
-                        "sol": []
-                    }}
-        elif str(self.result.status) == 'SATISFIED':
-            self.solutions = self.result.solution
-            solution = self.solutions
-            return {f"{self.solver_name}":
-                    {
-                        "time": TIMELIMIT,
-                        "optimal": False,
-                        "obj": solution.objective,
-                        "sol": self.found_courier_path() 
-                    }}
-        elif str(self.result.status) == 'OPTIMAL_SOLUTION':
-            self.solutions = self.result.solution
-            solution = self.solutions
-            return {f"{self.solver_name}":
-                    {
-                        "time": math.floor(self.result.statistics['solveTime'].total_seconds()),
-                        "optimal": True,
-                        "obj": solution.objective,
-                        "sol": self.found_courier_path()
-                    }}
-
-    def save_to_JSON(self, result, filename, parent_path="res/MiniZinc/", keep_prev=False):
-        """
-        :param result: the result of the model; either terminated before 300 or at 300
-        :return: a JSON file containing the result
-        """
-        path_to_file = os.path.join(parent_path, f"{filename}.json")
-        directory = os.path.dirname(path_to_file)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-
-        if keep_prev and os.path.exists(path_to_file):
-            with open(path_to_file, 'r') as json_file:
-                existing_data = json.load(json_file)
-            if isinstance(existing_data, dict):
-                existing_data.update(result)
-            else:
-                existing_data = result
-        else:
-            existing_data = result
-
-        with open(path_to_file, 'w') as json_file:
-            json.dump(existing_data, json_file, indent=4)
-
-
-    def __str__(self):
-        pass
-
-
-def project_result_generator(inst_range, model_path, one_instance=False):
-    minizinc_manager = MiniZinc_Mangager()
-    
-    if one_instance:
-        inst_num = inst_range
-        print("\nInstance Number: ", inst_num, " for model: ", model_path)
-        solver = model_path.split('-')[-1]
-        solver, solver_name = get_solver_name(solver)
-        model_name = model_path
-        
-        minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=model_name)
-        model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=inst_num)
-        result = minizinc_manager.solve_instance(model_instance=model_instance)
-        sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
-        minizinc_manager.save_to_JSON(sol_dict, filename=inst_num, parent_path='Results/mzn', keep_prev=True)
-    else:
-        for inst_num in inst_range:
-            print("Instance Number: ", inst_num, " for model: ", model_path)
-
-            solver = model_path.split('-')[-1]
-            solver, solver_name = get_solver_name(solver)
-            model_name = model_path
-            
-            minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=model_name)
-            model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=inst_num)
-            result = minizinc_manager.solve_instance(model_instance=model_instance)
-            sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
-            minizinc_manager.save_to_JSON(sol_dict, filename=inst_num, parent_path='Results/mzn', keep_prev=True)
-
-def get_solver_name(solver):
-            solver_mapping = {
-                ' GECODE.mzn': ('gecode', 'gecode'),
-                ' GECODE WITHOUT SYM.mzn': ('gecode', 'gecode without sym'),
-                ' GECODE WITHOUT RAR.mzn': ('gecode', 'gecode without rar'),
-                ' CHUFFED.mzn': ('chuffed', 'chuffed'),
-                ' ORTOOLS.mzn': ('cp-sat', 'cp-sat'),
-                ' ORTOOLS CP.mzn': ('cp', 'cp'),
-                ' GUROBI.mzn': ('gurobi', 'Gurobi') # Gurobi is not available 
-            }
-            return solver_mapping.get(solver, (None, None))
 
 def main():
 
@@ -251,10 +12,20 @@ def main():
         print("Usage: python Main_MZN.py \"1:4-01\"")
         print("Example: '1:4-01' runs model 01 on instances 1, 2, 3, 4.")
         print("         '1,3-01' runs model 01 on instances 1 and 3.")
+        print("         '5-10+11+12' races models 10, 11 and 12 on instance 5.")
+        print("         '11:21-lns' solves instances 11 to 21 with the LNS engine.")
+        print("         '11:21-dec' solves instances 11 to 21 cluster-first, route-second.")
+        print("         '1:21-auto' picks the model for every instance from the results history.")
         print("         'all-all' runs all models on all instances.")
+        print("         'all-queue' does the same through a persistent job queue, which resumes after a crash.")
+        print("An optional second argument sets the number of concurrent solves for '-all' and '-queue' runs")
+        print("and the number of search processes for '-lns' and '-dec' runs.")
+        print("An optional third argument gives '-all' runs one wall-clock budget in seconds, shared among the jobs.")
         sys.exit(1)
 
     instance_method = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else WORKERS
+    budget = float(sys.argv[3]) if len(sys.argv) > 3 else None
 
     # Initialization
     minizinc_manager = MiniZinc_Mangager()
@@ -262,6 +33,45 @@ def main():
     input_list = instance_method.split('-')
     model_number = input_list[1]
 
+    if model_number.lower() == 'lns':
+        # '11:21-lns' solves instances 11 to 21 with the LNS engine instead of MiniZinc
+        from lns_engine import run_lns
+
+        run_lns(parse_instance_numbers(input_list[0]), workers=workers)
+        return
+
+    if model_number.lower() == 'auto':
+        # '11:21-auto' picks the model for every instance from its features and the results history
+        from model_selector import run_auto
+
+        run_auto(parse_instance_numbers(input_list[0]))
+        return
+
+    if model_number.lower() == 'queue':
+        # '1:21-queue' runs all models through the persistent job queue; the same command resumes an interrupted run
+        from job_queue import run_queue
+
+        jobs = [(inst_num, model_path) for model_path in minizinc_manager.list_of_paths_of_models
+                for inst_num in parse_instance_numbers(input_list[0])]
+        run_queue(jobs, workers=workers)
+        return
+
+    if model_number.lower() == 'dec':
+        # '11:21-dec' solves instances 11 to 21 cluster-first, route-second
+        from decomposition import run_decomposition
+
+        run_decomposition(parse_instance_numbers(input_list[0]), workers=workers)
+        return
+
+    if '+' in model_number:
+        # '5-10+11+12' races models 10, 11 and 12 on instance 5
+        from portfolio import run_portfolio
+
+        model_paths = [minizinc_manager.get_model_path(number) for number in model_number.split('+')]
+        for inst_num in parse_instance_numbers(input_list[0]):
+            run_portfolio(inst_num, model_paths)
+        return
+
     if model_number.lower() == 'all':
         if input_list[0] == 'all':
             instance_number = list(range(1, 22))
@@ -280,9 +90,21 @@ def main():
             instance_number = list(map(int, input_list[0].split(',')))
             one_instance = False
 
-        for model_path in minizinc_manager.list_of_paths_of_models:
-            project_result_generator(instance_number, model_path, one_instance=one_instance)
+        from batch_runner import BatchRunner
+
+        if one_instance:
+            instance_number = [instance_number]
+        jobs = [(inst_num, model_path) for model_path in minizinc_manager.list_of_paths_of_models
+                                        for inst_num in instance_number]
+        if budget is not None:
+            from budget_scheduler import Budget_Scheduler
+
+            Budget_Scheduler(budget, workers=workers).run(jobs)
+        else:
+            BatchRunner(workers=workers).run(jobs)
     else:
+        from resources import solve_job_seeded
+
         model_path = minizinc_manager.get_model_path(model_number)
         solver = model_path.split('-')[-1]
         
@@ -302,28 +124,20 @@ def main():
             instance_number = list(map(int, input_list[0].split(',')))
 
         if instance_method == '1':
-            minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=solver_name)
             print("\nSolving Instance ", instance_number)
-            model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=instance_number)
-            result = minizinc_manager.solve_instance(model_instance=model_instance)
-            sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
-            minizinc_manager.save_to_JSON(sol_dict, filename=instance_number)
+            # One instance at a time gets every core: solver threads or seed copies, see resources.py
+            sol_dict, seed = solve_job_seeded(instance_number, model_path, solver_name=solver_name)
+            minizinc_manager.save_to_JSON(sol_dict, filename=instance_number, seed=seed)
         elif instance_method == '2':
             for inst_num in range(instance_number[0], instance_number[1]+1):
                 print("\nSolving Instance ", inst_num)
-                minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=solver_name)
-                model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=inst_num)
-                result = minizinc_manager.solve_instance(model_instance=model_instance)
-                sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
-                minizinc_manager.save_to_JSON(sol_dict, filename=inst_num)
+                sol_dict, seed = solve_job_seeded(inst_num, model_path, solver_name=solver_name)
+                minizinc_manager.save_to_JSON(sol_dict, filename=inst_num, seed=seed)
         elif instance_method == '3':
             for inst_num in instance_number:
                 print("\nSolving Instance ", inst_num)
-                minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=solver_name)
-                model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=inst_num)
-                result = minizinc_manager.solve_instance(model_instance=model_instance)
-                sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
-                minizinc_manager.save_to_JSON(sol_dict, filename=inst_num)
+                sol_dict, seed = solve_job_seeded(inst_num, model_path, solver_name=solver_name)
+                minizinc_manager.save_to_JSON(sol_dict, filename=inst_num, seed=seed)
             
 
 if __name__ == "__main__":
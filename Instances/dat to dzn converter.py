@@ -1,69 +1,49 @@
-#### This script is used to convert the .dat files to .dzn files
-import os 
+#### This script is used to convert the .dat files to .dzn files, and to the binary format loaded by memory mapping
+# Run from the repository root: python "Instances/dat to dzn converter.py" [--force]
+import os
+import sys
 
-# Read the .dat file from the given path to it; Modify it and return it
-def retrieve_dat_from_path(path_to_dat):
-    """
-    :param path_to_dat: It is the path pointing to a dat file
-    :return: we return the modified information
-    """
-    with open(path_to_dat, 'r') as file:
-        dzn_file = file.read()
-    return dzn_file.splitlines()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instance_loader import DAT_PATH, DZN_PATH, BINARY_PATH, read_instance
 
-def list_of_paths_of_dat():
-    return sorted(os.listdir('Instances/Instances dat Format'))
 
+def list_of_paths_of_dat(parent_path_to_dat=DAT_PATH):
+    return sorted([f for f in os.listdir(parent_path_to_dat) if not f.startswith('.')])
 
-# Defining a function that gets dat list and writes it to dzn file and saves it
-def write_to_dzn_file(dat_info_list, path_to_save):
-    with open(path_to_save, 'w') as file:
-        first_time_flag = True
-        for index, line in enumerate(dat_info_list):
-            if index == 0:
-                # Number of couriers
-                file.write("num_courier = " + line + ";\n")
-            elif index == 1:
-                # Number of items
-                file.write("num_item = " + line + ";\n")
-            elif index == 2:
-                # Courier capacity
-                string_of_capacity_with_comma = ""
-                for each_capacity in range(len(line.split(" ")) - 1):
-                    string_of_capacity_with_comma += line.split(" ")[each_capacity] + ", "
-                string_of_capacity_with_comma += line.split(" ")[-1]
-                file.write("courier_capacity = [" + string_of_capacity_with_comma + "];\n")
-            elif index == 3:
-                # Item size
-                string_of_weight_with_comma = ""
-                for each_weight in range(len(line.split(" ")) - 1):
-                    string_of_weight_with_comma += line.split(" ")[each_weight] + ", "
-                string_of_weight_with_comma += line.split(" ")[-1]
-                file.write("item_size = [" + string_of_weight_with_comma + "];\n")
-            elif index >= 4 and index < 4 + int(dat_info_list[1]):
-                # Distance Matrix
-                if first_time_flag:
-                    first_time_flag = False
-                    file.write("distance_mat = [")
-                string_of_value_with_comma = ""
-                for each_value in range(len(line.split(" ")) - 1):
-                    string_of_value_with_comma += line.split(" ")[each_value] + ", "
-                file.write("| " + string_of_value_with_comma + "\n")
-            else:
-                string_of_value_with_comma = ""
-                for each_value in range(len(line.split(" ")) - 1):
-                    string_of_value_with_comma += line.split(" ")[each_value] + ", "
-                file.write("| " + string_of_value_with_comma + "\n")
-                file.write("|];\n")
-            
 
-# Getting path to dat instances
-list_of_paths_of_dat = list_of_paths_of_dat()  
-
-parent_path_to_dat = "Instances/Instances dat Format/"
-saving_path_to_dzn = "Instances/Instances dzn Format/"
+def is_stale(path_to_source, path_to_target):
+    """
+    :return: True if the target is missing or older than the source it is converted from
+    """
+    return not os.path.exists(path_to_target) or os.path.getmtime(path_to_target) < os.path.getmtime(path_to_source)
 
-for index, each_dat in enumerate(list_of_paths_of_dat):
-    list_of_each_dat_info = retrieve_dat_from_path(parent_path_to_dat+each_dat)
-    write_to_dzn_file(list_of_each_dat_info, saving_path_to_dzn+f"Instance{str(index+1).zfill(2)}.dzn")
 
+def convert(path_to_dat, path_to_dzn, path_to_binary, force=False):
+    """
+    Convert one .dat file, writing only the outputs that are out of date.
+    :return: the number of files written
+    """
+    targets = [(path, writer) for path, writer in ((path_to_dzn, "to_dzn"), (path_to_binary, "to_binary"))
+               if force or is_stale(path_to_dat, path)]
+    if not targets:
+        return 0
+    instance = read_instance(path_to_dat)
+    for path, writer in targets:
+        # Written under a temporary name, so an interrupted run never leaves a half file that looks up to date
+        getattr(instance, writer)(path + ".tmp")
+        os.replace(path + ".tmp", path)
+    return len(targets)
+
+
+def convert_all(force=False):
+    os.makedirs(BINARY_PATH, exist_ok=True)
+    written = 0
+    for index, each_dat in enumerate(list_of_paths_of_dat()):
+        name = f"Instance{str(index+1).zfill(2)}"
+        written += convert(os.path.join(DAT_PATH, each_dat), os.path.join(DZN_PATH, f"{name}.dzn"),
+                           os.path.join(BINARY_PATH, f"{name}.mcpb"), force=force)
+    print(f"Wrote {written} files; the others were up to date")
+
+
+if __name__ == "__main__":
+    convert_all(force="--force" in sys.argv[1:])
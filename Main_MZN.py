@@ -1,4 +1,5 @@
-from minizinc import Instance, Model, Solver
+from minizinc import Instance, Result, Status
+import asyncio
 import os
 import shutil
 import datetime
@@ -7,28 +8,53 @@ import logging
 import json
 import re
 import math
+import hashlib
+
+from instance_loader import load_instance
+from warm_start import supports_warm_start
+from bounds import compute_bounds, greedy_solution
+from results_store import Results_Store
+from instrumentation import Instrumentation
+from minizinc_session import get_session
+from model_registry import get_decoder, model_metadata
+from preprocessing import preprocess, analysis_data
 
 TIMELIMIT = 300 # Secnonds
+WORKERS = os.cpu_count() or 1 # Concurrent solves for batch runs
 
 class MiniZinc_Mangager:
     def __init__(self,
                 solver='gecode',
                 solver_name=None,
                 instanse_path="Instances/Instances dzn Format/", 
-                model_path="Solvers/projectmodels"):
+                model_path="Solvers/projectmodels",
+                profile_hook=None,
+                time_limit=TIMELIMIT,
+                processes=None):
         """
         :param solver: the solver to be used; default is gecode
         :param isntanse_path: the path to the instances parent directory
         :param model_path: the path to the models parent directory
+        :param profile_hook: optional context manager factory wrapped around every timed phase
+        :param time_limit: seconds the solver may run; a budget scheduler hands out less than TIMELIMIT
+        :param processes: threads the solver may use; None leaves it to the solver's default of one
         """
         self.solver = solver
+        self.time_limit = time_limit
+        self.processes = processes
         self.solver_name = solver_name
+        self.profile_hook = profile_hook
+        self.instrumentation = Instrumentation(profile_hook)
+
+        # Directory listings, solver configurations and parsed models are shared by all managers of the process
+        self.session = get_session()
+        self.branch_key = None
 
         self.data_parent_directory = instanse_path
-        self.list_of_paths_of_dzn = sorted([f for f in os.listdir(self.data_parent_directory) if not f.startswith('.')])
+        self.list_of_paths_of_dzn = self.session.list_directory(self.data_parent_directory)
         
         self.model_parent_directory = model_path
-        self.list_of_paths_of_models = sorted([f for f in os.listdir(self.model_parent_directory) if not f.startswith('.')])
+        self.list_of_paths_of_models = self.session.list_directory(self.model_parent_directory)
         # Create a mapping from input numbers to model paths
         self.model_mapping = {f"{i+1:02}": model for i, model in enumerate(self.list_of_paths_of_models)}
 
@@ -40,113 +66,253 @@ class MiniZinc_Mangager:
         """
         return self.model_mapping.get(input_number)
 
-    def create_model(self, path_to_model=None, data_instance_num: int=0):
+    def create_model(self, path_to_model=None, data_instance_num: int=0, warm_start=False, mcp_instance=None,
+                     warm_solution=None, break_symmetry=True):
         """
         :param path_to_model: path to the model file
-        :param data_instance: string of data; all the parameters define in that string with mzn rules
+        :param data_instance_num: the instance number; its parameters are parsed once and assigned directly
+        :param warm_start: run the greedy constructor first and pass its result as bound and warm start
+        :param mcp_instance: an MCP_Instance to solve instead of an instance file, e.g. a re-planned one
+        :param warm_solution: a known solution ('obj', 'sol', 'bin') to use as bound and warm start instead
+        :param break_symmetry: pass the symmetry findings; without them no solution is excluded,
+                               which constraints added afterwards may rely on
         :return: the model instance for the provided data
         """
+        # Every model gets a fresh set of phase timings
+        self.instrumentation = Instrumentation(self.profile_hook)
         self.selected_model_path = path_to_model
         path_to_model = os.path.join(self.model_parent_directory, self.selected_model_path)
         print(path_to_model)
-        self.model_instance = Model(path_to_model)
+        with self.instrumentation.phase("model"):
+            # A branch of the model parsed once per process; only this job's data is added to it
+            self.branch_key, self.model_instance = self.session.branch(self.solver, path_to_model)
+            # The decoder comes from the '@family' the model declares
+            self.decoder = get_decoder(path_to_model)
         
-        path_to_dzn = os.path.join(self.data_parent_directory, self.list_of_paths_of_dzn[data_instance_num-1])
-        with open(path_to_dzn, 'r') as file:
-            dzn_file = file.read().replace('\n', '')
+        with self.instrumentation.phase("data"):
+            if mcp_instance is None:
+                path_to_dzn = os.path.join(self.data_parent_directory, self.list_of_paths_of_dzn[data_instance_num-1])
+                mcp_instance = load_instance(path_to_dzn)
+            self.mcp_instance = mcp_instance
+            self.couriers = self.mcp_instance.num_courier
+
+            # Passed to MiniZinc as a .dzn file: the instance's own, or one streamed to disk once per instance
+            self.session.add_data_file(self.model_instance, self.mcp_instance.data_file())
+            self.model_file = path_to_model
+            self.data_string = self.mcp_instance.content_hash()
 
-        # Extract the number of couriers from the data
-        courier_string = dzn_file.split(";")[0]
-        match = re.search(r'\d+', courier_string)
-        self.couriers = None
-        if match:
-            self.couriers = int(match.group())
+        with self.instrumentation.phase("preprocessing"):
+            # Metric and symmetry findings, for the models that declare them with '@analysis'
+            declared = model_metadata(self.model_file).get("analysis")
+            if declared:
+                analysis = preprocess(self.mcp_instance)
+                names = [name.strip() for name in declared.split(',')]
+                for name, value in analysis_data(analysis, names, symmetry=break_symmetry).items():
+                    self.model_instance[name] = value
+                # Without the symmetry findings the model flattens differently
+                self.data_string += f"symmetry:{break_symmetry}"
 
-        self.model_instance.add_string(dzn_file)
+        with self.instrumentation.phase("bounds"):
+            # Objective bounds are computed once per instance and passed as data, replacing weaker in-model ones
+            self.bounds = compute_bounds(self.mcp_instance)
+            self.model_instance["lb_data"] = self.bounds["lb"]
+            print("Objective lower bound: ", self.bounds["lb"])
+
+            self.warm_solution = None
+            if warm_start or warm_solution is not None:
+                self.apply_warm_start(warm_solution)
+            else:
+                self.model_instance["ub_data"] = self.bounds["ub"]
+                if supports_warm_start(self.model_file):
+                    self.model_instance["warm_bin"] = []
 
         return self.model_instance
 
-    def solve_instance(self, model_instance=None):
+    def add_code(self, code, **data):
+        """
+        Add MiniZinc code, e.g. extra constraints, to the model instance with the data it declares.
+        Both are part of the FlatZinc cache key.
+        :param code: the MiniZinc code
+        :param data: values of the parameters the code declares
+        """
+        self.session.add_code(self.model_instance, code)
+        for name, value in data.items():
+            self.model_instance[name] = value
+        code_hash = hashlib.sha256((code + json.dumps(data, sort_keys=True)).encode()).hexdigest()
+        self.data_string += f"code:{code_hash}"
+
+    def apply_warm_start(self, warm_solution=None):
+        """
+        Bound the objective by a greedy solution and hint its assignment where the model supports it.
+        :param warm_solution: a known solution to use instead of the greedy one
+        :return: the warm start solution, or None if the constructor found none
+        """
+        self.warm_solution = warm_solution if warm_solution is not None else greedy_solution(self.mcp_instance)
+        warm_bin = []
+        ub = self.bounds["ub"]
+        if self.warm_solution is not None:
+            print("Warm start objective: ", self.warm_solution["obj"])
+            ub = self.warm_solution["obj"]
+            warm_bin = self.warm_solution["bin"]
+        self.model_instance["ub_data"] = ub
+        if supports_warm_start(self.model_file):
+            self.model_instance["warm_bin"] = warm_bin
+        # The bound and the hinted assignment are both flattened into the model, so both are part of the cache key
+        warm_hash = hashlib.sha256(json.dumps([int(ub), [int(b) for b in warm_bin]]).encode()).hexdigest()
+        self.data_string += f"warm:{warm_hash}"
+        return self.warm_solution
+
+    def solve_instance(self, model_instance=None, cache=None, random_seed=None):
         """
         :param model_instance: the created model with its data
         :param solver: choice of solver; default is gecode
+        :param cache: a FlatZinc_Cache; when given, the flattened model is reused across runs
+        :param random_seed: seed passed to the solver
         :return: the result of the solver
         """
         self.chosen_solver = self.solver
-        if model_instance == None:
-            self.solver = Solver.lookup(self.chosen_solver)
-            self.instance = Instance(self.solver, self.model_instance)
-            self.result = self.instance.solve(
-                                            timeout=datetime.timedelta(seconds=TIMELIMIT)) # , intermediate_solutions=True
-        else:
-            self.solver = Solver.lookup(self.chosen_solver)
-            self.instance = Instance(self.solver, model_instance)
-            self.result = self.instance.solve(
-                                            timeout=datetime.timedelta(seconds=TIMELIMIT)) # , intermediate_solutions=True
+        with self.instrumentation.phase("solver_lookup"):
+            self.solver = self.session.lookup(self.chosen_solver)
+        self.instance = self.as_instance(model_instance)
+        try:
+            if cache is not None:
+                with self.instrumentation.phase("flatten"):
+                    key = cache.key(self.model_file, self.data_string, self.solver)
+                    fzn_path, ozn_path = cache.compile(self.instance, key)
+                with self.instrumentation.phase("solve"):
+                    self.result = cache.solve(fzn_path, ozn_path, self.solver, self.time_limit,
+                                              processes=self.processes, random_seed=random_seed)
+            else:
+                # Flattening happens inside solve(); the flatTime counter separates it
+                with self.instrumentation.phase("solve"):
+                    self.result = self.instance.solve(
+                                            timeout=datetime.timedelta(seconds=self.time_limit),
+                                            processes=self.processes, random_seed=random_seed) # , intermediate_solutions=True
+        finally:
+            self.session.release(self.branch_key)
+        self.instrumentation.record_statistics(self.result.statistics)
         return self.result
+
+    def as_instance(self, model_instance=None):
+        """
+        :param model_instance: a branch from create_model, or a plain Model; default is the created one
+        :return: an Instance ready to solve
+        """
+        if model_instance is None:
+            model_instance = self.model_instance
+        if isinstance(model_instance, Instance):
+            return model_instance
+        return Instance(self.solver, model_instance)
     
-    def found_courier_path(self):
+    def found_courier_path(self, solution=None):
         """
         Convert the path to a list of found routes for each courier.
+        :param solution: the solution to decode; default is the solution of the last result
         """
-        if self.selected_model_path[:2] in ('01', '02', '03'):
-            self.solutions = self.result.solution
-            solution = self.solutions
-            sequences = solution.sequence
-            distribution_points = len(self.result.solution.sequence[0])
-            travel_route = []
-            for each_courier_sequence in sequences:
-                per_courier_path = [distribution_points]
-                per_courier_path.append(each_courier_sequence[per_courier_path[-1]-1])
-                while per_courier_path[-1] != distribution_points:
-                    per_courier_path.append(each_courier_sequence[per_courier_path[-1]-1])
-                travel_route.append(per_courier_path[1:-1])
-            return travel_route
-        elif self.selected_model_path[:2] in ('04', '05', '06'):
+        if solution is None:
             self.solutions = self.result.solution
             solution = self.solutions
-            paths = solution.path
-            travel_route = []
-            distribution_points = len(paths)
-            for courier in range(1, self.couriers+1):
-                per_courier_path = [distribution_points]
-                per_courier_path.append(paths[distribution_points-1].index(courier)+1)
-                while per_courier_path[-1] != distribution_points:
-                    per_courier_path.append(paths[per_courier_path[-1]-1].index(courier)+1)
-                travel_route.append(per_courier_path[1:-1])
-            return travel_route
-        elif self.selected_model_path[:2] in ('07', '08', '09'):
-            self.solutions = self.result.solution
-            solution = self.solutions
-            sequences = solution.sequence
-            distribution_points = len(self.result.solution.sequence[0])
-            travel_route = []
-            for each_courier_sequence in sequences:
-                per_courier_path = [distribution_points]
-                per_courier_path.append(each_courier_sequence[per_courier_path[-1]-1])
-                while per_courier_path[-1] != distribution_points:
-                    per_courier_path.append(each_courier_sequence[per_courier_path[-1]-1])
-                travel_route.append(per_courier_path[1:-1])
-            return travel_route
-        elif self.selected_model_path[:2] in ('10', '11', '12', '13', '14', '15', '16'):
-            travel_route = []
-            for list_of_paths in self.result.solution.sequence:
-                per_courier_path = []
-                for point in list_of_paths:
-                    if point != 0:
-                        per_courier_path.append(point)
-                travel_route.append(per_courier_path[1:-1])
-            return travel_route
-    
+        with self.instrumentation.phase("decode"):
+            return self.decoder(solution, self.couriers)
+
+    async def solve_instance_async(self, model_instance=None, stall_timeout=None, random_seed=None, on_solution=None):
+        """
+        Solve through the asynchronous MiniZinc API, recording every improving solution.
+        :param model_instance: the created model with its data
+        :param stall_timeout: stop early when no better solution is found for this many seconds;
+                              default is None, which always runs until the time limit
+        :param random_seed: seed passed to the solver, for repeatable benchmark runs
+        :param on_solution: called with every new trajectory entry, e.g. to stream incumbents
+        :return: the final result; the anytime trajectory is kept in self.trajectory
+        """
+        self.chosen_solver = self.solver
+        with self.instrumentation.phase("solver_lookup"):
+            self.solver = self.session.lookup(self.chosen_solver)
+        self.instance = self.as_instance(model_instance)
+
+        self.trajectory = []
+        status, solution, statistics = Status.UNKNOWN, None, {}
+        start = time.perf_counter()
+        # Includes decoding the intermediate solutions, which is also timed on its own as 'decode'
+        with self.instrumentation.phase("solve"):
+            stream = self.instance.solutions(time_limit=datetime.timedelta(seconds=self.time_limit),
+                                             intermediate_solutions=True, processes=self.processes,
+                                             random_seed=random_seed)
+            try:
+                while True:
+                    # The stall clock only starts once there is an incumbent
+                    wait = stall_timeout if self.trajectory else None
+                    try:
+                        result = await asyncio.wait_for(stream.__anext__(), wait)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        print(f"No improvement in {stall_timeout}s, stopping early")
+                        break
+                    status = result.status
+                    statistics.update(result.statistics)
+                    if result.solution is not None:
+                        solution = result.solution
+                        elapsed = result.statistics.get('time')
+                        self.trajectory.append({
+                            "time": elapsed.total_seconds() if elapsed is not None else time.perf_counter() - start,
+                            "obj": solution.objective,
+                            "sol": self.found_courier_path(solution)
+                        })
+                        if on_solution is not None:
+                            on_solution(self.trajectory[-1])
+            finally:
+                await stream.aclose()
+                self.session.release(self.branch_key)
+        self.instrumentation.record_statistics(statistics)
+
+        if status == Status.UNKNOWN and solution is not None:
+            status = Status.SATISFIED
+        self.result = Result(status, solution, statistics)
+        return self.result
+
+    def solve_instance_anytime(self, model_instance=None, stall_timeout=None, random_seed=None):
+        """
+        Blocking wrapper around solve_instance_async.
+        """
+        return asyncio.run(self.solve_instance_async(model_instance=model_instance, stall_timeout=stall_timeout,
+                                                     random_seed=random_seed))
+
+    def trajectory_to_dict(self):
+        """
+        Convert the anytime trajectory of the last solve to a dictionary for JSON file.
+        """
+        return {f"{self.solver_name}":
+                {
+                    "status": str(self.result.status),
+                    "trajectory": self.trajectory
+                }}
+
+    def instrumentation_to_dict(self):
+        """
+        Convert the phase timings and solver counters of the last solve to a dictionary for JSON file.
+        """
+        return {f"{self.solver_name}": self.instrumentation.to_record()}
 
     def solution_to_dict(self, result=None, solution=None):
         """
         Convert a Solution object to a dictionary for JSON file.
+        Runs that did not prove optimality record the time limit they were given.
         """
-        if str(self.result.status) == 'UNSATISFIABLE' or str(self.result.status) == 'UNKNOWN':
+        if (str(self.result.status) == 'UNSATISFIABLE' or str(self.result.status) == 'UNKNOWN') \
+                and getattr(self, 'warm_solution', None) is not None:
+            # The solver found nothing within the warm start bound; the warm start itself is the best known
+            return {f"{self.solver_name}":
+                    {
+                        "time": math.floor(self.time_limit),
+                        "optimal": False,
+                        "obj": self.warm_solution["obj"],
+                        "sol": self.warm_solution["sol"]
+                    }}
+        elif str(self.result.status) == 'UNSATISFIABLE' or str(self.result.status) == 'UNKNOWN':
             return {f"{self.solver_name}":
                     {
-                        "time": TIMELIMIT,
+                        "time": math.floor(self.time_limit),
                         "optimal": False,
                         "obj": "N/A",
                         "sol": []
@@ -156,7 +322,7 @@ class MiniZinc_Mangager:
             solution = self.solutions
             return {f"{self.solver_name}":
                     {
-                        "time": TIMELIMIT,
+                        "time": math.floor(self.time_limit),
                         "optimal": False,
                         "obj": solution.objective,
                         "sol": self.found_courier_path() 
@@ -172,63 +338,116 @@ class MiniZinc_Mangager:
                         "sol": self.found_courier_path()
                     }}
 
-    def save_to_JSON(self, result, filename, parent_path="res/MiniZinc/", keep_prev=False):
+    def save_to_JSON(self, result, filename, parent_path="res/MiniZinc/", keep_prev=False, seed=None):
         """
         :param result: the result of the model; either terminated before 300 or at 300
-        :return: a JSON file containing the result
+        :param keep_prev: keep the records of other models in the file
+        :param seed: the random seed of the run, stored next to the result
+        :return: a JSON file containing the result, exported from the results store
         """
-        path_to_file = os.path.join(parent_path, f"{filename}.json")
-        directory = os.path.dirname(path_to_file)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-
-        if keep_prev and os.path.exists(path_to_file):
-            with open(path_to_file, 'r') as json_file:
-                existing_data = json.load(json_file)
-            if isinstance(existing_data, dict):
-                existing_data.update(result)
-            else:
-                existing_data = result
-        else:
-            existing_data = result
-
-        with open(path_to_file, 'w') as json_file:
-            json.dump(existing_data, json_file, indent=4)
+        # One store per manager, so a batch saves all its results under one run id
+        if getattr(self, 'results_store', None) is None:
+            self.results_store = Results_Store()
+        solvers = {model: get_solver_name(model.split('-')[-1])[0] or model for model in result}
+        self.results_store.save(result, filename, parent_path, keep_prev=keep_prev, solvers=solvers, seed=seed)
 
 
     def __str__(self):
         pass
 
 
+def solve_job(inst_num, model_path, use_cache=False, warm_start=False, instrumentation_path=None, time_limit=TIMELIMIT,
+              instanse_path="Instances/Instances dzn Format/", processes=None, random_seed=None):
+    """
+    Solve one (instance, model) pair; shared by the serial and the batch runners.
+    :param inst_num: the instance number
+    :param model_path: the model file name inside the models directory
+    :param use_cache: reuse the flattened FlatZinc from the on-disk cache
+    :param warm_start: bound and hint the solver with the greedy constructor
+    :param instrumentation_path: when given, save the phase timings and solver counters there
+    :param time_limit: seconds the solver may run
+    :param instanse_path: the path to the instances parent directory
+    :param processes: threads the solver may use
+    :param random_seed: seed passed to the solver
+    :return: the result dictionary ready for save_to_JSON
+    """
+    solver = model_path.split('-')[-1]
+    solver, solver_name = get_solver_name(solver)
+    model_name = model_path
+
+    minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=model_name, instanse_path=instanse_path,
+                                         time_limit=time_limit, processes=processes)
+    model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=inst_num,
+                                                   warm_start=warm_start)
+    cache = None
+    if use_cache:
+        from flatzinc_cache import FlatZinc_Cache
+        cache = FlatZinc_Cache()
+    result = minizinc_manager.solve_instance(model_instance=model_instance, cache=cache, random_seed=random_seed)
+    sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
+    if instrumentation_path is not None:
+        minizinc_manager.save_to_JSON(minizinc_manager.instrumentation_to_dict(), filename=inst_num,
+                                      parent_path=instrumentation_path, keep_prev=True)
+    return sol_dict
+
+def solve_job_anytime(inst_num, model_path, stall_timeout=None, warm_start=False, random_seed=None,
+                      instrumentation_path=None, time_limit=TIMELIMIT, instanse_path="Instances/Instances dzn Format/",
+                      processes=None):
+    """
+    Same as solve_job, but streams the solutions and also returns the anytime trajectory.
+    :param stall_timeout: stop early when the incumbent has not improved for this many seconds
+    :param warm_start: bound and hint the solver with the greedy constructor
+    :param random_seed: seed passed to the solver
+    :param instrumentation_path: when given, save the phase timings and solver counters there
+    :param time_limit: seconds the solver may run
+    :param instanse_path: the path to the instances parent directory
+    :param processes: threads the solver may use
+    :return: the result dictionary and the trajectory dictionary, both ready for save_to_JSON
+    """
+    solver = model_path.split('-')[-1]
+    solver, solver_name = get_solver_name(solver)
+    model_name = model_path
+
+    minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=model_name, instanse_path=instanse_path,
+                                         time_limit=time_limit, processes=processes)
+    model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=inst_num,
+                                                   warm_start=warm_start)
+    result = minizinc_manager.solve_instance_anytime(model_instance=model_instance, stall_timeout=stall_timeout,
+                                                     random_seed=random_seed)
+    sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
+    if instrumentation_path is not None:
+        minizinc_manager.save_to_JSON(minizinc_manager.instrumentation_to_dict(), filename=inst_num,
+                                      parent_path=instrumentation_path, keep_prev=True)
+    return sol_dict, minizinc_manager.trajectory_to_dict()
+
 def project_result_generator(inst_range, model_path, one_instance=False):
     minizinc_manager = MiniZinc_Mangager()
     
     if one_instance:
         inst_num = inst_range
         print("\nInstance Number: ", inst_num, " for model: ", model_path)
-        solver = model_path.split('-')[-1]
-        solver, solver_name = get_solver_name(solver)
-        model_name = model_path
-        
-        minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=model_name)
-        model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=inst_num)
-        result = minizinc_manager.solve_instance(model_instance=model_instance)
-        sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
+        sol_dict = solve_job(inst_num, model_path, instrumentation_path='Results/mzn/instrumentation')
         minizinc_manager.save_to_JSON(sol_dict, filename=inst_num, parent_path='Results/mzn', keep_prev=True)
     else:
         for inst_num in inst_range:
             print("Instance Number: ", inst_num, " for model: ", model_path)
-
-            solver = model_path.split('-')[-1]
-            solver, solver_name = get_solver_name(solver)
-            model_name = model_path
-            
-            minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=model_name)
-            model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=inst_num)
-            result = minizinc_manager.solve_instance(model_instance=model_instance)
-            sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
+            sol_dict = solve_job(inst_num, model_path, instrumentation_path='Results/mzn/instrumentation')
             minizinc_manager.save_to_JSON(sol_dict, filename=inst_num, parent_path='Results/mzn', keep_prev=True)
 
+def parse_instance_numbers(instance_spec):
+    """
+    Parse the instance part of the choice string ('all', '5', '1:4' or '1,3').
+    :return: the list of instance numbers
+    """
+    if instance_spec.lower() == 'all':
+        return list(range(1, 22))
+    elif ':' in instance_spec:
+        first, last = map(int, instance_spec.split(':'))
+        return list(range(first, last+1))
+    elif ',' in instance_spec:
+        return list(map(int, instance_spec.split(',')))
+    return [int(instance_spec)]
+
 def get_solver_name(solver):
             solver_mapping = {
                 ' GECODE.mzn': ('gecode', 'gecode'),
@@ -257,11 +476,50 @@ def main():
         if (ind+1) % 2 == 0:
             print()
     
-    instance_method = input("\n Now, \n Enter '1:4-01' to run the model 01 on instances 1, 2, 3, 4\n '1,3-01' for running instance 1 and 3 on model 01\n   Enter your choice: ")
+    instance_method = input("\n Now, \n Enter '1:4-01' to run the model 01 on instances 1, 2, 3, 4\n '1,3-01' for running instance 1 and 3 on model 01\n '5-10+11+12' to race models 10, 11 and 12 on instance 5\n '11:21-lns' to use the LNS engine on instances 11 to 21\n '11:21-dec' to use the decomposition on instances 11 to 21\n '1:21-auto' to let the model be chosen per instance\n 'all-queue' to run all models through the resumable job queue\n   Enter your choice: ")
 
     input_list = instance_method.split('-')
     model_number = input_list[1]
 
+    if model_number.lower() == 'lns':
+        # '11:21-lns' solves instances 11 to 21 with the LNS engine instead of MiniZinc
+        from lns_engine import run_lns
+
+        run_lns(parse_instance_numbers(input_list[0]))
+        return
+
+    if model_number.lower() == 'auto':
+        # '11:21-auto' picks the model for every instance from its features and the results history
+        from model_selector import run_auto
+
+        run_auto(parse_instance_numbers(input_list[0]))
+        return
+
+    if model_number.lower() == 'queue':
+        # '1:21-queue' runs all models through the persistent job queue; the same command resumes an interrupted run
+        from job_queue import run_queue
+
+        jobs = [(inst_num, model_path) for model_path in minizinc_manager.list_of_paths_of_models
+                for inst_num in parse_instance_numbers(input_list[0])]
+        run_queue(jobs)
+        return
+
+    if model_number.lower() == 'dec':
+        # '11:21-dec' solves instances 11 to 21 cluster-first, route-second
+        from decomposition import run_decomposition
+
+        run_decomposition(parse_instance_numbers(input_list[0]))
+        return
+
+    if '+' in model_number:
+        # '5-10+11+12' races models 10, 11 and 12 on instance 5
+        from portfolio import run_portfolio
+
+        model_paths = [minizinc_manager.get_model_path(number) for number in model_number.split('+')]
+        for inst_num in parse_instance_numbers(input_list[0]):
+            run_portfolio(inst_num, model_paths)
+        return
+
     if model_number.lower() == 'all':
         if input_list[0] == 'all':
             instance_number = list(range(1, 22))
@@ -280,9 +538,17 @@ def main():
             instance_number = list(map(int, input_list[0].split(',')))
             one_instance = False
 
-        for model_path in minizinc_manager.list_of_paths_of_models:
-            project_result_generator(instance_number, model_path, one_instance=one_instance)
+        # Imported here since batch_runner imports this module for its workers
+        from batch_runner import BatchRunner
+
+        if one_instance:
+            instance_number = [instance_number]
+        jobs = [(inst_num, model_path) for model_path in minizinc_manager.list_of_paths_of_models
+                                        for inst_num in instance_number]
+        BatchRunner(workers=WORKERS).run(jobs)
     else:
+        from resources import solve_job_seeded
+
         model_path = minizinc_manager.get_model_path(model_number)
         solver = model_path.split('-')[-1]
         
@@ -302,29 +568,22 @@ def main():
             instance_number = list(map(int, input_list[0].split(',')))
 
         if instance_method == '1':
-            minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=solver_name)
             print("\nSolving Instance ", instance_number)
-            model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=instance_number)
-            result = minizinc_manager.solve_instance(model_instance=model_instance)
-            sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
-            minizinc_manager.save_to_JSON(sol_dict, filename=instance_number)
+            # One instance at a time gets every core: solver threads or seed copies, see resources.py
+            sol_dict, seed = solve_job_seeded(instance_number, model_path, solver_name=solver_name)
+            minizinc_manager.save_to_JSON(sol_dict, filename=instance_number, seed=seed)
         elif instance_method == '2':
             for inst_num in range(instance_number[0], instance_number[1]+1):
                 print("\nSolving Instance ", inst_num)
-                minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=solver_name)
-                model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=inst_num)
-                result = minizinc_manager.solve_instance(model_instance=model_instance)
-                sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
-                minizinc_manager.save_to_JSON(sol_dict, filename=inst_num)
+                sol_dict, seed = solve_job_seeded(inst_num, model_path, solver_name=solver_name)
+                minizinc_manager.save_to_JSON(sol_dict, filename=inst_num, seed=seed)
         elif instance_method == '3':
             for inst_num in instance_number:
                 print("\nSolving Instance ", inst_num)
-                minizinc_manager = MiniZinc_Mangager(solver=solver, solver_name=solver_name)
-                model_instance = minizinc_manager.create_model(path_to_model=model_path, data_instance_num=inst_num)
-                result = minizinc_manager.solve_instance(model_instance=model_instance)
-                sol_dict = minizinc_manager.solution_to_dict(solution=result.solution)
-                minizinc_manager.save_to_JSON(sol_dict, filename=inst_num)
+                sol_dict, seed = solve_job_seeded(inst_num, model_path, solver_name=solver_name)
+                minizinc_manager.save_to_JSON(sol_dict, filename=inst_num, seed=seed)
             
 
 # This function calls the main code
-main()
+if __name__ == "__main__":
+    main()
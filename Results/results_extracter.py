@@ -1,45 +1,49 @@
-import json
 import os
+import sys
 from collections import defaultdict
 
-def extract_results():
+# The results store lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from results_store import Results_Store
+
+def extract_results(results_path="Results/mzn"):
     # Store results as: {instance_num: {model_name: objective}}
     results = defaultdict(dict)
     model_names = set()
-    
-    # Read all JSON files
+
+    # Query the latest record of every instance and model; JSON files not in the store yet are imported once
+    store = Results_Store()
+    store.import_json(results_path)
+    latest = store.latest(results_path)
     for i in range(1, 22):
-        file_path = f"Results/mzn/{i}.json"
-        try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                
-            # Extract model names and objectives
-            for model_name, model_data in data.items():
-                model_names.add(model_name)
-                # Format objective value based on optimality
-                obj_value = model_data['obj']
-                if model_data['optimal']:
-                    obj_value = f"{obj_value} `**`"
-                elif model_data['sol'] != 'N/A':
-                    obj_value = f"{obj_value} `*`"
-                results[i][model_name] = obj_value
-        except FileNotFoundError:
-            print(f"Warning: File {file_path} not found")
+        if i not in latest:
+            print(f"Warning: no results for instance {i} in {results_path}")
             continue
 
+        # Extract model names and objectives
+        for model_name, model_data in latest[i].items():
+            model_names.add(model_name)
+            # Format objective value based on optimality
+            obj_value = model_data['obj']
+            if model_data['optimal']:
+                obj_value = f"{obj_value} `**`"
+            elif model_data['sol'] != 'N/A':
+                obj_value = f"{obj_value} `*`"
+            results[i][model_name] = obj_value
+
     # Generate markdown table
     model_names = sorted(list(model_names))
-    
+
     # Header
     markdown = "| Instance |"
     for model in model_names:
-        markdown += f" {model.split('.')[1].split(' - Final Model - ')[0] + " " + model.split('.')[1].split(' - Final Model - ')[1]} |"
+        approach, solver = model.split('.')[1].split(' - Final Model - ')
+        markdown += f" {approach + ' ' + solver} |"
     markdown += "\n"
-    
+
     # Separator
     markdown += "|" + "|".join(["-" * 10 for _ in range(len(model_names) + 1)]) + "|\n"
-    
+
     # Data rows
     for i in range(1, 22):
         markdown += f"| {i} |"
@@ -47,10 +51,10 @@ def extract_results():
             value = results[i].get(model, "-")
             markdown += f" {value} |"
         markdown += "\n"
-    
+
     # Write to file
     with open("results_table.md", "w") as f:
         f.write(markdown)
 
 if __name__ == "__main__":
-    extract_results()
\ No newline at end of file
+    extract_results()
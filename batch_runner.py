@@ -0,0 +1,250 @@
+#### This script runs (instance, model) pairs concurrently in a bounded worker pool
+import os
+import math
+import re
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from Main_MZN import MiniZinc_Mangager, TIMELIMIT, solve_job, solve_job_anytime
+from solution_verifier import verify_results
+from resources import Resource_Planner
+from memory_monitor import Memory_Monitor, Memory_Predictor, load_predictor, default_memory_cap, default_memory_budget
+
+
+def _run_job(inst_num, model_path, anytime=False, stall_timeout=None, use_cache=False, warm_start=False,
+             instrumentation_path=None, time_limit=TIMELIMIT, instanse_path="Instances/Instances dzn Format/",
+             processes=None, memory_cap=None):
+    """
+    Worker side of a batch job; solves the pair and measures how long it took and the peak memory of its solver.
+    :param inst_num: the instance number
+    :param model_path: the model file name inside the models directory
+    :param anytime: stream the solutions and keep the anytime trajectory
+    :param stall_timeout: with anytime, stop once the incumbent stalls for this many seconds
+    :param use_cache: reuse flattened FlatZinc from the on-disk cache (not used with anytime)
+    :param warm_start: bound and hint the solver with the greedy constructor
+    :param instrumentation_path: where to save the phase timings and solver counters, if anywhere
+    :param time_limit: seconds the solver may run
+    :param instanse_path: the path to the instances parent directory
+    :param processes: threads the solver may use
+    :param memory_cap: MB the MiniZinc and solver processes may use together; beyond it they are killed
+    :return: the result dictionary, the trajectory dictionary (or None) and the elapsed wall time
+    """
+    start = time.perf_counter()
+    with Memory_Monitor(memory_cap) as monitor:
+        try:
+            if anytime:
+                sol_dict, trajectory = solve_job_anytime(inst_num, model_path, stall_timeout=stall_timeout,
+                                                         warm_start=warm_start,
+                                                         instrumentation_path=instrumentation_path,
+                                                         time_limit=time_limit, instanse_path=instanse_path,
+                                                         processes=processes)
+            else:
+                sol_dict, trajectory = solve_job(inst_num, model_path, use_cache=use_cache, warm_start=warm_start,
+                                                 instrumentation_path=instrumentation_path, time_limit=time_limit,
+                                                 instanse_path=instanse_path, processes=processes), None
+        except Exception:
+            if not monitor.exceeded:
+                raise
+            sol_dict = {model_path: {"time": math.floor(time_limit), "optimal": False, "obj": "N/A", "sol": []}}
+            trajectory = None
+    record = sol_dict[model_path]
+    record["peak_rss_mb"] = monitor.peak_mb
+    if monitor.exceeded:
+        record["memory_cap_exceeded"] = True
+    return sol_dict, trajectory, time.perf_counter() - start
+
+
+class BatchRunner:
+    def __init__(self,
+                workers=1,
+                instanse_path="Instances/Instances dzn Format/",
+                results_path="Results/mzn",
+                anytime=False,
+                stall_timeout=None,
+                use_cache=False,
+                warm_start=False,
+                instrument=True,
+                cores=None,
+                memory_cap=None,
+                memory_budget=None):
+        """
+        :param workers: the number of solves that may run at the same time
+        :param instanse_path: the path to the instances parent directory
+        :param results_path: where the per-instance JSON files are kept
+        :param anytime: stream the solutions and save the anytime trajectories in results_path/trajectories
+        :param stall_timeout: with anytime, stop a job once its incumbent stalls for this many seconds
+        :param use_cache: reuse flattened FlatZinc across runs; hits and misses are reported at the end
+        :param warm_start: bound and hint every solve with the greedy constructor
+        :param instrument: save phase timings and solver counters of every job in results_path/instrumentation
+        :param cores: the core budget the concurrent jobs share; multi-threaded solvers get cores // workers threads
+        :param memory_cap: MB the solver processes of one job may use; default is MCP_MEMORY_CAP, or no cap
+        :param memory_budget: MB the concurrent jobs may use together; default is a share of the memory
+                              available when the batch starts
+        """
+        self.workers = max(1, int(workers))
+        self.anytime = anytime
+        self.stall_timeout = stall_timeout
+        self.use_cache = use_cache
+        self.warm_start = warm_start
+        self.instrument = instrument
+        self.planner = Resource_Planner(cores)
+        self.memory_cap = memory_cap if memory_cap is not None else default_memory_cap()
+        self.memory_budget = memory_budget
+        self.batch_memory = memory_budget
+        self.predictor = Memory_Predictor()
+        self.data_parent_directory = instanse_path
+        self.results_path = results_path
+        self.list_of_paths_of_dzn = sorted([f for f in os.listdir(self.data_parent_directory) if not f.startswith('.')])
+
+    def instance_size(self, inst_num):
+        """
+        Read only the scalar header of a dzn file.
+        :param inst_num: the instance number
+        :return: (num_courier, num_item) of the instance
+        """
+        path_to_dzn = os.path.join(self.data_parent_directory, self.list_of_paths_of_dzn[inst_num-1])
+        with open(path_to_dzn, 'r') as file:
+            header = file.readline() + file.readline()
+        values = [int(v) for v in re.findall(r'\d+', header)]
+        return values[0], values[1]
+
+    def estimate_job_cost(self, inst_num, model_path):
+        """
+        Estimated run time of a job, used to launch the slowest jobs first.
+        Jobs without a previous result are assumed to use the whole TIMELIMIT.
+        :return: a sortable (seconds, size) tuple; larger means slower
+        """
+        num_courier, num_item = self.instance_size(inst_num)
+        seconds = TIMELIMIT
+        path_to_file = os.path.join(self.results_path, f"{inst_num}.json")
+        if os.path.exists(path_to_file):
+            with open(path_to_file, 'r') as json_file:
+                previous = json.load(json_file).get(model_path)
+            if previous is not None and previous.get("optimal"):
+                seconds = previous["time"]
+        return seconds, num_courier * num_item
+
+    def learn_memory(self):
+        """
+        Fit the memory predictor to the peaks measured in the previous runs of results_path,
+        and fix the memory budget of this batch.
+        """
+        self.predictor = load_predictor(self.results_path, self.instance_size)
+        self.batch_memory = self.memory_budget if self.memory_budget is not None else default_memory_budget()
+
+    def predict_memory(self, inst_num, model_path):
+        """
+        :return: predicted peak MB of the job, never more than its cap
+        """
+        predicted = self.predictor.predict(model_path, *self.instance_size(inst_num))
+        return min(predicted, self.memory_cap) if self.memory_cap is not None else predicted
+
+    def next_job(self, pending, reserved):
+        """
+        The first pending job whose predicted memory fits next to the running jobs; a job that
+        does not fit even alone still runs when nothing else does.
+        :param pending: the jobs not started yet, in launch order
+        :param reserved: MB predicted for the running jobs
+        :return: the index of the job in pending, or None to wait for a running job to finish
+        """
+        for index, job in enumerate(pending):
+            if reserved == 0 or reserved + self.predict_memory(*job) <= self.batch_memory:
+                return index
+        return None
+
+    def run(self, jobs, keep_prev=True, verify=True):
+        """
+        Solve every job, saving each result as soon as its job finishes.
+        Results are written by this process only, so the JSON files are never
+        updated by two workers at once.
+        :param jobs: list of (instance number, model file name) pairs
+        :param verify: check the saved results for coverage, capacity and objective mismatches afterwards
+        :return: a report with wall time, busy time and utilization of the pool
+        """
+        jobs = sorted(jobs, key=lambda job: self.estimate_job_cost(*job), reverse=True)
+        saver = MiniZinc_Mangager()
+        busy_time = 0.0
+        failed = []
+
+        if self.use_cache:
+            from flatzinc_cache import FlatZinc_Cache
+            cache_log_start = FlatZinc_Cache().log_size()
+
+        # Workers save these records themselves; the results store serialises their writes
+        instrumentation_path = os.path.join(self.results_path, "instrumentation") if self.instrument else None
+        self.learn_memory()
+        pending = list(jobs)
+        running = {}
+        done = 0
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while pending or running:
+                # Jobs are only started while their predicted memory fits next to the running ones
+                while pending and len(running) < self.workers:
+                    index = self.next_job(pending, sum(memory for _, memory in running.values()))
+                    if index is None:
+                        break
+                    inst_num, model_path = job = pending.pop(index)
+                    future = executor.submit(_run_job, inst_num, model_path, self.anytime, self.stall_timeout,
+                                             self.use_cache, self.warm_start, instrumentation_path, TIMELIMIT,
+                                             self.data_parent_directory,
+                                             self.planner.batch_threads(model_path, self.workers), self.memory_cap)
+                    running[future] = (job, self.predict_memory(inst_num, model_path))
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    (inst_num, model_path), _ = running.pop(future)
+                    done += 1
+                    try:
+                        sol_dict, trajectory, elapsed = future.result()
+                    except Exception as error:
+                        print(f"[{done}/{len(jobs)}] Instance {inst_num} - {model_path} failed: {error}")
+                        failed.append((inst_num, model_path))
+                        continue
+                    busy_time += elapsed
+                    self.save(saver, inst_num, sol_dict, trajectory, keep_prev)
+                    print(f"[{done}/{len(jobs)}] Instance {inst_num} - {model_path} done in {elapsed:.1f}s, "
+                          f"{sol_dict[model_path]['peak_rss_mb']} MB")
+        wall_time = time.perf_counter() - start
+
+        report = {
+            "jobs": len(jobs),
+            "failed": failed,
+            "workers": self.workers,
+            "wall_time": wall_time,
+            "busy_time": busy_time,
+            "utilization": busy_time / (wall_time * self.workers) if wall_time > 0 else 0.0,
+            "memory_budget": self.batch_memory
+        }
+        print(f"\nBatch finished: {len(jobs) - len(failed)}/{len(jobs)} jobs in {wall_time:.1f}s "
+              f"on {self.workers} workers, utilization {report['utilization']:.0%}")
+        if self.use_cache and not self.anytime:
+            report["cache"] = FlatZinc_Cache().report(all_processes=True, since=cache_log_start)
+            print(f"FlatZinc cache: {report['cache']['hits']} hits, {report['cache']['misses']} misses, "
+                  f"{report['cache']['flat_time_saved']:.1f}s of flattening saved")
+        if verify:
+            self.verify(report)
+        return report
+
+    def save(self, saver, inst_num, sol_dict, trajectory, keep_prev=True):
+        """
+        Save a finished job's result, and its trajectory when it was solved anytime.
+        """
+        saver.save_to_JSON(sol_dict, filename=inst_num, parent_path=self.results_path, keep_prev=keep_prev)
+        if trajectory is not None:
+            saver.save_to_JSON(trajectory, filename=inst_num, keep_prev=True,
+                               parent_path=os.path.join(self.results_path, "trajectories"))
+
+    def verify(self, report):
+        """
+        Check the saved results for coverage, capacity and objective mismatches; adds 'verification' to the report.
+        """
+        if not os.path.isdir(self.results_path):
+            return
+        report["verification"] = verify_results(self.results_path, self.data_parent_directory)
+        for violation in report["verification"]["violations"]:
+            print(f"Instance {violation['instance']} | {violation['model']} | "
+                  f"{violation['kind']}: {violation['detail']}")
+        print(f"Verified {report['verification']['checked']} entries, "
+              f"{len(report['verification']['violations'])} violations")
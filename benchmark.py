@@ -0,0 +1,251 @@
+#### This script runs a declared models x instances x seeds matrix and compares anytime metrics to a baseline
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from Main_MZN import MiniZinc_Mangager, TIMELIMIT, solve_job_anytime, parse_instance_numbers
+from instance_loader import load_instance_number
+from bounds import lower_bound
+from results_store import Results_Store
+
+MATRIX_PATH = "Results/benchmark/matrix.json"
+BASELINE_PATH = "Results/benchmark/baseline.json"
+TOLERANCE = 0.10 # Relative slack before a metric counts as a regression
+TIME_SLACK = 1.0 # Seconds; time differences below this are noise
+# Lower is better for every metric
+METRICS = ("ttfs", "time_to_target", "primal_integral", "final_gap")
+
+
+def _run_benchmark_job(inst_num, model_path, seed, stall_timeout):
+    start = time.perf_counter()
+    sol_dict, trajectory = solve_job_anytime(inst_num, model_path, stall_timeout=stall_timeout, random_seed=seed)
+    record = trajectory[model_path]
+    return record["status"], [(step["time"], step["obj"]) for step in record["trajectory"]], \
+        time.perf_counter() - start
+
+
+def primal_gap(obj, reference):
+    if obj is None:
+        return 1.0
+    if reference is None or obj <= reference:
+        # A fixed baseline reference can be beaten by a later run
+        return 0.0
+    return abs(obj - reference) / max(abs(obj), abs(reference))
+
+
+def run_metrics(trajectory, target, reference, lb, horizon=TIMELIMIT):
+    """
+    :param trajectory: (seconds, objective) of every improving solution, in order
+    :param target: the objective counted as reached, usually the best known one
+    :param reference: the objective the primal gap is measured against
+    :param lb: the instance lower bound, for the final gap
+    :param horizon: the primal integral runs from 0 to here
+    :return: dictionary of time-to-first-solution, time-to-target, primal integral and final gap
+    """
+    if not trajectory:
+        return {"ttfs": None, "time_to_target": None, "primal_integral": float(horizon),
+                "final_obj": None, "final_gap": None}
+    integral, previous_time, previous_obj = 0.0, 0.0, None
+    for seconds, obj in trajectory:
+        seconds = min(seconds, horizon)
+        integral += primal_gap(previous_obj, reference) * (seconds - previous_time)
+        previous_time, previous_obj = seconds, obj
+    integral += primal_gap(previous_obj, reference) * (horizon - previous_time)
+
+    reached = [seconds for seconds, obj in trajectory if target is not None and obj <= target]
+    final_obj = trajectory[-1][1]
+    return {
+        "ttfs": trajectory[0][0],
+        "time_to_target": reached[0] if reached else None,
+        "primal_integral": integral,
+        "final_obj": final_obj,
+        "final_gap": (final_obj - lb) / final_obj if final_obj else 0.0
+    }
+
+
+def best_known(results_path="Results/mzn"):
+    """
+    :return: dictionary of instance number -> best objective in the results store
+    """
+    store = Results_Store()
+    store.import_json(results_path)
+    best = {}
+    for inst_num, records in store.latest(results_path).items():
+        objectives = [record["obj"] for record in records.values() if isinstance(record.get("obj"), int)]
+        if objectives:
+            best[inst_num] = min(objectives)
+    return best
+
+
+def environment():
+    """
+    What the numbers depend on, saved with every benchmark report.
+    """
+    import minizinc
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL).stdout.decode().strip()
+    except OSError:
+        commit = None
+    driver = minizinc.default_driver
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "minizinc": driver.minizinc_version if driver is not None else None,
+        "timelimit": TIMELIMIT
+    }
+
+
+class Benchmark:
+    def __init__(self, matrix, workers=1, stall_timeout=None):
+        """
+        :param matrix: dictionary with 'models' (model numbers), 'instances' ('1:10', 'all', ...) and 'seeds';
+                       'references' holds the target, reference and lb per instance fixed with the baseline
+        :param workers: concurrent runs; keep 1 for timings comparable with the baseline
+        :param stall_timeout: stop a run once its incumbent stalls for this many seconds
+        """
+        manager = MiniZinc_Mangager()
+        self.model_paths = [manager.get_model_path(number) for number in matrix["models"]]
+        self.instances = parse_instance_numbers(str(matrix["instances"]))
+        self.seeds = matrix.get("seeds", [0])
+        self.workers = max(1, int(workers))
+        self.stall_timeout = stall_timeout
+        self.references = {int(inst_num): values for inst_num, values in matrix.get("references", {}).items()}
+
+    def run(self):
+        """
+        Run every (model, instance, seed) of the matrix.
+        Instances with references fixed by the baseline are measured against those, so the metrics stay
+        comparable with it; the others against the results store and this run.
+        :return: the report, with one metrics record per run and the references used per instance
+        """
+        missing = [inst_num for inst_num in self.instances if inst_num not in self.references]
+        best = best_known() if missing else {}
+        bounds = {inst_num: lower_bound(load_instance_number(inst_num)) for inst_num in missing}
+        jobs = [(inst_num, model_path, seed) for model_path in self.model_paths
+                for inst_num in self.instances for seed in self.seeds]
+        runs = []
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(_run_benchmark_job, inst_num, model_path, seed, self.stall_timeout):
+                       (inst_num, model_path, seed) for inst_num, model_path, seed in jobs}
+            for done, future in enumerate(as_completed(futures), start=1):
+                inst_num, model_path, seed = futures[future]
+                try:
+                    status, trajectory, elapsed = future.result()
+                except Exception as error:
+                    print(f"[{done}/{len(jobs)}] Instance {inst_num} - {model_path} - seed {seed} failed: {error}")
+                    status, trajectory, elapsed = "ERROR", [], None
+                runs.append({"instance": inst_num, "model": model_path, "seed": seed, "status": status,
+                             "elapsed": elapsed, "trajectory": trajectory})
+                print(f"[{done}/{len(jobs)}] Instance {inst_num} - {model_path} - seed {seed}: {status}")
+
+        references = {}
+        for inst_num in self.instances:
+            if inst_num in self.references:
+                references[inst_num] = self.references[inst_num]
+            else:
+                # Without a baseline the gap reference is the best objective known, including this benchmark's
+                found = [run["trajectory"][-1][1] for run in runs if run["instance"] == inst_num and run["trajectory"]]
+                references[inst_num] = {
+                    "target": best.get(inst_num),
+                    "reference": min(found + ([best[inst_num]] if inst_num in best else []), default=None),
+                    "lb": bounds[inst_num]
+                }
+            values = references[inst_num]
+            for run in runs:
+                if run["instance"] == inst_num:
+                    run.update(run_metrics(run["trajectory"], values["target"], values["reference"], values["lb"]))
+        runs.sort(key=lambda run: (run["model"], run["instance"], run["seed"]))
+        return {"environment": environment(), "runs": runs, "references": references}
+
+
+def summarise(report):
+    """
+    Median of every metric over the seeds of each (model, instance).
+    :return: dictionary of 'model|instance' -> {metric: median or None}
+    """
+    grouped = {}
+    for run in report["runs"]:
+        grouped.setdefault(f"{run['model']}|{run['instance']}", []).append(run)
+    summary = {}
+    for key, runs in grouped.items():
+        summary[key] = {}
+        for metric in METRICS:
+            values = [run[metric] for run in runs if run[metric] is not None]
+            # A metric missing in some seeds (no solution, target not reached) counts as the worst value
+            values += [1.0 if metric == "final_gap" else float(TIMELIMIT)] * (len(runs) - len(values))
+            summary[key][metric] = statistics.median(values) if values else None
+    return summary
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """
+    :return: list of regressions: (model|instance, metric, baseline value, new value)
+    """
+    new, old = summarise(report), summarise(baseline)
+    regressions = []
+    for key in sorted(new.keys() & old.keys()):
+        for metric in METRICS:
+            before, after = old[key][metric], new[key][metric]
+            if before is None:
+                continue
+            slack = 0.0 if metric == "final_gap" else TIME_SLACK
+            if after is None or after > before * (1 + tolerance) + slack:
+                regressions.append((key, metric, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the models against a stored baseline")
+    parser.add_argument("matrix", nargs="?", default=MATRIX_PATH, help="JSON file with models, instances and seeds")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--stall-timeout", type=float, default=None)
+    parser.add_argument("--output", default="Results/benchmark/last_run.json")
+    args = parser.parse_args()
+
+    with open(args.matrix, 'r') as json_file:
+        matrix = json.load(json_file)
+    report = Benchmark(matrix, workers=args.workers, stall_timeout=args.stall_timeout).run()
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as json_file:
+        json.dump(report, json_file, indent=4)
+
+    for key, metrics in sorted(summarise(report).items()):
+        print(key, " ".join(f"{metric}={value:.2f}" if value is not None else f"{metric}=-"
+                            for metric, value in metrics.items()))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as json_file:
+            json.dump(report, json_file, indent=4)
+        # Later runs are measured against the same targets, references and bounds as this baseline
+        matrix["references"] = report["references"]
+        with open(args.matrix, 'w') as json_file:
+            json.dump(matrix, json_file, indent=4)
+        print(f"Saved baseline to {args.baseline} and its references to {args.matrix}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+    with open(args.baseline, 'r') as json_file:
+        baseline = json.load(json_file)
+    regressions = compare(report, baseline, tolerance=args.tolerance)
+    for key, metric, before, after in regressions:
+        print(f"REGRESSION {key} {metric}: {before} -> {after}")
+    print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#### This script computes lower and upper bounds on the maximum route length of an instance
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from warm_start import construct
+from preprocessing import preprocess
+
+
+def round_trip_bound(instance):
+    """
+    Some courier has to go to the farthest item and come back. Without the triangle inequality
+    the way there can be shorter through other items, so shortest-path distances are used.
+    """
+    depot = instance.depot
+    closure = preprocess(instance)["closure"]
+    return int((closure[depot, :depot] + closure[:depot, depot]).max())
+
+
+def min_couriers(instance):
+    """
+    Bin-packing bound: the fewest couriers whose capacities can hold all the items.
+    """
+    capacities = np.sort(instance.courier_capacity)[::-1]
+    enough = np.flatnonzero(np.cumsum(capacities) >= instance.item_size.sum())
+    return int(enough[0]) + 1 if len(enough) else instance.num_courier
+
+
+def assignment_bound(instance, used_couriers):
+    """
+    Lower bound on the total length of all routes from the assignment relaxation:
+    every item has one outgoing and one incoming arc, the depot one of each per used courier.
+    The reduced-cost bound (row minima, then column minima of what is left) is used instead of
+    solving the assignment exactly.
+    """
+    cost = instance.distance_mat.astype(np.float64)
+    np.fill_diagonal(cost, np.inf)
+    multiplicity = np.ones(instance.num_item + 1)
+    multiplicity[instance.depot] = used_couriers
+    rows = cost.min(axis=1)
+    columns = (cost - rows[:, None]).min(axis=0)
+    return float((rows * multiplicity).sum() + (columns * multiplicity).sum())
+
+
+def tree_bound(instance, used_couriers):
+    """
+    1-tree style bound for symmetric matrices: dropping one depot arc from every route leaves
+    a spanning tree, and the dropped arcs reach distinct items.
+    :return: lower bound on the total length of all routes, or 0 for asymmetric matrices
+    """
+    distance_mat = instance.distance_mat
+    if not preprocess(instance)["is_symmetric"]:
+        return 0.0
+    # Prim's algorithm on the dense matrix
+    points = instance.num_item + 1
+    in_tree = np.zeros(points, dtype=bool)
+    in_tree[instance.depot] = True
+    closest = distance_mat[instance.depot].astype(np.float64)
+    weight = 0.0
+    for _ in range(points - 1):
+        candidates = np.where(in_tree, np.inf, closest)
+        point = int(np.argmin(candidates))
+        weight += candidates[point]
+        in_tree[point] = True
+        np.minimum(closest, distance_mat[point], out=closest)
+    depot_arcs = np.sort(distance_mat[instance.depot, :instance.depot])
+    return weight + float(depot_arcs[:used_couriers].sum())
+
+
+@lru_cache(maxsize=32)
+def lower_bound(instance):
+    """
+    :param instance: the MCP_Instance (loader objects are reused, so results are cached per instance)
+    :return: the strongest of the bounds above; the longest route is at least the average route
+    """
+    used_couriers = min_couriers(instance)
+    total = max(assignment_bound(instance, used_couriers), tree_bound(instance, used_couriers))
+    return int(max(round_trip_bound(instance), math.ceil(total / instance.num_courier - 1e-9)))
+
+
+@lru_cache(maxsize=32)
+def compute_bounds(instance):
+    """
+    :param instance: the MCP_Instance
+    :return: dictionary with 'lb' and a safe 'ub'
+    """
+    # No route can be longer than all the incoming arcs of its points taken at their longest
+    ub = int(instance.distance_mat.max(axis=0).sum())
+    return {"lb": lower_bound(instance), "ub": ub}
+
+
+@lru_cache(maxsize=32)
+def greedy_solution(instance):
+    """
+    Only built when a warm start asks for it; runs without one do not pay for the construction.
+    :param instance: the MCP_Instance
+    :return: the greedy solution (or None), whose objective is the tighter upper bound used with the warm start
+    """
+    return construct(instance)
@@ -0,0 +1,165 @@
+#### This script shares one wall-clock budget among the jobs of a batch instead of giving each of them TIMELIMIT
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from Main_MZN import MiniZinc_Mangager, TIMELIMIT, WORKERS, parse_instance_numbers
+from batch_runner import BatchRunner, _run_job
+from results_store import Results_Store
+
+MIN_TIME = 5 # Seconds; a job is not started with less than this
+OPTIMAL_SLACK = 1.5 # Jobs proven optimal before get this multiple of their previous time, plus MIN_TIME
+HOPELESS_SHARE = 0.1 # Weight of jobs that found no solution at all in a previous run, relative to their size
+STALL_SHARE = 0.2 # A job is pre-empted once its incumbent has not improved for this share of its time limit
+STALL_MIN = 10 # Seconds; the stall timeout is never shorter than this
+
+
+class Budget_Scheduler(BatchRunner):
+    def __init__(self, budget, workers=1, results_path="Results/mzn", **kwargs):
+        """
+        Jobs always run anytime, so that a job whose incumbent stalls is pre-empted and its time returned.
+        :param budget: wall-clock seconds for the whole batch
+        :param workers: the number of solves that may run at the same time
+        :param results_path: where the results are saved and the history is read from
+        :param kwargs: the other BatchRunner options (instanse_path, warm_start, instrument, cores, memory_cap,
+                       memory_budget)
+        """
+        super().__init__(workers=workers, results_path=results_path, anytime=True, **kwargs)
+        self.budget = budget
+        self.history = {}
+
+    def demand(self, inst_num, model_path):
+        """
+        What a job asks for, from its previous result in the store.
+        :return: ('fixed', seconds) for a job proven optimal before, ('share', weight) for the others
+        """
+        previous = self.history.get(inst_num, {}).get(model_path)
+        if previous is not None and previous.get("optimal"):
+            return "fixed", min(TIMELIMIT, previous["time"] * OPTIMAL_SLACK + MIN_TIME)
+        num_courier, num_item = self.instance_size(inst_num)
+        weight = float(num_courier * num_item)
+        if previous is not None and previous.get("obj") in ("N/A", None) and previous.get("time", 0) >= TIMELIMIT:
+            # Nothing found in a full TIMELIMIT; a shorter run will not find more
+            weight *= HOPELESS_SHARE
+        return "share", weight
+
+    def job_time_limit(self, job, pending, pool, remaining_wall):
+        """
+        :param job: the (instance, model) about to start
+        :param pending: the jobs not started yet, including this one
+        :param pool: worker-seconds not handed out yet
+        :param remaining_wall: seconds until the batch deadline
+        :return: the job's time limit in seconds, or None if too little time is left to start it
+        """
+        demands = {other: self.demand(*other) for other in pending}
+        kind, value = demands[job]
+        if kind == "fixed":
+            limit = value
+        else:
+            # Jobs proven optimal before are served first; the rest is shared by weight
+            fixed = sum(amount for other, (other_kind, amount) in demands.items()
+                        if other_kind == "fixed" and other != job)
+            weights = sum(amount for other_kind, amount in demands.values() if other_kind == "share")
+            limit = (pool - fixed) * value / weights if weights > 0 else 0.0
+        limit = min(max(limit, MIN_TIME), TIMELIMIT, remaining_wall)
+        return limit if limit >= MIN_TIME else None
+
+    def order(self, jobs):
+        """
+        Cheap jobs proven optimal before go first, then the others from the largest share down.
+        """
+        def key(job):
+            kind, value = self.demand(*job)
+            return (0, value) if kind == "fixed" else (1, -value)
+        return sorted(jobs, key=key)
+
+    def run(self, jobs, keep_prev=True, verify=True):
+        """
+        Solve the jobs within the budget. Each job's limit is decided when it starts, from the
+        worker-seconds left; a job that finishes or stalls early returns the rest to the pool.
+        :param jobs: list of (instance number, model file name) pairs
+        :return: the BatchRunner report, plus the budget, the time limit of every job and the skipped jobs
+        """
+        store = Results_Store()
+        store.import_json(self.results_path)
+        self.history = store.latest(self.results_path)
+        self.learn_memory()
+
+        pending = self.order(jobs)
+        saver = MiniZinc_Mangager()
+        instrumentation_path = os.path.join(self.results_path, "instrumentation") if self.instrument else None
+        pool = float(self.budget * self.workers)
+        busy_time = 0.0
+        failed, skipped, limits = [], [], {}
+        running = {}
+
+        start = time.perf_counter()
+        deadline = start + self.budget
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while pending or running:
+                while pending and len(running) < self.workers:
+                    index = self.next_job(pending, sum(reserved for _, _, _, reserved in running.values()))
+                    if index is None:
+                        break
+                    job = pending[index]
+                    limit = self.job_time_limit(job, pending, pool, deadline - time.perf_counter())
+                    pending.pop(index)
+                    if limit is None:
+                        skipped.append(job)
+                        continue
+                    pool -= limit
+                    limits[f"{job[0]}|{job[1]}"] = limit
+                    stall_timeout = max(STALL_MIN, STALL_SHARE * limit)
+                    future = executor.submit(_run_job, job[0], job[1], True, stall_timeout, False, self.warm_start,
+                                             instrumentation_path, limit, self.data_parent_directory,
+                                             self.planner.batch_threads(job[1], self.workers), self.memory_cap)
+                    running[future] = (job, limit, time.perf_counter(), self.predict_memory(*job))
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    (inst_num, model_path), limit, launched, _ = running.pop(future)
+                    try:
+                        sol_dict, trajectory, elapsed = future.result()
+                    except Exception as error:
+                        print(f"Instance {inst_num} - {model_path} failed: {error}")
+                        failed.append((inst_num, model_path))
+                        elapsed = time.perf_counter() - launched
+                    else:
+                        self.save(saver, inst_num, sol_dict, trajectory, keep_prev)
+                        print(f"Instance {inst_num} - {model_path} done in {elapsed:.1f}s of {limit:.0f}s")
+                    busy_time += elapsed
+                    # Also charges the overrun of setup time past the limit
+                    pool += limit - elapsed
+        wall_time = time.perf_counter() - start
+
+        report = {
+            "jobs": len(jobs),
+            "failed": failed,
+            "skipped": skipped,
+            "workers": self.workers,
+            "budget": self.budget,
+            "limits": limits,
+            "wall_time": wall_time,
+            "busy_time": busy_time,
+            "utilization": busy_time / (wall_time * self.workers) if wall_time > 0 else 0.0,
+            "memory_budget": self.batch_memory
+        }
+        print(f"\nBudgeted batch finished: {len(limits) - len(failed)}/{len(jobs)} jobs in {wall_time:.1f}s "
+              f"of {self.budget}s on {self.workers} workers, {len(skipped)} skipped, "
+              f"utilization {report['utilization']:.0%}")
+        if verify:
+            self.verify(report)
+        return report
+
+
+if __name__ == "__main__":
+    # python budget_scheduler.py <budget seconds> [instances] [workers], e.g. python budget_scheduler.py 3600 all 8
+    budget = float(sys.argv[1])
+    instance_numbers = parse_instance_numbers(sys.argv[2] if len(sys.argv) > 2 else 'all')
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else WORKERS
+    jobs = [(inst_num, model_path) for model_path in MiniZinc_Mangager().list_of_paths_of_models
+            for inst_num in instance_numbers]
+    Budget_Scheduler(budget, workers=workers).run(jobs)
@@ -0,0 +1,223 @@
+#### This script solves large instances cluster-first, route-second: items are split among couriers, then every route is solved on its own
+import sys
+import time
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Main_MZN import MiniZinc_Mangager, TIMELIMIT, WORKERS, parse_instance_numbers
+from instance_loader import load_instance_number
+from bounds import lower_bound
+from warm_start import greedy_bin_packing, nearest_neighbour_route, two_opt, route_length, rebalance
+from lns_engine import LNS_Engine, or_opt
+from minizinc_session import get_session
+from model_registry import follow_successors
+
+TSP_MODEL = "Solvers/submodels/single_courier_tsp.mzn"
+CLUSTER_ITERATIONS = 10 # Rounds of medoid updates while clustering
+REBALANCE_ROUNDS = 20 # Rounds of moving items between clusters and re-routing the changed ones
+MINIZINC_ROUTE_SIZE = 15 # Largest cluster routed with the MiniZinc submodel when that backend is on
+MINIZINC_ROUTE_TIME = 5 # Seconds per MiniZinc route
+
+
+def capacity_clustering(instance, iterations=CLUSTER_ITERATIONS):
+    """
+    Capacity-aware k-medoids on the symmetrised distance matrix, one cluster per courier.
+    Medoids are seeded by farthest-first traversal from the depot and the largest couriers take
+    the first clusters. Items are assigned in decreasing regret (how much farther their second
+    closest medoid is) to the closest medoid whose courier still has room.
+    :param instance: the MCP_Instance
+    :return: array of 0-based courier per item, or None if the items do not fit that way
+    """
+    depot = instance.depot
+    symmetric = (instance.distance_mat + instance.distance_mat.T).astype(np.float64)
+    couriers = np.argsort(-instance.courier_capacity, kind="stable")[:min(instance.num_courier, instance.num_item)]
+
+    medoids = []
+    reach = symmetric[depot, :depot].copy()
+    for _ in couriers:
+        medoid = int(np.argmax(reach))
+        medoids.append(medoid)
+        np.minimum(reach, symmetric[medoid, :depot], out=reach)
+        reach[medoids] = -1
+
+    assignment = None
+    for _ in range(iterations):
+        # (item, cluster) distances, with the clusters sorted per item from closest to farthest
+        distances = symmetric[:depot, medoids]
+        preference = np.argsort(distances, axis=1, kind="stable")
+        ordered = np.take_along_axis(distances, preference, axis=1)
+        regret = ordered[:, 1] - ordered[:, 0] if len(medoids) > 1 else np.zeros(depot)
+
+        remaining = instance.courier_capacity[couriers].copy()
+        new_assignment = np.full(instance.num_item, -1)
+        for item in np.argsort(-regret, kind="stable"):
+            for cluster in preference[item]:
+                if remaining[cluster] >= instance.item_size[item]:
+                    new_assignment[item] = couriers[cluster]
+                    remaining[cluster] -= instance.item_size[item]
+                    break
+            else:
+                return None
+        if assignment is not None and (new_assignment == assignment).all():
+            break
+        assignment = new_assignment
+
+        # The new medoid of a cluster is the member closest to all the others
+        for cluster, courier in enumerate(couriers):
+            members = np.flatnonzero(assignment == courier)
+            if len(members):
+                medoids[cluster] = int(members[np.argmin(symmetric[np.ix_(members, members)].sum(axis=1))])
+    return assignment
+
+
+def minizinc_route(sub_matrix, time_limit=MINIZINC_ROUTE_TIME, solver='gecode'):
+    """
+    Route one cluster with the single courier submodel.
+    :param sub_matrix: distances between the cluster's items, the depot last
+    :return: the items in visiting order as local 0-based indices, or None if no route was found
+    """
+    session = get_session()
+    key, child = session.branch(solver, TSP_MODEL)
+    try:
+        child["num_points"] = len(sub_matrix)
+        child["distance_mat"] = sub_matrix.tolist()
+        result = child.solve(timeout=datetime.timedelta(seconds=time_limit))
+    finally:
+        session.release(key)
+    if result.solution is None:
+        return None
+    return np.array(follow_successors([result["succ"]], len(sub_matrix))[0], dtype=np.int64) - 1
+
+
+def route_cluster(sub_matrix, use_minizinc=False):
+    """
+    Single courier route: nearest neighbour, 2-opt and or-opt, then the MiniZinc submodel for
+    small clusters when use_minizinc is set; the shorter of the two is kept.
+    :param sub_matrix: distances between the cluster's items, the depot last
+    :return: the items in visiting order as local 0-based indices
+    """
+    depot = len(sub_matrix) - 1
+    route = nearest_neighbour_route(range(depot), sub_matrix, depot)
+    if len(route) > 2:
+        route = or_opt(two_opt(route, sub_matrix, depot), sub_matrix, depot)
+    if use_minizinc and 2 < depot <= MINIZINC_ROUTE_SIZE:
+        exact = minizinc_route(sub_matrix)
+        if exact is not None and route_length(exact, sub_matrix, depot) < route_length(route, sub_matrix, depot):
+            route = exact
+    return route
+
+
+class Decomposition_Engine(LNS_Engine):
+    def __init__(self, workers=WORKERS, time_limit=TIMELIMIT, seed=0, solver_name="decomposition", use_minizinc=False):
+        """
+        :param workers: processes routing the clusters in parallel
+        :param time_limit: time limit in seconds for the rebalancing rounds
+        :param seed: unused; the decomposition is deterministic
+        :param solver_name: the key of the results in the JSON files
+        :param use_minizinc: also route small clusters with the MiniZinc submodel
+        """
+        super().__init__(workers=workers, time_limit=time_limit, seed=seed, solver_name=solver_name)
+        self.use_minizinc = use_minizinc
+
+    def route_all(self, instance, clusters, executor):
+        """
+        :param clusters: list of 0-based item arrays, the visiting order is ignored
+        :return: the routed clusters, each as a 0-based item array
+        """
+        sub_matrices = []
+        for items in clusters:
+            points = np.append(items, instance.depot)
+            sub_matrices.append(instance.distance_mat[np.ix_(points, points)])
+        if executor is None:
+            orders = [route_cluster(sub_matrix, self.use_minizinc) for sub_matrix in sub_matrices]
+        else:
+            orders = executor.map(route_cluster, sub_matrices, [self.use_minizinc] * len(sub_matrices))
+        return [np.asarray(items, dtype=np.int64)[order] for items, order in zip(clusters, orders)]
+
+    def solve(self, instance):
+        """
+        Cluster, route every cluster, then move items out of the longest route and re-route the
+        changed clusters until the maximum stops improving or the time limit is reached.
+        :param instance: the MCP_Instance
+        :return: dictionary with 'obj', 'sol' (1-based routes), 'optimal', 'time' and 'iterations', or None
+        """
+        start = time.perf_counter()
+        # Compact clusters can leave one far route much longer than the rest, so the min-max
+        # greedy packing is routed as well and the better of the two is improved
+        assignments = [assignment for assignment in (capacity_clustering(instance), greedy_bin_packing(instance))
+                       if assignment is not None]
+        if not assignments:
+            return None
+        distance_mat, depot = instance.distance_mat, instance.depot
+        lb = lower_bound(instance)
+
+        # Routing the clusters one by one is cheaper than starting processes on small instances
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        try:
+            routes, lengths = None, None
+            for assignment in assignments:
+                clusters = [np.flatnonzero(assignment == courier) for courier in range(instance.num_courier)]
+                routed = self.route_all(instance, clusters, executor)
+                routed_lengths = [route_length(route, distance_mat, depot) for route in routed]
+                if lengths is None or max(routed_lengths) < max(lengths):
+                    routes, lengths = routed, routed_lengths
+            rounds = 0
+            while rounds < REBALANCE_ROUNDS and max(lengths) > lb and time.perf_counter() - start < self.time_limit:
+                rounds += 1
+                moved = rebalance([route.copy() for route in routes], instance)
+                changed = [courier for courier in range(instance.num_courier)
+                           if len(moved[courier]) != len(routes[courier]) or (moved[courier] != routes[courier]).any()]
+                if not changed:
+                    break
+                for courier, route in zip(changed, self.route_all(instance, [moved[courier] for courier in changed],
+                                                                   executor)):
+                    moved[courier] = route
+                moved_lengths = [route_length(route, distance_mat, depot) for route in moved]
+                if max(moved_lengths) >= max(lengths):
+                    break
+                routes, lengths = moved, moved_lengths
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        obj = max(lengths)
+        return {
+            "obj": obj,
+            "sol": [(route + 1).tolist() for route in routes],
+            "optimal": obj <= lb,
+            "time": time.perf_counter() - start,
+            "iterations": rounds
+        }
+
+
+def solve_job_decomposition(inst_num, workers=WORKERS, time_limit=TIMELIMIT, use_minizinc=False,
+                            instanse_path="Instances/Instances dzn Format/"):
+    """
+    Solve one instance with the decomposition backend.
+    :return: the result dictionary ready for save_to_JSON
+    """
+    engine = Decomposition_Engine(workers=workers, time_limit=time_limit, use_minizinc=use_minizinc)
+    solution = engine.solve(load_instance_number(inst_num, instanse_path))
+    if solution is not None:
+        print(f"Decomposition objective: {solution['obj']}{' (optimal)' if solution['optimal'] else ''}, "
+              f"{solution['iterations']} rebalancing rounds in {solution['time']:.1f}s")
+    return engine.solution_to_dict(solution)
+
+
+def run_decomposition(instance_numbers, workers=WORKERS, time_limit=TIMELIMIT, use_minizinc=False,
+                      parent_path="Results/decomposition"):
+    saver = MiniZinc_Mangager()
+    for inst_num in instance_numbers:
+        print("\nSolving Instance ", inst_num, " with the decomposition")
+        sol_dict = solve_job_decomposition(inst_num, workers=workers, time_limit=time_limit, use_minizinc=use_minizinc)
+        saver.save_to_JSON(sol_dict, filename=inst_num, parent_path=parent_path, keep_prev=True)
+
+
+if __name__ == "__main__":
+    # python decomposition.py <instances> [workers] [minizinc], e.g. python decomposition.py 11:21 8 minizinc
+    instance_numbers = parse_instance_numbers(sys.argv[1] if len(sys.argv) > 1 else 'all')
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else WORKERS
+    use_minizinc = len(sys.argv) > 3 and sys.argv[3] == 'minizinc'
+    run_decomposition(instance_numbers, workers=workers, use_minizinc=use_minizinc)
@@ -0,0 +1,164 @@
+#### This script keeps the flattened FlatZinc of every (model, data, solver) combination on disk
+import os
+import json
+import time
+import hashlib
+import datetime
+import subprocess
+from types import SimpleNamespace
+
+import minizinc
+from minizinc import Result, Status
+from minizinc.result import set_stat
+
+
+class FlatZinc_Cache:
+    def __init__(self, cache_path="res/flatzinc_cache"):
+        """
+        :param cache_path: the directory holding the cached .fzn/.ozn pairs
+        """
+        self.cache_path = cache_path
+        if not os.path.exists(self.cache_path):
+            os.makedirs(self.cache_path)
+        self.hits = 0
+        self.misses = 0
+        self.flat_time_saved = 0.0
+
+    def key(self, model_path, data_string, solver):
+        """
+        Content hash of everything that influences the flattening.
+        :param model_path: path to the .mzn file
+        :param data_string: the data added to the model, the symmetry setting and any added code
+        :param solver: the minizinc Solver the model is flattened for
+        :return: the hex digest naming the cache entry
+        """
+        digest = hashlib.sha256()
+        with open(model_path, 'rb') as file:
+            digest.update(file.read())
+        digest.update(data_string.encode())
+        digest.update(f"{solver.id}@{solver.version}".encode())
+        digest.update(minizinc.default_driver.minizinc_version.encode())
+        return digest.hexdigest()
+
+    def compile(self, instance, key):
+        """
+        Return the cached FlatZinc for key, flattening the instance only on a miss.
+        :param instance: the minizinc Instance (solver and data already set)
+        :param key: the cache key from self.key
+        :return: paths to the .fzn and .ozn files
+        """
+        fzn_path = os.path.join(self.cache_path, f"{key}.fzn")
+        ozn_path = os.path.join(self.cache_path, f"{key}.ozn")
+        meta_path = os.path.join(self.cache_path, f"{key}.json")
+
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as json_file:
+                flat_time = json.load(json_file)["flatTime"]
+            self.hits += 1
+            self.flat_time_saved += flat_time
+            self._log_event(key, hit=True, flat_time=flat_time)
+            return fzn_path, ozn_path
+
+        start = time.perf_counter()
+        with instance.flat(**{"output-mode": "json", "output-objective": True}) as (fzn, ozn, statistics):
+            flat_time = time.perf_counter() - start
+            # Write under a temporary name first so a concurrent reader never sees half a file
+            # The process id keeps workers that miss on the same key from writing the same temporary file
+            for source, target in ((fzn.name, fzn_path), (ozn.name, ozn_path)):
+                temporary = f"{target}.{os.getpid()}.tmp"
+                with open(source, 'rb') as src, open(temporary, 'wb') as dst:
+                    dst.write(src.read())
+                os.replace(temporary, target)
+        temporary = f"{meta_path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as json_file:
+            json.dump({"flatTime": flat_time}, json_file)
+        os.replace(temporary, meta_path)
+
+        self.misses += 1
+        self._log_event(key, hit=False, flat_time=flat_time)
+        return fzn_path, ozn_path
+
+    def solve(self, fzn_path, ozn_path, solver, timelimit, processes=None, random_seed=None):
+        """
+        Run the solver directly on a cached FlatZinc file.
+        :param solver: the minizinc Solver the FlatZinc was compiled for
+        :param timelimit: time limit in seconds
+        :param processes: threads the solver may use
+        :param random_seed: seed passed to the solver
+        :return: a minizinc Result with the last solution found
+        """
+        status, solution, statistics = Status.UNKNOWN, None, {}
+        with solver.configuration() as configuration:
+            cmd = [str(minizinc.default_driver.executable), "--solver", configuration,
+                   "--output-time", "--statistics", "--intermediate-solutions", "--json-stream",
+                   "--time-limit", str(int(timelimit * 1000))]
+            if processes is not None:
+                cmd += ["-p", str(processes)]
+            if random_seed is not None:
+                cmd += ["-r", str(random_seed)]
+            cmd += [fzn_path, ozn_path]
+            output = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        for line in output.stdout.decode().splitlines():
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if obj["type"] == "solution":
+                values = obj["output"]["json"]
+                values["objective"] = values.pop("_objective", None)
+                solution = SimpleNamespace(**values)
+                statistics["time"] = datetime.timedelta(milliseconds=obj["time"])
+                if status == Status.UNKNOWN:
+                    status = Status.SATISFIED
+            elif obj["type"] == "statistics":
+                for key, value in obj["statistics"].items():
+                    set_stat(statistics, key, str(value))
+            elif obj["type"] == "status":
+                status = Status.from_str(obj["status"])
+            elif obj["type"] == "error":
+                raise minizinc.MiniZincError(message=obj.get("message", output.stderr.decode()))
+        if output.returncode != 0 and status == Status.UNKNOWN:
+            raise minizinc.MiniZincError(message=output.stderr.decode())
+        return Result(status, solution, statistics)
+
+    def _log_event(self, key, hit, flat_time):
+        """
+        Append one hit/miss record; batch workers share this log.
+        """
+        with open(os.path.join(self.cache_path, "events.jsonl"), 'a') as log_file:
+            log_file.write(json.dumps({"key": key, "hit": hit, "flatTime": flat_time}) + "\n")
+
+    def log_size(self):
+        """
+        :return: current size of the shared event log; pass it to report() to skip older events
+        """
+        path_to_log = os.path.join(self.cache_path, "events.jsonl")
+        return os.path.getsize(path_to_log) if os.path.exists(path_to_log) else 0
+
+    def report(self, all_processes=False, since=0):
+        """
+        :param all_processes: summarise the shared event log instead of this process only
+        :param since: with all_processes, only count events logged after this log_size()
+        :return: hit and miss counts and the flattening time saved by hits
+        """
+        if not all_processes:
+            return {"hits": self.hits, "misses": self.misses, "flat_time_saved": self.flat_time_saved}
+        report = {"hits": 0, "misses": 0, "flat_time_saved": 0.0}
+        path_to_log = os.path.join(self.cache_path, "events.jsonl")
+        if os.path.exists(path_to_log):
+            with open(path_to_log, 'r') as log_file:
+                log_file.seek(since)
+                for line in log_file:
+                    event = json.loads(line)
+                    if event["hit"]:
+                        report["hits"] += 1
+                        report["flat_time_saved"] += event["flatTime"]
+                    else:
+                        report["misses"] += 1
+        return report
+
+
+if __name__ == "__main__":
+    report = FlatZinc_Cache().report(all_processes=True)
+    print(f"Cache hits: {report['hits']}, misses: {report['misses']}, "
+          f"flattening time saved: {report['flat_time_saved']:.1f}s")
@@ -0,0 +1,113 @@
+#### This script generates seeded synthetic instances of any size for stress and scaling tests
+import os
+import argparse
+
+import numpy as np
+
+from instance_loader import MCP_Instance
+
+GENERATED_PATH = "Instances/Generated"
+GRID = 1000 # Points lie on a GRID x GRID square
+MAX_ITEM_SIZE = 50
+STRUCTURES = ("metric", "asymmetric", "nonmetric")
+
+
+def distance_matrix(num_points, structure="metric", rng=None):
+    """
+    :param num_points: items plus the depot; the depot is the last point, at the centre of the square
+    :param structure: 'metric' (symmetric Manhattan distances, like instances 11-21),
+                      'asymmetric' (Manhattan plus a climbing cost, still satisfying the triangle inequality)
+                      or 'nonmetric' (symmetric, with random detours that break the triangle inequality)
+    :return: integer matrix with a zero diagonal
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    points = rng.integers(0, GRID, size=(num_points, 2))
+    points[-1] = GRID // 2
+    distance_mat = np.abs(points[:, None, :] - points[None, :, :]).sum(axis=2)
+    if structure == "asymmetric":
+        # Going up a height field costs extra, going down is free
+        height = rng.integers(0, GRID // 10, size=num_points)
+        distance_mat = distance_mat + np.maximum(height[None, :] - height[:, None], 0)
+    elif structure == "nonmetric":
+        detour = rng.integers(0, GRID // 2, size=(num_points, num_points))
+        detour = np.triu(detour, 1)
+        distance_mat = distance_mat + detour + detour.T
+    elif structure != "metric":
+        raise ValueError(f"Unknown structure {structure!r}; choose one of {STRUCTURES}")
+    np.fill_diagonal(distance_mat, 0)
+    return distance_mat.astype(np.int64)
+
+
+def generate_instance(num_item, num_courier, tightness=0.8, structure="metric", seed=0):
+    """
+    :param num_item: the number of items
+    :param num_courier: the number of couriers
+    :param tightness: total item size over total capacity, in (0, 1]; 1 leaves no room to spare
+    :param structure: the distance structure, see distance_matrix
+    :param seed: the random seed; the same arguments always give the same instance
+    :return: the MCP_Instance
+    """
+    if not 0 < tightness <= 1:
+        raise ValueError(f"tightness must be in (0, 1], got {tightness}")
+    rng = np.random.default_rng(seed)
+    item_size = rng.integers(1, MAX_ITEM_SIZE + 1, size=num_item)
+    # Capacities vary around the mean and every courier can carry the largest item
+    total = int(np.ceil(item_size.sum() / tightness))
+    shares = rng.uniform(0.5, 1.5, size=num_courier)
+    courier_capacity = np.maximum(np.floor(total * shares / shares.sum()), item_size.max()).astype(np.int64)
+    courier_capacity[np.argmax(courier_capacity)] += max(0, total - int(courier_capacity.sum()))
+    return MCP_Instance(courier_capacity, item_size, distance_matrix(num_item + 1, structure, rng))
+
+
+def instance_name(num_item, num_courier, tightness, structure, seed):
+    return f"gen_n{num_item:05}_m{num_courier:03}_t{int(round(tightness * 100)):03}_{structure}_s{seed}"
+
+
+def write_instance(instance, name, parent_path=GENERATED_PATH, formats=("dat", "dzn", "mcpb")):
+    """
+    Write an instance in every requested format, each in its own subdirectory of parent_path.
+    :return: dictionary of format -> path written
+    """
+    writers = {"dat": instance.to_dat, "dzn": instance.to_dzn, "mcpb": instance.to_binary}
+    paths = {}
+    for file_format in formats:
+        directory = os.path.join(parent_path, file_format)
+        os.makedirs(directory, exist_ok=True)
+        paths[file_format] = os.path.join(directory, f"{name}.{file_format}")
+        writers[file_format](paths[file_format])
+    return paths
+
+
+def generate_suite(sizes, num_courier=20, tightness=0.8, structure="metric", seed=0, parent_path=GENERATED_PATH,
+                   formats=("dat", "dzn", "mcpb")):
+    """
+    One instance per size; existing files are kept, since the same arguments give the same instance.
+    :return: list of (number of items, dictionary of format -> path)
+    """
+    suite = []
+    for num_item in sizes:
+        name = instance_name(num_item, num_courier, tightness, structure, seed)
+        paths = {file_format: os.path.join(parent_path, file_format, f"{name}.{file_format}") for file_format in formats}
+        if not all(os.path.exists(path) for path in paths.values()):
+            paths = write_instance(generate_instance(num_item, num_courier, tightness, structure, seed + num_item),
+                                   name, parent_path, formats)
+        suite.append((num_item, paths))
+    return suite
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic MCP instances")
+    parser.add_argument("sizes", type=int, nargs="+", help="numbers of items")
+    parser.add_argument("--couriers", type=int, default=20)
+    parser.add_argument("--tightness", type=float, default=0.8)
+    parser.add_argument("--structure", choices=STRUCTURES, default="metric")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=GENERATED_PATH)
+    args = parser.parse_args()
+    for num_item, paths in generate_suite(args.sizes, args.couriers, args.tightness, args.structure, args.seed,
+                                          args.output):
+        print(f"{num_item} items: " + ", ".join(paths.values()))
+
+
+if __name__ == "__main__":
+    main()
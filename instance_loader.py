@@ -0,0 +1,221 @@
+#### This script parses .dat/.dzn instances once into typed NumPy arrays, and memory-maps binary ones
+import os
+import re
+import json
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+DZN_PATH = "Instances/Instances dzn Format/"
+DAT_PATH = "Instances/Instances dat Format/"
+BINARY_PATH = "Instances/Instances binary Format/"
+DATA_CACHE_PATH = "res/data" # Streamed .dzn files for instances that were not read from one
+DZN_CHUNK_ROWS = 64 # Matrix rows formatted per chunk when streaming a .dzn
+BINARY_MAGIC = b"MCPB"
+BINARY_VERSION = 1
+# A 32 byte header, then the capacities, the sizes and the row-major matrix, all little-endian int64
+BINARY_HEADER = np.dtype([("magic", "S4"), ("version", "<u4"), ("num_courier", "<i8"), ("num_item", "<i8"),
+                          ("reserved", "<i8")])
+
+
+class MCP_Instance:
+    def __init__(self, courier_capacity, item_size, distance_mat, path=None):
+        """
+        :param courier_capacity: array of size num_courier
+        :param item_size: array of size num_item
+        :param distance_mat: (num_item+1) x (num_item+1) matrix; the last point is the depot
+        :param path: the file the instance was read from, if any
+        """
+        self.courier_capacity = np.asarray(courier_capacity, dtype=np.int64)
+        self.item_size = np.asarray(item_size, dtype=np.int64)
+        self.distance_mat = np.asarray(distance_mat, dtype=np.int64)
+        self.num_courier = len(self.courier_capacity)
+        self.num_item = len(self.item_size)
+        self.path = path
+
+        if self.distance_mat.shape != (self.num_item + 1, self.num_item + 1):
+            raise ValueError(f"distance_mat has shape {self.distance_mat.shape}, "
+                             f"expected {(self.num_item + 1, self.num_item + 1)}")
+
+    @property
+    def depot(self):
+        """
+        0-based index of the depot (origin point) in distance_mat.
+        """
+        return self.num_item
+
+    def to_mzn_data(self):
+        """
+        :return: the model parameters as plain Python values, ready for Instance.__setitem__ or JSON
+        """
+        return {
+            "num_courier": self.num_courier,
+            "num_item": self.num_item,
+            "courier_capacity": self.courier_capacity.tolist(),
+            "item_size": self.item_size.tolist(),
+            "distance_mat": self.distance_mat.tolist()
+        }
+
+    def to_json(self, path_to_json):
+        """
+        Write the parameters as a MiniZinc JSON data file.
+        """
+        with open(path_to_json, 'w') as json_file:
+            json.dump(self.to_mzn_data(), json_file)
+
+    def to_dat(self, path_to_dat):
+        """
+        Write the instance in the .dat layout of the course instances.
+        """
+        with open(path_to_dat, 'w') as file:
+            file.write(f"{self.num_courier}\n{self.num_item}\n")
+            file.write(" ".join(map(str, self.courier_capacity.tolist())) + "\n")
+            file.write(" ".join(map(str, self.item_size.tolist())) + "\n")
+            for row in self.distance_mat:
+                file.write(" ".join(map(str, row.tolist())) + "\n")
+
+    def dzn_chunks(self, rows_per_chunk=DZN_CHUNK_ROWS):
+        """
+        The .dzn text of the model parameters, generated lazily so a large matrix is never one string.
+        :param rows_per_chunk: matrix rows per yielded chunk
+        :return: generator of text chunks
+        """
+        yield f"num_courier = {self.num_courier};\nnum_item = {self.num_item};\n"
+        yield "courier_capacity = [" + ", ".join(map(str, self.courier_capacity.tolist())) + "];\n"
+        yield "item_size = [" + ", ".join(map(str, self.item_size.tolist())) + "];\n"
+        yield "distance_mat = ["
+        for start in range(0, len(self.distance_mat), rows_per_chunk):
+            rows = self.distance_mat[start:start + rows_per_chunk].tolist()
+            yield "".join("| " + ", ".join(map(str, row)) + ", \n" for row in rows)
+        yield "|];\n"
+
+    def to_dzn(self, path_to_dzn):
+        """
+        Write the model parameters as a .dzn file, streamed in chunks of matrix rows.
+        """
+        with open(path_to_dzn, 'w') as file:
+            file.writelines(self.dzn_chunks())
+
+    def data_file(self, cache_path=DATA_CACHE_PATH):
+        """
+        A .dzn file holding the model parameters, for handing the data to MiniZinc without building it in memory.
+        :return: the .dzn the instance was read from, else one streamed once into cache_path by content hash
+        """
+        if self.path is not None and self.path.endswith(".dzn"):
+            return self.path
+        path_to_dzn = os.path.join(cache_path, f"{self.content_hash()}.dzn")
+        if not os.path.exists(path_to_dzn):
+            os.makedirs(cache_path, exist_ok=True)
+            # Written under a temporary name, so concurrent workers never read half a file
+            temporary = f"{path_to_dzn}.{os.getpid()}.tmp"
+            self.to_dzn(temporary)
+            os.replace(temporary, path_to_dzn)
+        return path_to_dzn
+
+    def to_binary(self, path_to_binary):
+        """
+        Write the instance in the memory-mappable binary format read by read_binary.
+        """
+        header = np.zeros(1, dtype=BINARY_HEADER)
+        header[0] = (BINARY_MAGIC, BINARY_VERSION, self.num_courier, self.num_item, 0)
+        with open(path_to_binary, 'wb') as file:
+            header.tofile(file)
+            for array in (self.courier_capacity, self.item_size, self.distance_mat):
+                # tofile writes straight from the array's buffer, without a bytes copy of the matrix
+                np.ascontiguousarray(array, dtype="<i8").tofile(file)
+
+    def content_hash(self):
+        """
+        :return: a hex digest identifying the instance data
+        """
+        digest = hashlib.sha256()
+        for array in (self.courier_capacity, self.item_size, self.distance_mat):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+
+def parse_dat(text, path=None):
+    """
+    :param text: content of a .dat file (m, n, capacities, sizes, distance rows)
+    :return: the MCP_Instance
+    """
+    values = np.array(text.split(), dtype=np.int64)
+    num_courier, num_item = int(values[0]), int(values[1])
+    start = 2
+    courier_capacity = values[start:start + num_courier]
+    start += num_courier
+    item_size = values[start:start + num_item]
+    start += num_item
+    distance_mat = values[start:start + (num_item + 1) ** 2].reshape(num_item + 1, num_item + 1)
+    return MCP_Instance(courier_capacity, item_size, distance_mat, path=path)
+
+
+def parse_dzn(text, path=None):
+    """
+    :param text: content of a .dzn file with num_courier, num_item, courier_capacity, item_size and distance_mat
+    :return: the MCP_Instance
+    """
+    parameters = {}
+    for name, value in re.findall(r'(\w+)\s*=\s*([^;]*);', text):
+        parameters[name] = np.array(re.sub(r'[\[\]|,]', ' ', value).split(), dtype=np.int64)
+    num_item = int(parameters["num_item"][0])
+    distance_mat = parameters["distance_mat"].reshape(num_item + 1, num_item + 1)
+    return MCP_Instance(parameters["courier_capacity"], parameters["item_size"], distance_mat, path=path)
+
+
+def read_binary(path):
+    """
+    Memory-map a binary instance: nothing is read up front, matrix rows are paged in as they are used.
+    :param path: path to a file written by MCP_Instance.to_binary
+    :return: the MCP_Instance, its arrays read-only views of the file
+    """
+    header = np.fromfile(path, dtype=BINARY_HEADER, count=1)
+    if len(header) == 0 or header[0]["magic"] != BINARY_MAGIC or header[0]["version"] != BINARY_VERSION:
+        raise ValueError(f"{path} is not a version {BINARY_VERSION} binary instance")
+    num_courier, num_item = int(header[0]["num_courier"]), int(header[0]["num_item"])
+    arrays = []
+    offset = BINARY_HEADER.itemsize
+    for shape in ((num_courier,), (num_item,), (num_item + 1, num_item + 1)):
+        arrays.append(np.memmap(path, dtype="<i8", mode='r', offset=offset, shape=shape))
+        offset += arrays[-1].nbytes
+    return MCP_Instance(*arrays, path=path)
+
+
+def read_instance(path):
+    """
+    Parse an instance file without any caching.
+    :param path: path to a .dat, .dzn or binary .mcpb file
+    :return: the MCP_Instance
+    """
+    if path.endswith(".mcpb"):
+        return read_binary(path)
+    with open(path, 'r') as file:
+        text = file.read()
+    if path.endswith(".dat"):
+        return parse_dat(text, path=path)
+    return parse_dzn(text, path=path)
+
+
+@lru_cache(maxsize=32)
+def _load_instance(path, modified):
+    return read_instance(path)
+
+
+def load_instance(path):
+    """
+    Parse an instance file, reusing the parsed object while the file is unchanged.
+    :param path: path to a .dat, .dzn or binary .mcpb file
+    :return: the MCP_Instance
+    """
+    return _load_instance(path, os.path.getmtime(path))
+
+
+def load_instance_number(inst_num, instanse_path=DZN_PATH):
+    """
+    :param inst_num: the instance number, as used on the command line
+    :param instanse_path: the instances parent directory
+    :return: the MCP_Instance of that instance
+    """
+    list_of_paths = sorted([f for f in os.listdir(instanse_path) if not f.startswith('.')])
+    return load_instance(os.path.join(instanse_path, list_of_paths[inst_num-1]))
@@ -0,0 +1,112 @@
+#### This script records per-phase wall times and solver counters of every solve
+import os
+import sys
+import json
+import time
+import cProfile
+import datetime
+from contextlib import contextmanager
+
+# Solver counters kept from result.statistics; everything else there is solver specific
+SOLVER_COUNTERS = ("flatTime", "solveTime", "time", "nodes", "failures", "restarts", "peakDepth", "nSolutions",
+                   "variables", "propagators", "propagations", "objective", "objectiveBound")
+PROFILE_ENV = "MCP_PROFILE_DIR" # When set, every phase is profiled with cProfile into this directory
+
+
+def cprofile_hook(directory):
+    """
+    :param directory: where the <phase>.prof files are written
+    :return: a profiling hook for Instrumentation that runs each phase under cProfile
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def hook(phase_name):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(directory, f"{phase_name}-{os.getpid()}-{time.time_ns()}.prof"))
+    return hook
+
+
+class Instrumentation:
+    def __init__(self, profile_hook=None):
+        """
+        :param profile_hook: optional callable taking the phase name and returning a context manager
+                             wrapped around that phase; default is cProfile when MCP_PROFILE_DIR is set
+        """
+        if profile_hook is None and os.environ.get(PROFILE_ENV):
+            profile_hook = cprofile_hook(os.environ[PROFILE_ENV])
+        self.profile_hook = profile_hook
+        self.phases = {}
+        self.calls = {}
+        self.statistics = {}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a phase; repeated phases (e.g. decoding every intermediate solution) add up.
+        """
+        start = time.perf_counter()
+        try:
+            if self.profile_hook is None:
+                yield
+            else:
+                with self.profile_hook(name):
+                    yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def record_statistics(self, statistics):
+        """
+        Keep the solver counters of a result, with time spans in seconds.
+        """
+        for key in SOLVER_COUNTERS:
+            if key in statistics:
+                value = statistics[key]
+                self.statistics[key] = value.total_seconds() if isinstance(value, datetime.timedelta) else value
+
+    def to_record(self):
+        return {
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "calls": dict(self.calls),
+            "statistics": dict(self.statistics)
+        }
+
+
+def summarise(instrumentation_path="Results/mzn/instrumentation"):
+    """
+    Average phase times and counters per model family, from the saved instrumentation records.
+    :return: dictionary of family -> {'runs', 'phases', 'statistics'}
+    """
+    totals = {}
+    for file_name in sorted(os.listdir(instrumentation_path)):
+        if not file_name.endswith(".json"):
+            continue
+        with open(os.path.join(instrumentation_path, file_name), 'r') as json_file:
+            records = json.load(json_file)
+        for model, record in records.items():
+            family = model.split('. ', 1)[-1].split(' - Final Model - ')[0]
+            total = totals.setdefault(family, {"runs": 0, "phases": {}, "statistics": {}})
+            total["runs"] += 1
+            for group in ("phases", "statistics"):
+                for key, value in record[group].items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        total[group][key] = total[group].get(key, 0) + value
+    for total in totals.values():
+        for group in ("phases", "statistics"):
+            total[group] = {key: value / total["runs"] for key, value in total[group].items()}
+    return totals
+
+
+if __name__ == "__main__":
+    instrumentation_path = sys.argv[1] if len(sys.argv) > 1 else "Results/mzn/instrumentation"
+    for family, total in summarise(instrumentation_path).items():
+        print(f"\n{family} ({total['runs']} runs)")
+        for name, seconds in sorted(total["phases"].items(), key=lambda phase: -phase[1]):
+            print(f"    {name:<14} {seconds:9.3f}s")
+        print("    " + ", ".join(f"{key}={value:.1f}" for key, value in total["statistics"].items()))
@@ -0,0 +1,330 @@
+#### This script keeps (instance, model) jobs in a persistent queue that workers on one or more machines claim with leases
+import os
+import sys
+import json
+import time
+import socket
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import minizinc
+
+from Main_MZN import MiniZinc_Mangager, TIMELIMIT, WORKERS, get_solver_name, parse_instance_numbers
+from batch_runner import _run_job
+from instance_loader import load_instance_number
+from minizinc_session import get_session
+from memory_monitor import default_memory_cap
+from results_store import JOURNAL_MODE_ENV
+
+QUEUE_PATH = "Results/job_queue.db"
+# WAL needs shared memory, which a network filesystem does not provide, so the queue keeps the rollback journal
+JOURNAL_MODE = "DELETE"
+LEASE_TIME = 120 # Seconds a claim stays valid without a heartbeat; keep it well above the clock skew between machines
+HEARTBEAT = 30 # Seconds between lease renewals of a running job
+MAX_ATTEMPTS = 3 # A job that was claimed this often without finishing is marked failed
+POLL = 10 # Seconds an idle worker waits before looking for expired leases again
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    instance INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    memo_key TEXT,
+    error TEXT,
+    updated REAL NOT NULL,
+    UNIQUE (queue, instance, model)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (queue, state);
+CREATE TABLE IF NOT EXISTS memo (
+    memo_key TEXT PRIMARY KEY,
+    instance_hash TEXT NOT NULL,
+    model_hash TEXT NOT NULL,
+    solver TEXT NOT NULL,
+    optimal INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        digest.update(file.read())
+    return digest.hexdigest()
+
+
+def memo_key(inst_num, model_path, instanse_path="Instances/Instances dzn Format/",
+             model_parent_path="Solvers/projectmodels"):
+    """
+    What a result depends on: the model text, the instance data and the solver version.
+    :return: (memo key, instance hash, model hash, solver id@version)
+    """
+    instance_hash = load_instance_number(inst_num, instanse_path).content_hash()
+    model_hash = file_hash(os.path.join(model_parent_path, model_path))
+    solver = get_session().lookup(get_solver_name(model_path.split('-')[-1])[0])
+    solver_version = f"{solver.id}@{solver.version}"
+    minizinc_version = minizinc.default_driver.minizinc_version if minizinc.default_driver is not None else ""
+    digest = hashlib.sha256(f"{instance_hash}|{model_hash}|{solver_version}|{minizinc_version}".encode())
+    return digest.hexdigest(), instance_hash, model_hash, solver_version
+
+
+class Job_Queue:
+    def __init__(self, db_path=QUEUE_PATH, queue="Results/mzn"):
+        """
+        :param db_path: the SQLite database; on a filesystem shared by several machines for a distributed run
+        :param queue: the name of the queue; by default the results path its jobs are saved to
+        """
+        self.db_path = db_path
+        self.queue = os.path.normpath(queue)
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        self.connection.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+        self.connection.executescript(SCHEMA)
+
+    def _transaction(self, statements):
+        """
+        Run statements(connection) inside one write transaction.
+        :return: what statements returned
+        """
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            value = statements(self.connection)
+            self.connection.execute("COMMIT")
+            return value
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def submit(self, jobs):
+        """
+        Add jobs that are not queued yet; submitting the same batch again adds nothing.
+        :param jobs: list of (instance number, model file name) pairs
+        :return: the number of jobs added
+        """
+        now = time.time()
+        def statements(connection):
+            before = connection.total_changes
+            connection.executemany("INSERT OR IGNORE INTO jobs (queue, instance, model, updated) VALUES (?, ?, ?, ?)",
+                                   [(self.queue, int(inst_num), model, now) for inst_num, model in jobs])
+            return connection.total_changes - before
+        return self._transaction(statements)
+
+    def claim(self, worker, lease_time=LEASE_TIME):
+        """
+        Lease the next pending job. A running job whose lease expired belongs to a worker that died;
+        it is claimed again, or marked failed once it has used up MAX_ATTEMPTS.
+        :param worker: the name of the claiming worker
+        :return: (job id, instance number, model file name), or None if nothing can be claimed now
+        """
+        def statements(connection):
+            now = time.time()
+            connection.execute("UPDATE jobs SET state = 'failed', error = 'lease expired', worker = NULL, updated = ?"
+                               " WHERE queue = ? AND state = 'running' AND lease_expires < ? AND attempts >= ?",
+                               (now, self.queue, now, MAX_ATTEMPTS))
+            row = connection.execute("SELECT id, instance, model FROM jobs WHERE queue = ?"
+                                     " AND (state = 'pending' OR (state = 'running' AND lease_expires < ?))"
+                                     " ORDER BY attempts, id LIMIT 1", (self.queue, now)).fetchone()
+            if row is not None:
+                connection.execute("UPDATE jobs SET state = 'running', worker = ?, lease_expires = ?,"
+                                   " attempts = attempts + 1, updated = ? WHERE id = ?",
+                                   (worker, now + lease_time, now, row[0]))
+            return row
+        return self._transaction(statements)
+
+    def renew(self, job_id, worker, lease_time=LEASE_TIME):
+        """
+        :return: False if the lease was lost, because it expired and another worker claimed the job
+        """
+        now = time.time()
+        cursor = self.connection.execute("UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ?"
+                                         " AND state = 'running'", (now + lease_time, now, job_id, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker, key=None, memo=None, record=None):
+        """
+        Mark a job done and memoize its result, in one transaction.
+        :param key: the memo key of the job
+        :param memo: (instance hash, model hash, solver id@version) of the key
+        :param record: the job's result record; with a key, it is memoized
+        :return: False if the lease was lost; the result is still memoized
+        """
+        def statements(connection):
+            now = time.time()
+            if key is not None and record is not None:
+                connection.execute("INSERT OR REPLACE INTO memo (memo_key, instance_hash, model_hash, solver, optimal,"
+                                   " record, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   (key, *memo, int(bool(record.get("optimal"))), json.dumps(record), now))
+            cursor = connection.execute("UPDATE jobs SET state = 'done', memo_key = ?, error = NULL, worker = NULL,"
+                                        " lease_expires = NULL, updated = ? WHERE id = ? AND worker = ?"
+                                        " AND state = 'running'", (key, now, job_id, worker))
+            return cursor.rowcount == 1
+        return self._transaction(statements)
+
+    def fail(self, job_id, worker, error):
+        """
+        Give a failed job back to the queue, or mark it failed once it has used up MAX_ATTEMPTS.
+        """
+        self.connection.execute("UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+                                " error = ?, worker = NULL, lease_expires = NULL, updated = ?"
+                                " WHERE id = ? AND worker = ? AND state = 'running'",
+                                (MAX_ATTEMPTS, str(error), time.time(), job_id, worker))
+
+    def memoized(self, key):
+        """
+        :return: the memoized record of a proven optimal result, or None
+        """
+        row = self.connection.execute("SELECT record FROM memo WHERE memo_key = ? AND optimal = 1", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def counts(self):
+        """
+        :return: dictionary of state -> number of jobs in this queue
+        """
+        rows = self.connection.execute("SELECT state, COUNT(*) FROM jobs WHERE queue = ? GROUP BY state",
+                                       (self.queue,))
+        return dict(rows.fetchall())
+
+    def reset(self, states=("done", "failed")):
+        """
+        Queue finished jobs again, for a new run over the same batch; proven optimal results stay memoized.
+        """
+        self.connection.execute(f"UPDATE jobs SET state = 'pending', attempts = 0, error = NULL, updated = ?"
+                                f" WHERE queue = ? AND state IN ({', '.join('?' * len(states))})",
+                                (time.time(), self.queue, *states))
+
+    def close(self):
+        self.connection.close()
+
+
+class _Heartbeat:
+    def __init__(self, db_path, queue, job_id, worker):
+        """
+        Renews a job's lease from a thread while the solve blocks the worker.
+        """
+        self.arguments = (db_path, queue, job_id, worker)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._beat, daemon=True)
+
+    def _beat(self):
+        db_path, queue, job_id, worker = self.arguments
+        # SQLite connections stay in the thread that opened them
+        job_queue = Job_Queue(db_path, queue)
+        try:
+            while not self.stopped.wait(HEARTBEAT):
+                if not job_queue.renew(job_id, worker):
+                    print(f"{worker} lost the lease of job {job_id}")
+                    break
+        finally:
+            job_queue.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def work(db_path=QUEUE_PATH, results_path="Results/mzn", instanse_path="Instances/Instances dzn Format/",
+         time_limit=TIMELIMIT, warm_start=False, instrument=True):
+    """
+    Claim and solve jobs until the queue has none pending or running. Start as many of these as there
+    are cores, on every machine that shares the database and the results directory.
+    :return: dictionary with the numbers of jobs solved, taken from the memo and failed by this worker
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    # The results database is shared by the machines like the queue; every store this worker opens,
+    # including the ones of the solves, uses the same journal mode
+    os.environ[JOURNAL_MODE_ENV] = JOURNAL_MODE
+    job_queue = Job_Queue(db_path, results_path)
+    saver = MiniZinc_Mangager(instanse_path=instanse_path)
+    instrumentation_path = os.path.join(results_path, "instrumentation") if instrument else None
+    done = {"solved": 0, "memoized": 0, "failed": 0}
+    try:
+        while True:
+            job = job_queue.claim(worker)
+            if job is None:
+                counts = job_queue.counts()
+                if not counts.get("pending") and not counts.get("running"):
+                    return done
+                # Other workers still hold leases; one of them may die and leave its job to this worker
+                time.sleep(POLL)
+                continue
+
+            job_id, inst_num, model_path = job
+            try:
+                key, *memo = memo_key(inst_num, model_path, instanse_path, saver.model_parent_directory)
+                record = job_queue.memoized(key)
+                if record is not None:
+                    # Proven optimal before with the same model, data and solver
+                    sol_dict = {model_path: record}
+                    done["memoized"] += 1
+                else:
+                    with _Heartbeat(db_path, job_queue.queue, job_id, worker):
+                        sol_dict, _, elapsed = _run_job(inst_num, model_path, warm_start=warm_start,
+                                                        instrumentation_path=instrumentation_path,
+                                                        time_limit=time_limit, instanse_path=instanse_path,
+                                                        memory_cap=default_memory_cap())
+                    done["solved"] += 1
+                saver.save_to_JSON(sol_dict, filename=inst_num, parent_path=results_path, keep_prev=True)
+            except Exception as error:
+                print(f"Instance {inst_num} - {model_path} failed: {error}")
+                job_queue.fail(job_id, worker, error)
+                done["failed"] += 1
+                continue
+            if not job_queue.complete(job_id, worker, key, memo, sol_dict[model_path]):
+                print(f"Instance {inst_num} - {model_path} finished after its lease was lost")
+            print(f"{worker}: instance {inst_num} - {model_path} done"
+                  + (" (memoized)" if record is not None else f" in {elapsed:.1f}s"))
+    finally:
+        job_queue.close()
+
+
+def run_queue(jobs, workers=WORKERS, db_path=QUEUE_PATH, results_path="Results/mzn", **kwargs):
+    """
+    Submit the jobs and work the queue with local worker processes. Running the same command again
+    after a crash resumes where it stopped: finished jobs are kept and expired leases are re-queued.
+    :param kwargs: the options of work()
+    :return: the counts of the queue's jobs by state
+    """
+    job_queue = Job_Queue(db_path, results_path)
+    added = job_queue.submit(jobs)
+    print(f"{added} of {len(jobs)} jobs added to the queue, {job_queue.counts()}")
+    with ProcessPoolExecutor(max_workers=max(1, int(workers))) as executor:
+        futures = [executor.submit(work, db_path, results_path, **kwargs) for _ in range(max(1, int(workers)))]
+        for future in futures:
+            print(future.result())
+    counts = job_queue.counts()
+    job_queue.close()
+    print(f"Queue {results_path}: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    # python job_queue.py submit <instances> | work [workers] | status | reset
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    job_queue = Job_Queue()
+    if command == "submit":
+        instance_numbers = parse_instance_numbers(sys.argv[2] if len(sys.argv) > 2 else 'all')
+        jobs = [(inst_num, model_path) for model_path in MiniZinc_Mangager().list_of_paths_of_models
+                for inst_num in instance_numbers]
+        print(f"{job_queue.submit(jobs)} jobs added")
+    elif command == "work":
+        workers = int(sys.argv[2]) if len(sys.argv) > 2 else WORKERS
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for done in executor.map(work, [QUEUE_PATH] * workers):
+                print(done)
+    elif command == "reset":
+        job_queue.reset()
+    print(job_queue.counts())
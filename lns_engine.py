@@ -0,0 +1,362 @@
+#### This script solves the MCP with a multi-process large neighbourhood search instead of MiniZinc
+import sys
+import math
+import time
+import multiprocessing
+
+import numpy as np
+
+from Main_MZN import MiniZinc_Mangager, TIMELIMIT, WORKERS, parse_instance_numbers
+from instance_loader import load_instance_number
+from bounds import lower_bound
+from warm_start import construct, two_opt
+
+SYNC_INTERVAL = 1.0 # Seconds between exchanges of the best solution
+DESTROY_FRACTION = 0.15 # Largest share of the items removed in one iteration
+
+
+class Route_State:
+    def __init__(self, instance, routes):
+        """
+        Array-backed routes: row c of tours is depot, the items of courier c, then depot padding.
+        Lengths and loads are kept up to date incrementally by remove() and insert().
+        :param instance: the MCP_Instance
+        :param routes: list of 0-based item arrays, one per courier
+        """
+        self.instance = instance
+        self.distance_mat = instance.distance_mat
+        self.depot = instance.depot
+        self.tours = np.full((instance.num_courier, instance.num_item + 2), self.depot, dtype=np.int64)
+        self.counts = np.zeros(instance.num_courier, dtype=np.int64)
+        for courier, route in enumerate(routes):
+            self.tours[courier, 1:len(route)+1] = route
+            self.counts[courier] = len(route)
+        # The padding is depot -> depot, which costs nothing
+        self.lengths = self.distance_mat[self.tours[:, :-1], self.tours[:, 1:]].sum(axis=1)
+        sizes = np.append(instance.item_size, 0)
+        self.loads = sizes[self.tours].sum(axis=1)
+        self.courier_of = np.empty(instance.num_item, dtype=np.int64)
+        for courier, route in enumerate(routes):
+            self.courier_of[route] = courier
+
+    def copy(self):
+        state = Route_State.__new__(Route_State)
+        state.instance, state.distance_mat, state.depot = self.instance, self.distance_mat, self.depot
+        for name in ("tours", "counts", "lengths", "loads", "courier_of"):
+            setattr(state, name, getattr(self, name).copy())
+        return state
+
+    def objective(self):
+        """
+        :return: (longest route, total length); the total breaks ties between equal maxima
+        """
+        return int(self.lengths.max()), int(self.lengths.sum())
+
+    def route(self, courier):
+        return self.tours[courier, 1:self.counts[courier]+1]
+
+    def set_route(self, courier, route):
+        self.tours[courier, 1:len(route)+1] = route
+        self.lengths[courier] = self.distance_mat[self.tours[courier, :-1], self.tours[courier, 1:]].sum()
+
+    def remove(self, item):
+        """
+        Take an item out of its route; the length changes by the removal delta only.
+        """
+        courier = self.courier_of[item]
+        position = int(np.flatnonzero(self.tours[courier, 1:self.counts[courier]+1] == item)[0]) + 1
+        before, after = self.tours[courier, position-1], self.tours[courier, position+1]
+        self.lengths[courier] += (self.distance_mat[before, after]
+                                  - self.distance_mat[before, item] - self.distance_mat[item, after])
+        self.tours[courier, position:-1] = self.tours[courier, position+1:]
+        self.tours[courier, -1] = self.depot
+        self.counts[courier] -= 1
+        self.loads[courier] -= self.instance.item_size[item]
+        self.courier_of[item] = -1
+
+    def insertion_costs(self, item):
+        """
+        Insertion delta of the item for every courier and every slot, at once.
+        :return: (num_courier, num_item+1) array; inf where the slot is past the route end or the courier is full
+        """
+        before, after = self.tours[:, :-1], self.tours[:, 1:]
+        costs = (self.distance_mat[before, item] + self.distance_mat[item, after]
+                 - self.distance_mat[before, after]).astype(np.float64)
+        costs[np.arange(costs.shape[1])[None, :] > self.counts[:, None]] = np.inf
+        costs[self.loads + self.instance.item_size[item] > self.instance.courier_capacity] = np.inf
+        return costs
+
+    def insert(self, item, courier, slot, delta):
+        self.tours[courier, slot+2:] = self.tours[courier, slot+1:-1]
+        self.tours[courier, slot+1] = item
+        self.counts[courier] += 1
+        self.lengths[courier] += delta
+        self.loads[courier] += self.instance.item_size[item]
+        self.courier_of[item] = courier
+
+    def encode(self):
+        """
+        :return: the routes as one array, each route followed by -1; the format of the shared best solution
+        """
+        return np.concatenate([np.append(self.route(courier), -1) for courier in range(len(self.counts))])
+
+    @staticmethod
+    def decode(instance, encoded):
+        ends = np.flatnonzero(encoded == -1)
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        return Route_State(instance, [encoded[start:end] for start, end in zip(starts, ends)])
+
+
+def or_opt(route, distance_mat, depot, max_segment=3):
+    """
+    Move segments of up to max_segment consecutive items to a better place in the same route.
+    Segments keep their direction, so this is exact for asymmetric matrices too.
+    :return: the improved route
+    """
+    route = np.asarray(route, dtype=np.int64)
+    while len(route) > 1:
+        tour = np.concatenate(([depot], route, [depot]))
+        best_delta, best_move = 0, None
+        for segment in range(1, min(max_segment, len(route) - 1) + 1):
+            # Segment tour[i..i+segment-1] goes between tour[k] and tour[k+1]
+            i = np.arange(1, len(route) - segment + 2)[:, None]
+            k = np.arange(0, len(route) + 1)[None, :]
+            first, last = tour[i], tour[i + segment - 1]
+            removal = (distance_mat[tour[i-1], first] + distance_mat[last, tour[i+segment]]
+                       - distance_mat[tour[i-1], tour[i+segment]])
+            insertion = distance_mat[tour[k], first] + distance_mat[last, tour[k+1]] - distance_mat[tour[k], tour[k+1]]
+            delta = (insertion - removal).astype(np.float64)
+            delta[(k >= i - 1) & (k <= i + segment - 1)] = np.inf
+            index = np.unravel_index(np.argmin(delta), delta.shape)
+            if delta[index] < best_delta:
+                best_delta, best_move = delta[index], (int(i[index[0], 0]), int(k[0, index[1]]), segment)
+        if best_move is None:
+            return route
+        start, target, segment = best_move
+        moved = route[start-1:start-1+segment]
+        rest = np.concatenate((route[:start-1], route[start-1+segment:]))
+        # Positions after the segment shift left once it is taken out
+        target = target if target < start else target - segment
+        route = np.concatenate((rest[:target], moved, rest[target:]))
+    return route
+
+
+class LNS_Search:
+    def __init__(self, instance, seed=0):
+        """
+        One independent search thread.
+        :param instance: the MCP_Instance
+        :param seed: seed of this thread's random generator
+        """
+        self.instance = instance
+        self.rng = np.random.default_rng(seed)
+        self.max_removed = max(min(4, instance.num_item), min(int(DESTROY_FRACTION * instance.num_item), 40))
+        # Items close to each other in both directions are removed together by the related operator
+        self.relatedness = instance.distance_mat[:-1, :-1] + instance.distance_mat[:-1, :-1].T
+        self.destroy_operators = (self.random_removal, self.longest_route_removal, self.related_removal)
+
+    def random_removal(self, state, count):
+        return self.rng.choice(self.instance.num_item, size=count, replace=False)
+
+    def longest_route_removal(self, state, count):
+        longest = int(np.argmax(state.lengths))
+        route = state.route(longest)
+        taken = self.rng.choice(route, size=min(count, len(route)), replace=False)
+        if len(taken) < count:
+            others = np.setdiff1d(np.arange(self.instance.num_item), taken)
+            taken = np.concatenate((taken, self.rng.choice(others, size=count - len(taken), replace=False)))
+        return taken
+
+    def related_removal(self, state, count):
+        seed_item = self.rng.integers(self.instance.num_item)
+        return np.argsort(self.relatedness[seed_item], kind="stable")[:count]
+
+    def insertion_costs(self, state, item):
+        """
+        :return: the insertion costs repair chooses from; a restricted search masks couriers here
+        """
+        return state.insertion_costs(item)
+
+    def repair(self, state, removed):
+        """
+        Greedy min-max insertion of the removed items, in random order, with a little noise for diversity.
+        :return: False if some item fits no courier
+        """
+        for item in self.rng.permutation(removed):
+            costs = self.insertion_costs(state, item)
+            new_lengths = state.lengths[:, None] + costs
+            noise = self.rng.uniform(1.0, 1.05, size=new_lengths.shape)
+            courier, slot = np.unravel_index(np.argmin(new_lengths * noise), new_lengths.shape)
+            if not np.isfinite(costs[courier, slot]):
+                return False
+            state.insert(item, courier, slot, int(costs[courier, slot]))
+        return True
+
+    def improve_routes(self, state, couriers):
+        for courier in couriers:
+            route = state.route(courier)
+            if len(route) > 2:
+                route = or_opt(two_opt(route.copy(), state.distance_mat, state.depot), state.distance_mat, state.depot)
+                state.set_route(courier, route)
+
+    def iterate(self, state, temperature):
+        """
+        One destroy, repair and local search step with simulated annealing acceptance.
+        :return: the state to continue from
+        """
+        count = int(self.rng.integers(2, self.max_removed + 1))
+        operator = self.destroy_operators[self.rng.integers(len(self.destroy_operators))]
+        candidate = state.copy()
+        removed = operator(candidate, count)
+        touched = np.unique(candidate.courier_of[removed])
+        for item in removed:
+            candidate.remove(item)
+        if not self.repair(candidate, removed):
+            return state
+        self.improve_routes(candidate, np.union1d(touched, np.unique(candidate.courier_of[removed])))
+
+        current, new = state.objective(), candidate.objective()
+        if new <= current:
+            return candidate
+        if temperature > 0 and self.rng.random() < math.exp(-(new[0] - current[0]) / temperature):
+            return candidate
+        return state
+
+
+def _search_worker(instance, worker, seed, start_encoded, time_limit, lb, best_obj, best_encoded, lock, done, iterations):
+    """
+    Run one search thread and exchange the best solution through shared memory every SYNC_INTERVAL.
+    """
+    search = LNS_Search(instance, seed=seed)
+    state = Route_State.decode(instance, np.asarray(start_encoded, dtype=np.int64))
+    best = state.copy()
+    start = time.perf_counter()
+    last_sync = start
+    initial_temperature = 0.01 * best.objective()[0]
+    count = 0
+    while not done.value:
+        now = time.perf_counter()
+        if now - start >= time_limit:
+            break
+        temperature = initial_temperature * (1 - (now - start) / time_limit)
+        state = search.iterate(state, temperature)
+        count += 1
+        if state.objective() < best.objective():
+            best = state.copy()
+
+        if now - last_sync >= SYNC_INTERVAL or best.objective()[0] <= lb:
+            last_sync = now
+            with lock:
+                if best.objective()[0] < best_obj.value:
+                    best_obj.value = best.objective()[0]
+                    best_encoded[:] = best.encode().tolist()
+                    if best_obj.value <= lb:
+                        done.value = True
+                elif best_obj.value < best.objective()[0]:
+                    # Another thread is ahead; continue from its solution
+                    best = Route_State.decode(instance, np.asarray(best_encoded[:], dtype=np.int64))
+                    state = best.copy()
+    iterations[worker] = count
+    with lock:
+        if best.objective()[0] < best_obj.value:
+            best_obj.value = best.objective()[0]
+            best_encoded[:] = best.encode().tolist()
+
+
+class LNS_Engine:
+    def __init__(self, workers=WORKERS, time_limit=TIMELIMIT, seed=0, solver_name="lns"):
+        """
+        :param workers: the number of search processes
+        :param time_limit: time limit in seconds
+        :param seed: the search processes use seed, seed+1, ...
+        :param solver_name: the key of the results in the JSON files
+        """
+        self.workers = max(1, int(workers))
+        self.time_limit = time_limit
+        self.seed = seed
+        self.solver_name = solver_name
+
+    def solve(self, instance):
+        """
+        Start from the greedy construction and improve it until the time limit, or until the
+        objective reaches the lower bound, which proves it optimal.
+        :param instance: the MCP_Instance
+        :return: dictionary with 'obj', 'sol' (1-based routes), 'optimal', 'time' and 'iterations', or None
+        """
+        start = time.perf_counter()
+        initial = construct(instance)
+        if initial is None:
+            return None
+        lb = lower_bound(instance)
+        state = Route_State(instance, [np.asarray(route, dtype=np.int64) - 1 for route in initial["sol"]])
+
+        best_obj = multiprocessing.Value('q', state.objective()[0], lock=False)
+        best_encoded = multiprocessing.Array('q', state.encode().tolist(), lock=False)
+        done = multiprocessing.Value('b', state.objective()[0] <= lb, lock=False)
+        iterations = multiprocessing.Array('q', self.workers, lock=False)
+        lock = multiprocessing.Lock()
+
+        remaining = self.time_limit - (time.perf_counter() - start)
+        processes = [multiprocessing.Process(target=_search_worker,
+                                             args=(instance, worker, self.seed + worker, best_encoded[:], remaining, lb,
+                                                   best_obj, best_encoded, lock, done, iterations))
+                     for worker in range(self.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        best = Route_State.decode(instance, np.asarray(best_encoded[:], dtype=np.int64))
+        obj = best.objective()[0]
+        return {
+            "obj": obj,
+            "sol": [(best.route(courier) + 1).tolist() for courier in range(instance.num_courier)],
+            "optimal": obj <= lb,
+            "time": time.perf_counter() - start,
+            "iterations": sum(iterations)
+        }
+
+    def solution_to_dict(self, solution):
+        """
+        Convert the search result to the same dictionary as MiniZinc_Mangager.solution_to_dict.
+        """
+        if solution is None:
+            return {f"{self.solver_name}": {"time": math.floor(self.time_limit), "optimal": False, "obj": "N/A",
+                                            "sol": []}}
+        return {f"{self.solver_name}":
+                {
+                    "time": math.floor(solution["time"]) if solution["optimal"] else math.floor(self.time_limit),
+                    "optimal": solution["optimal"],
+                    "obj": solution["obj"],
+                    "sol": solution["sol"]
+                }}
+
+
+def solve_job_lns(inst_num, workers=WORKERS, time_limit=TIMELIMIT, seed=0,
+                  instanse_path="Instances/Instances dzn Format/"):
+    """
+    Solve one instance with the LNS backend.
+    :return: the result dictionary ready for save_to_JSON
+    """
+    engine = LNS_Engine(workers=workers, time_limit=time_limit, seed=seed)
+    solution = engine.solve(load_instance_number(inst_num, instanse_path))
+    if solution is not None:
+        print(f"LNS objective: {solution['obj']}{' (optimal)' if solution['optimal'] else ''}, "
+              f"{solution['iterations']} iterations in {solution['time']:.1f}s")
+    return engine.solution_to_dict(solution)
+
+
+def run_lns(instance_numbers, workers=WORKERS, time_limit=TIMELIMIT, seed=0, parent_path="Results/lns"):
+    saver = MiniZinc_Mangager()
+    for inst_num in instance_numbers:
+        print("\nSolving Instance ", inst_num, " with LNS")
+        sol_dict = solve_job_lns(inst_num, workers=workers, time_limit=time_limit, seed=seed)
+        saver.save_to_JSON(sol_dict, filename=inst_num, parent_path=parent_path, keep_prev=True, seed=seed)
+
+
+if __name__ == "__main__":
+    # python lns_engine.py <instances> [workers] [time limit], e.g. python lns_engine.py 11:21 8 60
+    instance_numbers = parse_instance_numbers(sys.argv[1] if len(sys.argv) > 1 else 'all')
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else WORKERS
+    time_limit = float(sys.argv[3]) if len(sys.argv) > 3 else TIMELIMIT
+    run_lns(instance_numbers, workers=workers, time_limit=time_limit)
@@ -0,0 +1,174 @@
+#### This script measures the memory of the solver subprocesses of a job, caps it, and predicts it from history
+import os
+import math
+import threading
+
+import psutil
+
+from results_store import Results_Store
+
+INTERVAL = 0.2 # Seconds between two samples of the subprocess tree
+MEMORY_CAP_ENV = "MCP_MEMORY_CAP" # When set, the default per-job cap in MB
+DEFAULT_JOB_MEMORY = 512 # MB assumed for a model that has never been measured
+MEMORY_MARGIN = 1.25 # Predictions are this multiple of what the history suggests
+MEMORY_SHARE = 0.8 # Share of the available memory the concurrent jobs of a batch may use
+MAX_EXPONENT = 2.0 # Memory never grows faster than this power of the instance size in a prediction
+
+
+def default_memory_cap():
+    """
+    :return: the per-job cap in MB from MCP_MEMORY_CAP, or None for no cap
+    """
+    value = os.environ.get(MEMORY_CAP_ENV)
+    return float(value) if value else None
+
+
+def default_memory_budget():
+    """
+    :return: MB the concurrent jobs of a batch may use together, from the memory available now
+    """
+    return psutil.virtual_memory().available / 2**20 * MEMORY_SHARE
+
+
+def tree_rss(process):
+    """
+    :param process: a psutil.Process
+    :return: bytes resident in all the descendants of the process (MiniZinc and the solver it started)
+    """
+    total = 0
+    try:
+        children = process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0
+    for child in children:
+        try:
+            total += child.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total
+
+
+class Memory_Monitor:
+    def __init__(self, memory_cap=None, interval=INTERVAL, pid=None):
+        """
+        Samples the subprocess tree of this process in a thread while it is used as a context manager.
+        :param memory_cap: MB the tree may use; beyond it every process of the tree is killed
+        :param interval: seconds between two samples
+        :param pid: the process whose descendants are measured; default is this process
+        """
+        self.memory_cap = memory_cap
+        self.interval = interval
+        self.process = psutil.Process(pid)
+        self.peak = 0
+        self.exceeded = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / 2**20, 1)
+
+    def sample(self):
+        rss = tree_rss(self.process)
+        self.peak = max(self.peak, rss)
+        if self.memory_cap is not None and rss > self.memory_cap * 2**20 and not self.exceeded:
+            self.exceeded = True
+            self.kill()
+
+    def kill(self):
+        """
+        Kill the whole tree; MiniZinc then ends with an error in the solving thread.
+        """
+        try:
+            children = self.process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+        for child in children:
+            try:
+                child.kill()
+            except psutil.NoSuchProcess:
+                pass
+        print(f"Solver processes killed at {self.peak_mb} MB, over the cap of {self.memory_cap} MB")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+class Memory_Predictor:
+    def __init__(self, default=DEFAULT_JOB_MEMORY, margin=MEMORY_MARGIN):
+        """
+        Learns the peak memory of every model as a power of the instance size num_courier * num_item^2,
+        which is the size of the largest arrays of the models.
+        :param default: MB predicted for a model without history
+        :param margin: multiple applied to every prediction
+        """
+        self.default = default
+        self.margin = margin
+        self.observations = {}
+
+    def observe(self, model_path, num_courier, num_item, peak_mb):
+        if peak_mb:
+            self.observations.setdefault(model_path, []).append((num_courier, num_item, float(peak_mb)))
+
+    def load(self, records, instance_size):
+        """
+        :param records: rows of Results_Store.query
+        :param instance_size: callable from an instance number to (num_courier, num_item)
+        """
+        for row in records:
+            peak_mb = row["record"].get("peak_rss_mb") if isinstance(row["record"], dict) else None
+            if peak_mb:
+                try:
+                    self.observe(row["model"], *instance_size(row["instance"]), peak_mb)
+                except (IndexError, OSError):
+                    continue
+        return self
+
+    @staticmethod
+    def size(num_courier, num_item):
+        return max(1, num_courier) * max(1, num_item) ** 2
+
+    def predict(self, model_path, num_courier, num_item):
+        """
+        :return: predicted peak MB of the job: the largest peak measured on this very size if there is one,
+                 otherwise a log-log fit of peak against size over the model's history
+        """
+        history = self.observations.get(model_path)
+        if not history:
+            return self.default * self.margin
+        same_size = [peak for m, n, peak in history if (m, n) == (num_courier, num_item)]
+        if same_size:
+            return max(same_size) * self.margin
+        points = [(math.log(self.size(m, n)), math.log(peak)) for m, n, peak in history]
+        target = math.log(self.size(num_courier, num_item))
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        spread = sum((x - mean_x) ** 2 for x, _ in points)
+        # One size only: assume memory grows linearly with it
+        exponent = sum((x - mean_x) * (y - mean_y) for x, y in points) / spread if spread > 1e-9 else 1.0
+        exponent = min(max(exponent, 0.0), MAX_EXPONENT)
+        return math.exp(mean_y + exponent * (target - mean_x)) * self.margin
+
+
+def load_predictor(results_path, instance_size):
+    """
+    :param results_path: the results whose measured peaks are learned from
+    :param instance_size: callable from an instance number to (num_courier, num_item)
+    :return: a Memory_Predictor fitted to the history of results_path in the results store
+    """
+    store = Results_Store()
+    try:
+        return Memory_Predictor().load(store.query(results_path=results_path), instance_size)
+    finally:
+        store.close()
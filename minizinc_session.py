@@ -0,0 +1,98 @@
+#### This script keeps solver configurations, directory listings and parsed models for the lifetime of a process
+import os
+from contextlib import ExitStack
+
+from minizinc import Instance, Model, Solver
+
+
+class MiniZinc_Session:
+    def __init__(self):
+        """
+        Everything here is fixed for a whole batch, so it is looked up once per process
+        instead of once per (instance, model) job.
+        """
+        self.solvers = {}
+        self.base_instances = {}
+        self.open_branches = {}
+        self.listings = {}
+
+    def list_directory(self, path):
+        """
+        :return: the sorted, non-hidden file names of a directory
+        """
+        if path not in self.listings:
+            self.listings[path] = sorted([f for f in os.listdir(path) if not f.startswith('.')])
+        return self.listings[path]
+
+    def lookup(self, solver):
+        """
+        Solver.lookup runs 'minizinc --solvers-json'; the configuration is kept for the next jobs.
+        :param solver: a solver tag such as 'gecode', or an already looked up Solver
+        :return: the minizinc Solver
+        """
+        if isinstance(solver, Solver):
+            return solver
+        if solver not in self.solvers:
+            self.solvers[solver] = Solver.lookup(solver)
+        return self.solvers[solver]
+
+    def base_instance(self, solver, path_to_model):
+        """
+        The model parsed and analysed once for a solver, without any data.
+        """
+        solver = self.lookup(solver)
+        key = (solver.id, solver.version, os.path.abspath(path_to_model))
+        if key not in self.base_instances:
+            self.base_instances[key] = Instance(solver, Model(path_to_model))
+        return key, self.base_instances[key]
+
+    def branch(self, solver, path_to_model):
+        """
+        A child of the base instance that only receives the data of one job.
+        The base instance stays locked while a branch is open; any earlier branch of the same
+        base is released first, so a manager that never solved does not block the next job.
+        :return: the key to release the branch with, and the child minizinc Instance
+        """
+        key, base = self.base_instance(solver, path_to_model)
+        self.release(key)
+        stack = ExitStack()
+        child = stack.enter_context(base.branch())
+        self.open_branches[key] = stack
+        return key, child
+
+    def add_data_file(self, instance, path_to_data):
+        """
+        Hand a data file to MiniZinc as is, without parsing it in Python.
+        Instance.add_file would also drop the analysis the branch copied from its base; data files
+        do not change it, so the file is added the way Model does it instead.
+        """
+        Model.add_file(instance, path_to_data, parse_data=False)
+
+    def add_code(self, instance, code):
+        """
+        Add MiniZinc code, e.g. extra constraints, to an instance; like add_data_file, it keeps the branch's analysis.
+        """
+        Model.add_string(instance, code)
+
+    def release(self, key):
+        """
+        Close the branch opened for one base instance, if it is still open.
+        """
+        stack = self.open_branches.pop(key, None)
+        if stack is not None:
+            stack.close()
+
+    def close(self):
+        for key in list(self.open_branches):
+            self.release(key)
+
+
+# One session per process; batch workers each build their own on first use
+_session = None
+
+
+def get_session():
+    global _session
+    if _session is None:
+        _session = MiniZinc_Session()
+    return _session
@@ -0,0 +1,116 @@
+#### This script reads the metadata declared in each model and decodes its solutions into courier routes
+import os
+import re
+from functools import lru_cache
+
+# Decoders by model family; a new family only needs a function decorated with register_decoder
+DECODERS = {}
+
+
+def register_decoder(family):
+    """
+    :param family: the '@family' value models declare to use this decoder
+    """
+    def register(decoder):
+        DECODERS[family] = decoder
+        return decoder
+    return register
+
+
+@lru_cache(maxsize=64)
+def _read_metadata(path_to_model, modified):
+    metadata = {}
+    with open(path_to_model, 'r') as model_file:
+        for line in model_file:
+            if not line.startswith('%') and line.strip():
+                break
+            match = re.match(r'%\s*@(\w+)\s*:\s*(.+?)\s*$', line)
+            if match is not None:
+                metadata[match.group(1)] = match.group(2)
+    return metadata
+
+
+def model_metadata(path_to_model):
+    """
+    The '% @key: value' lines of the model's leading comment block.
+    :param path_to_model: path to the .mzn file
+    :return: dictionary of key -> value
+    """
+    return _read_metadata(os.path.abspath(path_to_model), os.path.getmtime(path_to_model))
+
+
+def get_decoder(path_to_model):
+    """
+    :param path_to_model: path to the .mzn file
+    :return: the decoder of the model's family; it takes the solution and the number of couriers
+    """
+    family = model_metadata(path_to_model).get("family")
+    if family not in DECODERS:
+        raise ValueError(f"{path_to_model} declares family {family!r}; "
+                         f"registered families are {sorted(DECODERS)}")
+    return DECODERS[family]
+
+
+def follow_successors(successors, depot):
+    """
+    Walk every courier's successor list from the depot; each point is visited once, so this is
+    linear in the number of points.
+    :param successors: per courier, the 1-based point visited after each point
+    :param depot: 1-based index of the depot
+    :return: list of 1-based item lists, one per courier
+    """
+    routes = []
+    for successor in successors:
+        route = []
+        point = successor[depot-1]
+        # A malformed solution cannot make the walk loop forever
+        while point != depot and len(route) < len(successor):
+            route.append(point)
+            point = successor[point-1]
+        routes.append(route)
+    return routes
+
+
+# MiniZinc returns the arrays as nested lists. Converting them to NumPy costs more than
+# decoding them, so the decoders below read the lists as they are.
+
+@register_decoder("successor")
+def decode_successor(solution, num_courier):
+    """
+    sequence[c][i] is the point courier c visits after point i+1 (the 3D path and 2D sequence models).
+    """
+    return follow_successors(solution.sequence, len(solution.sequence[0]))
+
+
+@register_decoder("path_matrix")
+def decode_path_matrix(solution, num_courier):
+    """
+    path[i][j] is the courier going from point i+1 to point j+1, 0 if none (the 2D path models).
+    The successor of every (point, courier) is mapped once per solution, so each hop of the walk
+    is a lookup instead of a scan of the row.
+    """
+    path = solution.path
+    depot = len(path)
+    successor = {}
+    for row, couriers in enumerate(path, start=1):
+        # A row holds one courier or none; set and index run in C instead of a Python loop over the row
+        for courier in set(couriers):
+            if courier:
+                successor[(row, courier)] = couriers.index(courier) + 1
+    routes = []
+    for courier in range(1, num_courier+1):
+        route = []
+        point = successor.get((depot, courier), depot)
+        while point != depot and len(route) < depot:
+            route.append(point)
+            point = successor.get((point, courier), depot)
+        routes.append(route)
+    return routes
+
+
+@register_decoder("sequence_slots")
+def decode_sequence_slots(solution, num_courier):
+    """
+    Each row lists the depot, the visited items and the depot again, padded with 0 (the heuristic models).
+    """
+    return [[point for point in row if point != 0][1:-1] for row in solution.sequence]
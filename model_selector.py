@@ -0,0 +1,156 @@
+#### This script picks the model and solver for an instance from cheap features and the results history
+import os
+import sys
+
+import numpy as np
+
+from Main_MZN import MiniZinc_Mangager, TIMELIMIT, solve_job, parse_instance_numbers
+from instance_loader import load_instance_number
+from preprocessing import preprocess
+from results_store import Results_Store
+
+NEIGHBOURS = 3 # Past instances the expected performance is averaged over
+TIME_WEIGHT = 0.1 # Weight of the run time (as a share of TIMELIMIT) next to the objective gap
+FEATURES = ("log_items", "log_couriers", "items_per_courier", "capacity_slack", "symmetric", "distance_spread")
+
+
+def instance_features(instance):
+    """
+    Features that cost no more than reading the instance.
+    :param instance: the MCP_Instance
+    :return: array of the FEATURES values
+    """
+    distances = instance.distance_mat[~np.eye(instance.num_item + 1, dtype=bool)]
+    mean = distances.mean() if len(distances) else 0.0
+    return np.array([
+        np.log(instance.num_item),
+        np.log(instance.num_courier),
+        instance.num_item / instance.num_courier,
+        instance.courier_capacity.sum() / max(1, instance.item_size.sum()) - 1,
+        float(preprocess(instance)["is_symmetric"]),
+        distances.std() / mean if mean > 0 else 0.0
+    ])
+
+
+def run_cost(record, best_obj):
+    """
+    How far a saved run was from the best known result: the relative objective gap (1 without a
+    solution) plus a small share for the time it took.
+    """
+    obj = record.get("obj")
+    if not isinstance(obj, int):
+        return 1.0 + TIME_WEIGHT
+    gap = (obj - best_obj) / obj if obj > 0 else 0.0
+    return gap + TIME_WEIGHT * min(record.get("time", TIMELIMIT), TIMELIMIT) / TIMELIMIT
+
+
+class Model_Selector:
+    def __init__(self, results_path="Results/mzn", instanse_path="Instances/Instances dzn Format/",
+                 neighbours=NEIGHBOURS):
+        """
+        :param results_path: the results history the selector is trained on
+        :param instanse_path: the path to the instances parent directory
+        :param neighbours: the number of most similar past instances a choice is based on
+        """
+        self.results_path = results_path
+        self.instanse_path = instanse_path
+        self.neighbours = neighbours
+        self.instances = []
+        self.models = []
+
+    def train(self):
+        """
+        Read every instance with results and the cost of every model on it.
+        :return: the selector itself
+        """
+        store = Results_Store()
+        store.import_json(self.results_path)
+        history = store.latest(self.results_path)
+        self.models = sorted({model for records in history.values() for model in records})
+        self.instances = sorted(history)
+        self.features = np.array([instance_features(load_instance_number(inst_num, self.instanse_path))
+                                  for inst_num in self.instances]).reshape(len(self.instances), len(FEATURES))
+        # A model never run on an instance counts as failing on it
+        self.costs = np.full((len(self.instances), len(self.models)), 1.0 + TIME_WEIGHT)
+        for row, inst_num in enumerate(self.instances):
+            records = history[inst_num]
+            objectives = [record["obj"] for record in records.values() if isinstance(record.get("obj"), int)]
+            best_obj = min(objectives, default=None)
+            for model, record in records.items():
+                self.costs[row, self.models.index(model)] = run_cost(record, best_obj)
+        self.scale = self.features.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        return self
+
+    def expected_costs(self, features, exclude=None):
+        """
+        :param features: the instance_features of the instance to solve
+        :param exclude: a training instance number left out, for leave-one-out evaluation
+        :return: array of the expected cost of every model, averaged over the nearest past instances
+        """
+        keep = np.array([inst_num != exclude for inst_num in self.instances])
+        distances = np.linalg.norm((self.features[keep] - features) / self.scale, axis=1)
+        nearest = np.argsort(distances, kind="stable")[:self.neighbours]
+        weights = 1.0 / (distances[nearest] + 1e-6)
+        return weights @ self.costs[keep][nearest] / weights.sum()
+
+    def select(self, instance, exclude=None):
+        """
+        :param instance: the MCP_Instance
+        :return: the model file name with the lowest expected cost
+        """
+        if not self.models:
+            self.train()
+        return self.models[int(np.argmin(self.expected_costs(instance_features(instance), exclude=exclude)))]
+
+    def leave_one_out(self):
+        """
+        Choose a model for every known instance without its own results.
+        :return: list of (instance number, chosen model, its cost, the best model's cost)
+        """
+        if not self.models:
+            self.train()
+        choices = []
+        for row, inst_num in enumerate(self.instances):
+            model = self.select(load_instance_number(inst_num, self.instanse_path), exclude=inst_num)
+            choices.append((inst_num, model, self.costs[row, self.models.index(model)], self.costs[row].min()))
+        return choices
+
+
+def select_model(inst_num, instanse_path="Instances/Instances dzn Format/", results_path="Results/mzn"):
+    """
+    :return: the model file name chosen for an instance number
+    """
+    return Model_Selector(results_path, instanse_path).train().select(load_instance_number(inst_num, instanse_path))
+
+
+def run_auto(instance_numbers, parent_path="Results/mzn"):
+    """
+    Solve every instance with the model chosen for it; '1:4-auto' on the command line.
+    """
+    selector = Model_Selector(results_path=parent_path).train()
+    saver = MiniZinc_Mangager()
+    for inst_num in instance_numbers:
+        model_path = selector.select(load_instance_number(inst_num))
+        print("\nInstance Number: ", inst_num, " for model: ", model_path, "(auto)")
+        sol_dict = solve_job(inst_num, model_path, instrumentation_path=os.path.join(parent_path, "instrumentation"))
+        saver.save_to_JSON(sol_dict, filename=inst_num, parent_path=parent_path, keep_prev=True)
+
+
+if __name__ == "__main__":
+    # python model_selector.py [instances]: leave-one-out choices on the results history
+    selector = Model_Selector().train()
+    wanted = set(parse_instance_numbers(sys.argv[1] if len(sys.argv) > 1 else 'all'))
+    regret = []
+    for inst_num, model, cost, best in selector.leave_one_out():
+        if inst_num in wanted:
+            regret.append(cost - best)
+            print(f"Instance {inst_num}: {model} (cost {cost:.3f}, best {best:.3f})")
+    # The same comparison for always using the model that is best on average over the other instances
+    single_regret = []
+    for row, inst_num in enumerate(selector.instances):
+        if inst_num in wanted:
+            others = np.arange(len(selector.instances)) != row
+            model = int(np.argmin(selector.costs[others].mean(axis=0)))
+            single_regret.append(selector.costs[row, model] - selector.costs[row].min())
+    print(f"Mean regret {np.mean(regret):.3f}; always using the best single model: {np.mean(single_regret):.3f}")
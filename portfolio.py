@@ -0,0 +1,94 @@
+#### This script races several models on the same instance and keeps the best one
+import asyncio
+import time
+
+from minizinc import Status
+
+from Main_MZN import MiniZinc_Mangager, get_solver_name
+
+
+async def race(inst_num, members, stall_timeout=None):
+    """
+    Solve one instance with every member at the same time, each in its own MiniZinc process.
+    As soon as one member proves optimality the others are cancelled.
+    :param inst_num: the instance number
+    :param members: dictionary of member name -> (model file name, random seed or None, threads or None)
+    :param stall_timeout: passed to every member; stop a member whose incumbent stalls
+    :return: a dictionary with the winning member, its model and solver, its result record and a per-member summary
+    """
+    tasks = {}
+    for name, (model_path, random_seed, processes) in members.items():
+        solver, solver_name = get_solver_name(model_path.split('-')[-1])
+        manager = MiniZinc_Mangager(solver=solver, solver_name=model_path, processes=processes)
+        model_instance = manager.create_model(path_to_model=model_path, data_instance_num=inst_num)
+        task = asyncio.create_task(manager.solve_instance_async(model_instance=model_instance,
+                                                                stall_timeout=stall_timeout, random_seed=random_seed))
+        tasks[task] = (name, manager, solver)
+
+    start = time.perf_counter()
+    proven = None
+    pending = set(tasks)
+    while pending and proven is None:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None:
+                print(f"{tasks[task][0]} failed: {task.exception()}")
+            elif task.result().status == Status.OPTIMAL_SOLUTION:
+                proven = task
+                break
+
+    # Cancelling a member terminates its MiniZinc process
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    wall_time = time.perf_counter() - start
+
+    summary = {}
+    best, best_obj = proven, None
+    for task, (name, manager, solver) in tasks.items():
+        incumbent = min((step["obj"] for step in getattr(manager, "trajectory", [])), default=None)
+        summary[name] = {
+            "solver": solver,
+            "status": "CANCELLED" if task.cancelled() else
+                      "ERROR" if task.exception() is not None else str(task.result().status),
+            "obj": incumbent
+        }
+        if proven is None and not task.cancelled() and task.exception() is None and incumbent is not None:
+            if best is None or incumbent < best_obj:
+                best, best_obj = task, incumbent
+
+    if best is None:
+        return {"winner": None, "model": None, "solver": None, "wall_time": wall_time, "result": None,
+                "members": summary}
+    name, manager, solver = tasks[best]
+    return {
+        "winner": name,
+        "model": manager.solver_name,
+        "solver": solver,
+        "wall_time": wall_time,
+        "result": manager.solution_to_dict(),
+        "members": summary
+    }
+
+
+async def race_portfolio(inst_num, model_paths, stall_timeout=None):
+    """
+    Race several models on the same instance; see race.
+    :param model_paths: the model file names taking part in the race
+    """
+    return await race(inst_num, {model_path: (model_path, None, None) for model_path in model_paths},
+                      stall_timeout=stall_timeout)
+
+
+def run_portfolio(inst_num, model_paths, stall_timeout=None, parent_path="res/MiniZinc/portfolio"):
+    """
+    Blocking entry point; races the portfolio and saves the winning record.
+    :return: the dictionary returned by race_portfolio
+    """
+    race = asyncio.run(race_portfolio(inst_num, model_paths, stall_timeout=stall_timeout))
+    print(f"\nInstance {inst_num}: winner {race['winner']} ({race['solver']}) after {race['wall_time']:.1f}s")
+    for model_path, member in race["members"].items():
+        print("   ", model_path, member["status"], member["obj"])
+    if race["result"] is not None:
+        MiniZinc_Mangager().save_to_JSON(race["result"], filename=inst_num, parent_path=parent_path)
+    return race
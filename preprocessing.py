@@ -0,0 +1,133 @@
+#### This script analyses an instance once before solving: metric closure, symmetries and equivalent couriers and items
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+from instance_loader import load_instance_number
+
+CACHE_PATH = "res/preprocessing"
+# The analysis results passed to the models that declare them with '@analysis'
+ANALYSIS_DATA = ("is_metric", "is_symmetric", "next_same_capacity", "next_twin_item")
+# The ones the models break symmetries with; False and zeros turn that off
+SYMMETRY_DATA = ("is_symmetric", "next_same_capacity", "next_twin_item")
+
+
+def metric_closure(distance_mat):
+    """
+    Shortest-path distances between all points (Floyd-Warshall, one vectorised relaxation per point).
+    :return: the closure; equal to distance_mat exactly when it satisfies the triangle inequality
+    """
+    closure = np.array(distance_mat, dtype=np.int64)
+    for point in range(len(closure)):
+        np.minimum(closure, closure[:, point, None] + closure[None, point, :], out=closure)
+    return closure
+
+
+def next_same_capacity(courier_capacity):
+    """
+    :return: per courier, the 1-based index of the next courier with the same capacity, 0 if none;
+             ordering each such chain is the same as ordering every pair of those couriers
+    """
+    following = np.zeros(len(courier_capacity), dtype=np.int64)
+    last_of_capacity = {}
+    for courier in range(len(courier_capacity) - 1, -1, -1):
+        following[courier] = last_of_capacity.get(int(courier_capacity[courier]), 0)
+        last_of_capacity[int(courier_capacity[courier])] = courier + 1
+    return following
+
+
+def interchangeable(distance_mat, first, second):
+    """
+    Whether swapping two points leaves the matrix unchanged.
+    """
+    others = np.ones(len(distance_mat), dtype=bool)
+    others[[first, second]] = False
+    return (distance_mat[first, first] == distance_mat[second, second]
+            and distance_mat[first, second] == distance_mat[second, first]
+            and (distance_mat[first, others] == distance_mat[second, others]).all()
+            and (distance_mat[others, first] == distance_mat[others, second]).all())
+
+
+def next_twin_item(instance):
+    """
+    Twin items have the same size and the same distances to every other point, so any solution
+    stays feasible and equally long when they are swapped.
+    :return: per item, the 1-based index of its next twin, 0 if none
+    """
+    distance_mat, depot = instance.distance_mat, instance.depot
+    # Only items that agree on size and depot distances can be twins
+    signatures = np.stack((instance.item_size, distance_mat[depot, :depot], distance_mat[:depot, depot]), axis=1)
+    _, group_of = np.unique(signatures, axis=0, return_inverse=True)
+    group_of = group_of.ravel()
+    following = np.zeros(instance.num_item, dtype=np.int64)
+    for group in np.flatnonzero(np.bincount(group_of) > 1):
+        members = np.flatnonzero(group_of == group)
+        for first, second in zip(members[:-1], members[1:]):
+            if interchangeable(distance_mat, first, second):
+                following[first] = second + 1
+    return following
+
+
+def analyse(instance):
+    """
+    :param instance: the MCP_Instance
+    :return: dictionary with 'is_metric', 'is_symmetric', 'closure', 'next_same_capacity' and 'next_twin_item'
+    """
+    distance_mat = instance.distance_mat
+    closure = metric_closure(distance_mat)
+    return {
+        "is_metric": bool((closure == distance_mat).all()),
+        "is_symmetric": bool((distance_mat == distance_mat.T).all()),
+        "closure": closure,
+        "next_same_capacity": next_same_capacity(instance.courier_capacity),
+        "next_twin_item": next_twin_item(instance)
+    }
+
+
+@lru_cache(maxsize=32)
+def preprocess(instance, cache_path=CACHE_PATH):
+    """
+    The analysis of an instance, kept on disk by the instance's content hash.
+    :param instance: the MCP_Instance (loader objects are reused, so results are also cached per process)
+    :return: the dictionary of analyse()
+    """
+    path_to_file = os.path.join(cache_path, f"{instance.content_hash()}.npz")
+    if os.path.exists(path_to_file):
+        with np.load(path_to_file) as saved:
+            analysis = {name: saved[name] for name in saved.files}
+        for flag in ("is_metric", "is_symmetric"):
+            analysis[flag] = bool(analysis[flag])
+        return analysis
+
+    analysis = analyse(instance)
+    os.makedirs(cache_path, exist_ok=True)
+    # Written under a temporary name, so concurrent workers never read half a file
+    temporary = f"{path_to_file}.{os.getpid()}.tmp.npz"
+    np.savez(temporary, **analysis)
+    os.replace(temporary, path_to_file)
+    return analysis
+
+
+def analysis_data(analysis, names=ANALYSIS_DATA, symmetry=True):
+    """
+    :param names: the parameters the model declares
+    :param symmetry: pass the symmetry findings; without them every solution stays allowed
+    :return: the analysis as plain model parameters
+    """
+    data = {}
+    for name in names:
+        value = analysis[name]
+        if not symmetry and name in SYMMETRY_DATA:
+            value = np.zeros_like(value) if isinstance(value, np.ndarray) else False
+        data[name] = value.tolist() if isinstance(value, np.ndarray) else value
+    return data
+
+
+if __name__ == "__main__":
+    for inst_num in range(1, 22) if len(sys.argv) < 2 else map(int, sys.argv[1:]):
+        analysis = preprocess(load_instance_number(inst_num))
+        print(f"Instance {inst_num}: metric {analysis['is_metric']}, symmetric {analysis['is_symmetric']}, "
+              f"{int((analysis['next_same_capacity'] > 0).sum())} equal-capacity links, "
+              f"{int((analysis['next_twin_item'] > 0).sum())} twin items")
@@ -0,0 +1,303 @@
+#### This script re-plans a solution after orders are added or cancelled and couriers drop out, keeping the untouched routes
+import sys
+import json
+import time
+
+import numpy as np
+
+from Main_MZN import MiniZinc_Mangager, get_solver_name
+from instance_loader import MCP_Instance, load_instance_number
+from bounds import lower_bound
+from warm_start import construct, route_length, supports_warm_start
+from lns_engine import LNS_Search, Route_State
+from results_store import Results_Store
+
+REPLAN_TIME = 5 # Seconds
+NEIGHBOUR_COURIERS = 2 # Untouched couriers closest to the changes that may also be re-planned
+# Added to the models that support warm starts; couriers outside the neighbourhood keep their items
+PIN_CONSTRAINT = """
+array[int] of int: fixed_bin;
+constraint forall(i in index_set(fixed_bin) where fixed_bin[i] > 0)(bin[i] = fixed_bin[i]);
+"""
+
+
+class Plan_Delta:
+    def __init__(self, removed_items=(), added_sizes=(), added_from=None, added_to=None, added_between=None,
+                 removed_couriers=(), capacities=None):
+        """
+        A change to an instance. Items and couriers are numbered from 1, as in the solutions.
+        :param removed_items: cancelled items of the old instance
+        :param added_sizes: sizes of the new items
+        :param added_from: (added, old items + 1) distances from every new item to the old points, the depot last
+        :param added_to: (old items + 1, added) distances from the old points, the depot last, to every new item
+        :param added_between: (added, added) distances among the new items; zeros if not given
+        :param removed_couriers: couriers that drop out; their items are planned again
+        :param capacities: dictionary of courier -> new capacity
+        """
+        self.removed_items = np.asarray(removed_items, dtype=np.int64).reshape(-1)
+        self.added_sizes = np.asarray(added_sizes, dtype=np.int64).reshape(-1)
+        added = len(self.added_sizes)
+        if added:
+            if added_from is None or added_to is None:
+                raise ValueError("new items need added_from and added_to distances")
+            self.added_from = np.asarray(added_from, dtype=np.int64).reshape(added, -1)
+            self.added_to = np.asarray(added_to, dtype=np.int64).reshape(-1, added)
+        else:
+            # Nothing added; the width to the old points is only known once the delta is applied
+            self.added_from = np.zeros((0, 0), dtype=np.int64)
+            self.added_to = np.zeros((0, 0), dtype=np.int64)
+        self.added_between = (np.zeros((added, added), dtype=np.int64) if added_between is None
+                              else np.asarray(added_between, dtype=np.int64).reshape(added, added))
+        self.removed_couriers = np.asarray(removed_couriers, dtype=np.int64).reshape(-1)
+        self.capacities = {int(courier): int(capacity) for courier, capacity in (capacities or {}).items()}
+
+    @staticmethod
+    def from_dict(data):
+        """
+        :param data: dictionary with the same keys as the constructor arguments, e.g. read from JSON
+        """
+        return Plan_Delta(**data)
+
+    def apply(self, instance):
+        """
+        Surviving items keep their order, the new items follow them, and the depot stays last.
+        :param instance: the old MCP_Instance
+        :return: the new MCP_Instance, and per old item and per old courier its new 0-based index, -1 if removed
+        """
+        num_item, added = instance.num_item, len(self.added_sizes)
+        if added and (self.added_from.shape[1] != num_item + 1 or self.added_to.shape[0] != num_item + 1):
+            raise ValueError(f"added_from and added_to need distances to all {num_item + 1} old points")
+        # Old items, new items and the depot in one matrix, then the cancelled items are left out
+        grand = np.zeros((num_item + added + 1, num_item + added + 1), dtype=np.int64)
+        old = np.append(np.arange(num_item), num_item + added)
+        grand[np.ix_(old, old)] = instance.distance_mat
+        new = np.arange(num_item, num_item + added)
+        if added:
+            grand[np.ix_(new, old)] = self.added_from
+            grand[np.ix_(old, new)] = self.added_to
+            grand[np.ix_(new, new)] = self.added_between
+
+        kept_items = np.setdiff1d(np.arange(num_item), self.removed_items - 1)
+        item_map = np.full(num_item, -1, dtype=np.int64)
+        item_map[kept_items] = np.arange(len(kept_items))
+        points = np.concatenate((kept_items, new, [num_item + added]))
+
+        capacity = instance.courier_capacity.copy()
+        for courier, new_capacity in self.capacities.items():
+            capacity[courier - 1] = new_capacity
+        kept_couriers = np.setdiff1d(np.arange(instance.num_courier), self.removed_couriers - 1)
+        courier_map = np.full(instance.num_courier, -1, dtype=np.int64)
+        courier_map[kept_couriers] = np.arange(len(kept_couriers))
+
+        new_instance = MCP_Instance(capacity[kept_couriers],
+                                    np.concatenate((instance.item_size[kept_items], self.added_sizes)),
+                                    grand[np.ix_(points, points)])
+        return new_instance, item_map, courier_map
+
+
+class Neighbourhood_Search(LNS_Search):
+    def __init__(self, instance, free_couriers, seed=0):
+        """
+        An LNS that only moves items among the free couriers; the other routes stay as they are.
+        :param free_couriers: boolean mask of the couriers that may change
+        """
+        super().__init__(instance, seed=seed)
+        self.free_couriers = free_couriers
+
+    def free_items(self, state):
+        return np.flatnonzero(self.free_couriers[state.courier_of])
+
+    def random_removal(self, state, count):
+        free = self.free_items(state)
+        return self.rng.choice(free, size=min(count, len(free)), replace=False)
+
+    def longest_route_removal(self, state, count):
+        lengths = np.where(self.free_couriers, state.lengths, -1)
+        route = state.route(int(np.argmax(lengths)))
+        return self.rng.choice(route, size=min(count, len(route)), replace=False)
+
+    def related_removal(self, state, count):
+        free = self.free_items(state)
+        seed_item = self.rng.choice(free)
+        return free[np.argsort(self.relatedness[seed_item, free], kind="stable")[:count]]
+
+    def insertion_costs(self, state, item):
+        costs = state.insertion_costs(item)
+        costs[~self.free_couriers] = np.inf
+        return costs
+
+
+class Reoptimizer:
+    def __init__(self, time_limit=REPLAN_TIME, neighbours=NEIGHBOUR_COURIERS, seed=0):
+        """
+        :param time_limit: seconds for re-planning
+        :param neighbours: the number of untouched couriers next to the changes that may also change
+        """
+        self.time_limit = time_limit
+        self.neighbours = neighbours
+        self.seed = seed
+
+    def prepare(self, instance, previous_sol, delta):
+        """
+        Carry the previous routes over to the new instance: cancelled items are cut out, overloaded
+        couriers give up the items whose removal saves the most, and those items, the items of dropped
+        couriers and the new items are inserted where the longest route grows least.
+        :param previous_sol: the previous 1-based routes, one per old courier
+        :return: the new instance, its repaired Route_State (None if nothing fits), the mask of the couriers
+                 that may change, the item map and the courier map
+        """
+        new_instance, item_map, courier_map = delta.apply(instance)
+        routes = [[] for _ in range(new_instance.num_courier)]
+        touched = np.zeros(new_instance.num_courier, dtype=bool)
+        orphans = list(range(new_instance.num_item - len(delta.added_sizes), new_instance.num_item))
+        for old_courier, route in enumerate(previous_sol):
+            items = item_map[np.asarray(route, dtype=np.int64) - 1]
+            courier = courier_map[old_courier]
+            if courier < 0:
+                orphans.extend(items[items >= 0].tolist())
+                continue
+            routes[courier] = items[items >= 0]
+            touched[courier] = len(routes[courier]) < len(route) or (old_courier + 1) in delta.capacities
+
+        distance_mat, depot = new_instance.distance_mat, new_instance.depot
+        for courier in np.flatnonzero(touched):
+            route = routes[courier]
+            while new_instance.item_size[route].sum() > new_instance.courier_capacity[courier]:
+                tour = np.concatenate(([depot], route, [depot]))
+                saving = (distance_mat[tour[:-2], tour[1:-1]] + distance_mat[tour[1:-1], tour[2:]]
+                          - distance_mat[tour[:-2], tour[2:]])
+                position = int(np.argmax(saving))
+                orphans.append(int(route[position]))
+                route = np.delete(route, position)
+            routes[courier] = route
+
+        state = Route_State(new_instance, routes)
+        for item in sorted(orphans, key=lambda item: -new_instance.item_size[item]):
+            costs = state.insertion_costs(item)
+            new_lengths = state.lengths[:, None] + costs
+            courier, slot = np.unravel_index(np.argmin(new_lengths), new_lengths.shape)
+            if not np.isfinite(costs[courier, slot]):
+                return new_instance, None, np.ones(new_instance.num_courier, dtype=bool), item_map, courier_map
+            state.insert(item, courier, slot, int(costs[courier, slot]))
+            touched[courier] = True
+
+        free = touched.copy()
+        if self.neighbours > 0 and free.any() and not free.all():
+            # The untouched couriers whose items lie closest to the changed routes
+            relatedness = distance_mat[:-1, :-1] + distance_mat[:-1, :-1].T
+            changed = np.flatnonzero(touched[state.courier_of])
+            closeness = np.full(new_instance.num_courier, np.inf)
+            for courier in np.flatnonzero(~free):
+                route = state.route(courier)
+                if len(route):
+                    closeness[courier] = relatedness[np.ix_(route, changed)].min()
+            nearest = np.argsort(closeness, kind="stable")[:self.neighbours]
+            free[nearest[np.isfinite(closeness[nearest])]] = True
+        return new_instance, state, free, item_map, courier_map
+
+    def replan(self, instance, previous_sol, delta):
+        """
+        Re-plan with a restricted LNS; the routes of the couriers outside the neighbourhood are kept as they are.
+        :param instance: the old MCP_Instance
+        :param previous_sol: the previous 1-based routes, one per old courier
+        :param delta: the Plan_Delta
+        :return: dictionary with 'obj', 'sol', 'bin', 'optimal', 'time', 'iterations', 'replanned' (1-based couriers
+                 that could change), 'instance' and the 'item_map' and 'courier_map' (old 1-based -> new 1-based, 0 if
+                 removed), or None if the new instance has no solution that was found
+        """
+        start = time.perf_counter()
+        new_instance, state, free, item_map, courier_map = self.prepare(instance, previous_sol, delta)
+        if state is None:
+            # Some item fits nowhere next to the kept routes; plan everything again
+            initial = construct(new_instance)
+            if initial is None:
+                return None
+            state = Route_State(new_instance, [np.asarray(route, dtype=np.int64) - 1 for route in initial["sol"]])
+
+        # The kept routes are a floor the search cannot go below
+        floor = max(lower_bound(new_instance), int(state.lengths[~free].max(initial=0)))
+        search = Neighbourhood_Search(new_instance, free, seed=self.seed)
+        best = state.copy()
+        initial_temperature = 0.01 * best.objective()[0]
+        iterations = 0
+        while best.objective()[0] > floor and len(search.free_items(state)) > 1:
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.time_limit:
+                break
+            state = search.iterate(state, initial_temperature * (1 - elapsed / self.time_limit))
+            iterations += 1
+            if state.objective() < best.objective():
+                best = state.copy()
+
+        obj = best.objective()[0]
+        routes = [best.route(courier) for courier in range(new_instance.num_courier)]
+        return {
+            "obj": obj,
+            "sol": [(route + 1).tolist() for route in routes],
+            "bin": (best.courier_of + 1).tolist(),
+            "optimal": obj <= lower_bound(new_instance),
+            "time": time.perf_counter() - start,
+            "iterations": iterations,
+            "replanned": (np.flatnonzero(free) + 1).tolist(),
+            "instance": new_instance,
+            "item_map": (item_map + 1).tolist(),
+            "courier_map": (courier_map + 1).tolist()
+        }
+
+    def replan_minizinc(self, instance, previous_sol, delta, model_path, time_limit=None):
+        """
+        Re-plan with a MiniZinc model that accepts warm starts: the bins of the couriers outside the
+        neighbourhood are pinned and the repaired plan is the warm start and the upper bound.
+        :param model_path: the model file name inside the models directory
+        :return: the result dictionary of solution_to_dict, for the new instance
+        """
+        solver, _ = get_solver_name(model_path.split('-')[-1])
+        manager = MiniZinc_Mangager(solver=solver, solver_name=model_path,
+                                    time_limit=time_limit if time_limit is not None else self.time_limit)
+        if not supports_warm_start(f"{manager.model_parent_directory}/{model_path}"):
+            raise ValueError(f"{model_path} has no bin variables to pin")
+        new_instance, state, free, _, _ = self.prepare(instance, previous_sol, delta)
+        warm_solution = None
+        fixed_bin = [0] * new_instance.num_item
+        if state is not None:
+            routes = [state.route(courier) for courier in range(new_instance.num_courier)]
+            warm_solution = {
+                "obj": max(route_length(route, new_instance.distance_mat, new_instance.depot) for route in routes),
+                "sol": [(route + 1).tolist() for route in routes],
+                "bin": (state.courier_of + 1).tolist()
+            }
+            fixed_bin = [int(courier) + 1 if not free[courier] else 0 for courier in state.courier_of]
+        # Symmetry breaking could exclude every completion of the pinned bins
+        model_instance = manager.create_model(path_to_model=model_path, mcp_instance=new_instance,
+                                              warm_solution=warm_solution, break_symmetry=False)
+        manager.add_code(PIN_CONSTRAINT, fixed_bin=fixed_bin)
+        manager.solve_instance(model_instance=model_instance)
+        return manager.solution_to_dict()
+
+
+def best_known_solution(inst_num, results_path="Results/mzn"):
+    """
+    :return: the record with the lowest objective among the saved results of an instance, or None
+    """
+    store = Results_Store()
+    store.import_json(results_path)
+    records = store.latest(results_path, inst_num).get(inst_num, {}).values()
+    solved = [record for record in records if isinstance(record.get("obj"), int) and record.get("sol")]
+    return min(solved, key=lambda record: record["obj"], default=None)
+
+
+if __name__ == "__main__":
+    # python reoptimization.py <instance> <delta.json> [time limit]: re-plan the best saved solution of an instance
+    inst_num = int(sys.argv[1])
+    with open(sys.argv[2], 'r') as json_file:
+        delta = Plan_Delta.from_dict(json.load(json_file))
+    time_limit = float(sys.argv[3]) if len(sys.argv) > 3 else REPLAN_TIME
+    previous = best_known_solution(inst_num)
+    if previous is None:
+        sys.exit(f"No saved solution of instance {inst_num} to re-plan")
+    replanned = Reoptimizer(time_limit=time_limit).replan(load_instance_number(inst_num), previous["sol"], delta)
+    if replanned is None:
+        sys.exit("No plan found for the changed instance")
+    print(f"Previous objective {previous['obj']}, re-planned {replanned['obj']} in {replanned['time']:.2f}s "
+          f"({replanned['iterations']} iterations); couriers {replanned['replanned']} could change")
+    print(json.dumps(replanned["sol"]))
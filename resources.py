@@ -0,0 +1,132 @@
+#### This script decides how many solver threads and seed-diversified copies a job gets within a core budget
+import os
+import sys
+import asyncio
+
+from Main_MZN import MiniZinc_Mangager, TIMELIMIT, get_solver_name, parse_instance_numbers
+from minizinc_session import get_session
+from model_registry import model_metadata
+from instance_loader import load_instance_number
+from memory_monitor import Memory_Monitor, load_predictor, default_memory_cap, default_memory_budget
+from portfolio import race
+
+CORE_BUDGET = os.cpu_count() or 1 # Cores all the solves of this machine may use together
+MULTI_THREADED = ("cp-sat",) # Solvers whose search gains from more threads; the others get seed copies
+MAX_SEEDS = 8 # Most seed-diversified copies of one job
+BASE_SEED = 0 # Copies use BASE_SEED, BASE_SEED+1, ...
+
+
+def solver_flags(solver):
+    """
+    :param solver: a solver tag such as 'gecode'
+    :return: the standard flags the solver accepts, e.g. '-p' for threads and '-r' for a random seed
+    """
+    return set(getattr(get_session().lookup(solver), "stdFlags", None) or [])
+
+
+def randomised_search(path_to_model):
+    """
+    :param path_to_model: path to the .mzn file
+    :return: whether the model declares '@search: randomised', i.e. its runs differ with the random seed
+    """
+    return model_metadata(path_to_model).get("search") == "randomised"
+
+
+class Resource_Planner:
+    def __init__(self, cores=None, max_seeds=MAX_SEEDS, base_seed=BASE_SEED, model_path="Solvers/projectmodels"):
+        """
+        :param cores: the core budget; default is CORE_BUDGET
+        :param max_seeds: the most copies of one job with different seeds
+        :param base_seed: the seed of the first copy
+        :param model_path: the path to the models parent directory, where their metadata is read
+        """
+        self.cores = max(1, int(cores)) if cores is not None else CORE_BUDGET
+        self.max_seeds = max_seeds
+        self.base_seed = base_seed
+        self.model_parent_directory = model_path
+
+    def plan(self, model_path, cores=None, copy_memory=None, memory=None):
+        """
+        Multi-threaded solvers get every core in one run. Models declaring '@search: randomised' run
+        one single-threaded copy per core with different seeds on the other solvers; copies of the
+        other models would all search the same way, so they run once.
+        :param model_path: the model file name; its solver comes from the name
+        :param cores: the cores for this job; default is the whole budget
+        :param copy_memory: predicted peak MB of one copy
+        :param memory: MB all the copies may use together; with copy_memory it limits the number of copies
+        :return: (threads per copy or None for the solver default, list of seeds; [None] is one unseeded copy)
+        """
+        cores = max(1, int(cores)) if cores is not None else self.cores
+        solver, _ = get_solver_name(model_path.split('-')[-1])
+        flags = solver_flags(solver)
+        if solver in MULTI_THREADED and "-p" in flags:
+            return cores, [None]
+        copies = min(cores, self.max_seeds)
+        if copy_memory and memory is not None:
+            copies = min(copies, int(memory // copy_memory))
+        if "-r" in flags and copies > 1 and randomised_search(f"{self.model_parent_directory}/{model_path}"):
+            return None, list(range(self.base_seed, self.base_seed + copies))
+        return None, [None]
+
+    def batch_threads(self, model_path, workers):
+        """
+        Threads for one job of a batch that runs workers jobs at once; together they stay within the budget.
+        """
+        threads, _ = self.plan(model_path, cores=max(1, self.cores // max(1, workers)))
+        return threads
+
+
+def solve_job_seeded(inst_num, model_path, cores=None, solver_name=None, stall_timeout=None, memory_cap=None,
+                     results_path="Results/mzn"):
+    """
+    Solve one instance on all the cores it is given: one multi-threaded run, or seed copies raced
+    against each other. The first copy to prove optimality wins, otherwise the best incumbent.
+    No more copies run than fit in the memory cap, or in the available memory without one,
+    by the peak predicted from the measured history of the model.
+    :param cores: the cores for this job; default is the whole budget
+    :param solver_name: the key of the result record; default is the model file name
+    :param memory_cap: MB all the copies may use together; default is MCP_MEMORY_CAP, or no cap
+    :param results_path: the results whose measured peaks predict the memory of a copy
+    :return: the result dictionary ready for save_to_JSON, and the seed of the winning copy
+    """
+    memory_cap = memory_cap if memory_cap is not None else default_memory_cap()
+
+    def instance_size(number):
+        instance = load_instance_number(number)
+        return instance.num_courier, instance.num_item
+    copy_memory = load_predictor(results_path, instance_size).predict(model_path, *instance_size(inst_num))
+    threads, seeds = Resource_Planner(cores).plan(model_path, copy_memory=copy_memory,
+                                                  memory=memory_cap if memory_cap is not None
+                                                  else default_memory_budget())
+    members = {f"seed {seed}" if seed is not None else model_path: (model_path, seed, threads) for seed in seeds}
+    print(f"{len(seeds)} {'copy' if len(seeds) == 1 else 'copies'} of {model_path}"
+          + (f" with {threads} threads" if threads else ""))
+    with Memory_Monitor(memory_cap) as monitor:
+        try:
+            race_result = asyncio.run(race(inst_num, members, stall_timeout=stall_timeout))
+        except Exception:
+            if not monitor.exceeded:
+                raise
+            race_result = {"result": None}
+    if race_result["result"] is None:
+        record = {"time": TIMELIMIT, "optimal": False, "obj": "N/A", "sol": []}
+        seed = None
+    else:
+        record = race_result["result"][model_path]
+        seed = members[race_result["winner"]][1]
+    record["peak_rss_mb"] = monitor.peak_mb
+    if monitor.exceeded:
+        record["memory_cap_exceeded"] = True
+    return {solver_name or model_path: record}, seed
+
+
+if __name__ == "__main__":
+    # python resources.py <instances> <model number> [cores]: solve each instance on the whole core budget
+    instance_numbers = parse_instance_numbers(sys.argv[1])
+    model_path = MiniZinc_Mangager().get_model_path(sys.argv[2])
+    cores = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    saver = MiniZinc_Mangager()
+    for inst_num in instance_numbers:
+        sol_dict, seed = solve_job_seeded(inst_num, model_path, cores=cores)
+        print(f"Instance {inst_num}: {sol_dict[model_path]['obj']}" + (f" (seed {seed})" if seed is not None else ""))
+        saver.save_to_JSON(sol_dict, filename=inst_num, parent_path="Results/mzn", keep_prev=True, seed=seed)
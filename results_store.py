@@ -0,0 +1,186 @@
+#### This script keeps every result in one SQLite database and exports the per-instance JSON files from it
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import sqlite3
+
+DB_PATH = "Results/results.db"
+JOURNAL_MODE_ENV = "MCP_JOURNAL_MODE" # When set, the default journal mode of the stores opened by this process
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    results_path TEXT NOT NULL,
+    instance INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    solver TEXT,
+    seed INTEGER,
+    run_id TEXT NOT NULL,
+    time INTEGER,
+    optimal INTEGER,
+    obj INTEGER,
+    record TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_instance ON results (results_path, instance, model);
+CREATE INDEX IF NOT EXISTS results_by_solver ON results (solver, seed);
+CREATE INDEX IF NOT EXISTS results_by_run ON results (run_id);
+"""
+
+
+class Results_Store:
+    def __init__(self, db_path=DB_PATH, run_id=None, journal_mode=None):
+        """
+        :param db_path: the SQLite database shared by all processes
+        :param run_id: tags every row saved through this store; a new id is generated by default
+        :param journal_mode: SQLite journal mode; default is MCP_JOURNAL_MODE, or WAL. Use DELETE when
+                             the database is on a shared or network filesystem, where WAL does not work
+        """
+        self.db_path = db_path
+        self.run_id = run_id or uuid.uuid4().hex
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.journal_mode = (journal_mode or os.environ.get(JOURNAL_MODE_ENV) or "WAL").upper()
+        # WAL lets readers run next to the single writer; the timeout makes writers queue instead of failing
+        self.connection = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        self.connection.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        if self.journal_mode == "WAL":
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def save(self, result, inst_num, results_path, keep_prev=True, solvers=None, seed=None, export=True):
+        """
+        Append the records of one instance and rewrite its JSON file, in a single write transaction,
+        so concurrent workers neither lose updates nor export a stale file.
+        :param result: dictionary of model name -> record, as built by solution_to_dict
+        :param inst_num: the instance number (the JSON file name)
+        :param results_path: the directory of the exported JSON files; rows are grouped by it
+        :param keep_prev: export the latest record of every model, not only the ones in result
+        :param solvers: optional dictionary of model name -> solver id
+        :param seed: the random seed of the run, if any
+        :param export: also write results_path/<inst_num>.json
+        """
+        results_path = os.path.normpath(results_path)
+        inst_num = int(inst_num)
+        solvers = solvers or {}
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            if keep_prev:
+                self._import_file(results_path, inst_num)
+            for model, record in result.items():
+                self._insert(results_path, inst_num, model, record, solvers.get(model), seed, self.run_id)
+            if export:
+                self.export_instance(results_path, inst_num, models=None if keep_prev else list(result))
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def _insert(self, results_path, inst_num, model, record, solver, seed, run_id):
+        obj = record.get("obj") if isinstance(record, dict) else None
+        self.connection.execute(
+            "INSERT INTO results (results_path, instance, model, solver, seed, run_id, time, optimal, obj, record, created)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (results_path, inst_num, model, solver, seed, run_id,
+             record.get("time") if isinstance(record, dict) else None,
+             int(record["optimal"]) if isinstance(record, dict) and "optimal" in record else None,
+             obj if isinstance(obj, int) else None,
+             json.dumps(record), time.time()))
+
+    def _import_file(self, results_path, inst_num):
+        """
+        Load a JSON file written before the store existed, once, so exporting does not drop its records.
+        """
+        known = self.connection.execute("SELECT 1 FROM results WHERE results_path = ? AND instance = ? LIMIT 1",
+                                        (results_path, inst_num)).fetchone()
+        path_to_file = os.path.join(results_path, f"{inst_num}.json")
+        if known is not None or not os.path.exists(path_to_file):
+            return
+        with open(path_to_file, 'r') as json_file:
+            existing_data = json.load(json_file)
+        if isinstance(existing_data, dict):
+            for model, record in existing_data.items():
+                self._insert(results_path, inst_num, model, record, None, None, "imported")
+
+    def import_json(self, results_path):
+        """
+        Import every <instance>.json of a directory that the store does not know yet.
+        """
+        results_path = os.path.normpath(results_path)
+        if not os.path.isdir(results_path):
+            return
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            for file_name in os.listdir(results_path):
+                match = re.fullmatch(r'(\d+)\.json', file_name)
+                if match is not None:
+                    self._import_file(results_path, int(match.group(1)))
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def latest(self, results_path, inst_num=None, models=None):
+        """
+        The newest record of every (instance, model), in the order the models were first saved.
+        :return: dictionary of instance number -> {model name: record}
+        """
+        query = ("SELECT instance, model, record FROM results AS r"
+                 " JOIN (SELECT MAX(id) AS last, MIN(id) AS first FROM results WHERE results_path = ?"
+                 + (" AND instance = ?" if inst_num is not None else "") +
+                 " GROUP BY instance, model) AS g ON r.id = g.last ORDER BY instance, g.first")
+        parameters = [os.path.normpath(results_path)] + ([int(inst_num)] if inst_num is not None else [])
+        latest = {}
+        for instance, model, record in self.connection.execute(query, parameters):
+            if models is None or model in models:
+                latest.setdefault(instance, {})[model] = json.loads(record)
+        return latest
+
+    def query(self, instance=None, model=None, solver=None, seed=None, run_id=None, results_path=None):
+        """
+        Every saved row matching the given fields, oldest first.
+        :return: list of dictionaries with the indexed fields and the record
+        """
+        filters = {"instance": instance, "model": model, "solver": solver, "seed": seed, "run_id": run_id,
+                   "results_path": os.path.normpath(results_path) if results_path is not None else None}
+        conditions = [f"{name} = ?" for name, value in filters.items() if value is not None]
+        rows = self.connection.execute(
+            "SELECT results_path, instance, model, solver, seed, run_id, created, record FROM results"
+            + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY id",
+            [value for value in filters.values() if value is not None])
+        return [{"results_path": row[0], "instance": row[1], "model": row[2], "solver": row[3], "seed": row[4],
+                 "run_id": row[5], "created": row[6], "record": json.loads(row[7])} for row in rows]
+
+    def export_instance(self, results_path, inst_num, models=None):
+        """
+        Write results_path/<inst_num>.json from the store, atomically.
+        :param models: only export these models (used when previous records are not kept)
+        """
+        records = self.latest(results_path, inst_num, models=models).get(int(inst_num), {})
+        if not os.path.exists(results_path):
+            os.makedirs(results_path, exist_ok=True)
+        path_to_file = os.path.join(results_path, f"{inst_num}.json")
+        temporary = f"{path_to_file}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as json_file:
+            json.dump(records, json_file, indent=4)
+        os.replace(temporary, path_to_file)
+
+    def export_all(self, results_path):
+        for inst_num in self.latest(results_path):
+            self.export_instance(results_path, inst_num)
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    # python results_store.py [results path]: import its JSON files and rewrite them from the store
+    results_path = sys.argv[1] if len(sys.argv) > 1 else "Results/mzn"
+    store = Results_Store()
+    store.import_json(results_path)
+    store.export_all(results_path)
+    print(f"{len(store.query(results_path=results_path))} records of {results_path} in {store.db_path}")
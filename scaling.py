@@ -0,0 +1,174 @@
+#### This script measures time and peak memory against instance size, for the Python stages and every model family
+import os
+import json
+import time
+import argparse
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Main_MZN import MiniZinc_Mangager
+from batch_runner import _run_job
+from instance_loader import MCP_Instance, load_instance, read_instance
+from instance_generator import GENERATED_PATH, STRUCTURES, generate_suite
+from preprocessing import analyse
+from bounds import assignment_bound, tree_bound, min_couriers
+from warm_start import construct
+from decomposition import Decomposition_Engine
+from solution_verifier import verify_instance
+
+SCALING_PATH = "Results/scaling"
+MODEL_TIME_LIMIT = 60 # Seconds per model run in a scaling study
+
+
+def fresh_copy(instance):
+    """
+    A new MCP_Instance with the same data, so the per-instance caches do not hide any work.
+    """
+    return MCP_Instance(instance.courier_capacity, instance.item_size, instance.distance_mat)
+
+
+def python_stages(decomposition_time=10):
+    """
+    :return: dictionary of stage name -> function of (instance, paths) that runs that stage once
+    """
+    return {
+        "load_dzn": lambda instance, paths: read_instance(paths["dzn"]),
+        "load_binary": lambda instance, paths: read_instance(paths["mcpb"]),
+        "dzn_handoff": lambda instance, paths: instance.to_dzn(os.devnull),
+        "preprocessing": lambda instance, paths: analyse(fresh_copy(instance)),
+        "bounds": lambda instance, paths: max(assignment_bound(instance, min_couriers(instance)),
+                                              tree_bound(fresh_copy(instance), min_couriers(instance))),
+        "construct": lambda instance, paths: construct(instance),
+        "decomposition": lambda instance, paths: Decomposition_Engine(workers=1, time_limit=decomposition_time)
+                                                 .solve(fresh_copy(instance)),
+        "verify": lambda instance, paths: verify_instance(fresh_copy(instance), {"split": split_solution(instance)})
+    }
+
+
+def split_solution(instance):
+    """
+    Items dealt out to the couriers in order; enough to give the verifier the full amount of work.
+    """
+    routes = [(items + 1).tolist() for items in np.array_split(np.arange(instance.num_item), instance.num_courier)]
+    tours = [np.concatenate(([instance.depot], np.asarray(route, dtype=np.int64) - 1, [instance.depot]))
+             for route in routes]
+    return {"obj": int(max(instance.distance_mat[tour[:-1], tour[1:]].sum() for tour in tours)), "sol": routes}
+
+
+def measure(stage, *args):
+    """
+    :return: (seconds, peak MB of Python allocations, NumPy arrays included)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        stage(*args)
+    finally:
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak / 2**20
+
+
+def _measured_job(inst_num, model_path, time_limit, instanse_path, results_path):
+    """
+    One model run in a fresh worker process.
+    :return: the result record, the elapsed wall time and the peak memory of the solver processes in MB
+    """
+    sol_dict, _, elapsed = _run_job(inst_num, model_path, time_limit=time_limit, instanse_path=instanse_path,
+                                    instrumentation_path=os.path.join(results_path, "instrumentation"))
+    return sol_dict[model_path], elapsed, sol_dict[model_path]["peak_rss_mb"]
+
+
+def family_models(model_path="Solvers/projectmodels"):
+    """
+    :return: dictionary of approach name -> its first model file, one run per family is enough for a curve
+    """
+    families = {}
+    for model in MiniZinc_Mangager(model_path=model_path).list_of_paths_of_models:
+        families.setdefault(model.split('. ', 1)[-1].split(' - Final Model - ')[0], model)
+    return families
+
+
+class Scaling_Study:
+    def __init__(self, sizes, num_courier=20, tightness=0.8, structure="metric", seed=0,
+                 max_model_items=300, model_time_limit=MODEL_TIME_LIMIT, parent_path=GENERATED_PATH):
+        """
+        :param sizes: the numbers of items, one generated instance each
+        :param max_model_items: the MiniZinc models are only run up to this many items
+        :param model_time_limit: seconds each model run may take
+        :param parent_path: where the generated instances are written
+        """
+        self.sizes = sorted(sizes)
+        self.suite = generate_suite(self.sizes, num_courier, tightness, structure, seed, parent_path)
+        self.max_model_items = max_model_items
+        self.model_time_limit = model_time_limit
+        self.instanse_path = os.path.join(parent_path, "dzn")
+
+    def run_python(self, stages=None):
+        """
+        :return: dictionary of stage -> list of [items, seconds, peak MB]
+        """
+        stages = stages if stages is not None else python_stages()
+        curves = {name: [] for name in stages}
+        for num_item, paths in self.suite:
+            instance = load_instance(paths["mcpb"])
+            for name, stage in stages.items():
+                seconds, peak = measure(stage, instance, paths)
+                curves[name].append([num_item, round(seconds, 4), round(peak, 2)])
+                print(f"{name:<14} n={num_item:<6} {seconds:9.3f}s {peak:9.1f}MB")
+        return curves
+
+    def run_models(self, results_path=os.path.join(SCALING_PATH, "mzn")):
+        """
+        :return: dictionary of model family -> list of [items, seconds, solver peak MB, objective]
+        """
+        listing = sorted(f for f in os.listdir(self.instanse_path) if not f.startswith('.'))
+        curves = {}
+        for family, model_path in family_models().items():
+            curves[family] = []
+            for num_item, paths in self.suite:
+                if num_item > self.max_model_items:
+                    continue
+                inst_num = listing.index(os.path.basename(paths["dzn"])) + 1
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    try:
+                        record, elapsed, peak = executor.submit(_measured_job, inst_num, model_path,
+                                                                self.model_time_limit, self.instanse_path,
+                                                                results_path).result()
+                    except Exception as error:
+                        print(f"{family} n={num_item} failed: {error}")
+                        continue
+                curves[family].append([num_item, round(elapsed, 3), round(peak, 1), record["obj"]])
+                print(f"{family:<36} n={num_item:<6} {elapsed:8.1f}s {peak:9.1f}MB obj={record['obj']}")
+        return curves
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling curves on generated instances")
+    parser.add_argument("sizes", type=int, nargs="+", help="numbers of items")
+    parser.add_argument("--couriers", type=int, default=20)
+    parser.add_argument("--tightness", type=float, default=0.8)
+    parser.add_argument("--structure", choices=STRUCTURES, default="metric")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--models", action="store_true", help="also run one model of every family")
+    parser.add_argument("--max-model-items", type=int, default=300)
+    parser.add_argument("--model-time-limit", type=float, default=MODEL_TIME_LIMIT)
+    parser.add_argument("--output", default=os.path.join(SCALING_PATH, "curves.json"))
+    args = parser.parse_args()
+
+    study = Scaling_Study(args.sizes, args.couriers, args.tightness, args.structure, args.seed,
+                          args.max_model_items, args.model_time_limit)
+    curves = {"arguments": vars(args), "python": study.run_python()}
+    if args.models:
+        curves["models"] = study.run_models()
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as json_file:
+        json.dump(curves, json_file, indent=4)
+    print(f"Saved the curves to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#### This script checks every result file against its instance: coverage, capacities and objective
+import os
+import re
+import sys
+import json
+import time
+
+import numpy as np
+
+from instance_loader import load_instance_number
+from bounds import lower_bound
+
+
+def verify_instance(instance, entries):
+    """
+    Check all result entries of one instance at once.
+    :param instance: the MCP_Instance
+    :param entries: dictionary of model name -> result record ('obj', 'sol', ...)
+    :return: list of (model name, kind, detail) violations
+    """
+    violations = []
+    names = []
+    lb = lower_bound(instance)
+    for name, entry in entries.items():
+        if isinstance(entry.get("obj"), int) and entry["obj"] < lb:
+            violations.append((name, "objective", f"obj {entry['obj']} below the lower bound {lb}"))
+        if not entry.get("sol"):
+            if entry.get("obj") not in ("N/A", None):
+                violations.append((name, "objective", f"obj {entry['obj']} reported without a solution"))
+        elif len(entry["sol"]) != instance.num_courier:
+            violations.append((name, "couriers", f"{len(entry['sol'])} routes for {instance.num_courier} couriers"))
+        else:
+            names.append(name)
+    if not names:
+        return violations
+
+    depot = instance.depot
+    routes = [route for name in names for route in entries[name]["sol"]]
+    width = max(len(route) for route in routes) + 2
+    # One row per route: depot, items (0-based), then depot padding; depot->depot costs nothing
+    tours = np.full((len(routes), width), depot, dtype=np.int64)
+    for row, route in enumerate(routes):
+        tours[row, 1:len(route)+1] = np.asarray(route, dtype=np.int64) - 1
+
+    out_of_range = (tours < 0) | (tours > depot)
+    bad_rows = out_of_range.any(axis=1)
+    tours[out_of_range] = depot
+
+    lengths = instance.distance_mat[tours[:, :-1], tours[:, 1:]].sum(axis=1)
+    sizes = np.append(instance.item_size, 0)
+    loads = sizes[tours].sum(axis=1)
+    capacities = np.tile(instance.courier_capacity, len(names))
+
+    entry_of_route = np.repeat(np.arange(len(names)), instance.num_courier)
+    visits = np.bincount((entry_of_route[:, None] * (depot + 1) + tours).ravel(),
+                         minlength=len(names) * (depot + 1)).reshape(len(names), depot + 1)[:, :depot]
+    max_lengths = np.maximum.reduceat(lengths, np.arange(0, len(routes), instance.num_courier))
+
+    for index, name in enumerate(names):
+        rows = slice(index * instance.num_courier, (index + 1) * instance.num_courier)
+        if bad_rows[rows].any():
+            violations.append((name, "items", "item index outside 1..num_item"))
+        missing = np.flatnonzero(visits[index] == 0) + 1
+        repeated = np.flatnonzero(visits[index] > 1) + 1
+        if len(missing):
+            violations.append((name, "coverage", f"items never delivered: {missing.tolist()}"))
+        if len(repeated):
+            violations.append((name, "coverage", f"items delivered more than once: {repeated.tolist()}"))
+        overloaded = np.flatnonzero(loads[rows] > capacities[rows])
+        for courier in overloaded:
+            violations.append((name, "capacity", f"courier {courier + 1} carries {loads[rows][courier]} "
+                                                 f"> {capacities[rows][courier]}"))
+        if entries[name].get("obj") != int(max_lengths[index]):
+            violations.append((name, "objective", f"reported {entries[name].get('obj')}, "
+                                                  f"routes give {int(max_lengths[index])}"))
+    return violations
+
+
+def verify_results(results_path="Results/mzn", instanse_path="Instances/Instances dzn Format/"):
+    """
+    Verify every <instance>.json file of a results directory.
+    :return: dictionary with the number of checked entries, the violations and the elapsed time
+    """
+    start = time.perf_counter()
+    report = {"checked": 0, "violations": []}
+    for file_name in sorted(os.listdir(results_path)):
+        match = re.fullmatch(r'(\d+)\.json', file_name)
+        if match is None:
+            continue
+        inst_num = int(match.group(1))
+        with open(os.path.join(results_path, file_name), 'r') as json_file:
+            entries = json.load(json_file)
+        instance = load_instance_number(inst_num, instanse_path)
+        report["checked"] += len(entries)
+        for name, kind, detail in verify_instance(instance, entries):
+            report["violations"].append({"instance": inst_num, "model": name, "kind": kind, "detail": detail})
+    report["elapsed"] = time.perf_counter() - start
+    return report
+
+
+if __name__ == "__main__":
+    results_path = sys.argv[1] if len(sys.argv) > 1 else "Results/mzn"
+    report = verify_results(results_path)
+    for violation in report["violations"]:
+        print(f"Instance {violation['instance']:>2} | {violation['model']} | {violation['kind']}: {violation['detail']}")
+    print(f"\nChecked {report['checked']} entries in {report['elapsed']*1000:.1f} ms, "
+          f"{len(report['violations'])} violations")
+    sys.exit(1 if report["violations"] else 0)
@@ -0,0 +1,301 @@
+#### This script serves solve requests over a local HTTP API, keeping solvers and parsed models warm between requests
+import sys
+import json
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from Main_MZN import MiniZinc_Mangager, TIMELIMIT, get_solver_name
+from instance_loader import MCP_Instance
+
+HOST = "127.0.0.1"
+PORT = 8080
+CONCURRENCY = 2 # Solves running at the same time
+MAX_QUEUE = 100 # Requests waiting for a free slot; more are refused with 503
+DEFAULT_MODEL = "12" # Model number used when a request names none
+SETUP_SHARE = 0.1 # Share of a request's deadline kept for building the model and answering
+KEEP_FINISHED = 1000 # Finished jobs kept for status queries
+FINAL_STATES = ("done", "failed", "cancelled", "expired")
+STATUS_TEXT = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               503: "Service Unavailable"}
+
+
+class Solve_Request:
+    def __init__(self, instance, model_path, deadline, inst_num=None, random_seed=None):
+        """
+        :param instance: the MCP_Instance to solve, or None for an instance file
+        :param model_path: the model file name inside the models directory
+        :param deadline: seconds after submission by which the answer is due
+        :param inst_num: the instance number when no instance data was sent
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.instance = instance
+        self.inst_num = inst_num
+        self.model_path = model_path
+        self.random_seed = random_seed
+        self.submitted = time.monotonic()
+        self.deadline = self.submitted + deadline
+        self.state = "queued"
+        self.events = []
+        self.changed = asyncio.Event()
+        self.task = None
+        self.result = None
+
+    def publish(self, event):
+        """
+        Record an event and wake every stream waiting for one.
+        """
+        event["job"] = self.id
+        self.events.append(event)
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def set_state(self, state, **details):
+        self.state = state
+        self.publish({"type": "state", "state": state, **details})
+
+    def summary(self):
+        incumbents = [event for event in self.events if event["type"] == "solution"]
+        return {
+            "job": self.id,
+            "state": self.state,
+            "model": self.model_path,
+            "incumbent": incumbents[-1] if incumbents else None,
+            "result": self.result
+        }
+
+    async def stream(self):
+        """
+        Every event so far, then the new ones as they come, until the job has finished.
+        """
+        sent = 0
+        while True:
+            changed = self.changed
+            while sent < len(self.events):
+                yield self.events[sent]
+                sent += 1
+            if self.state in FINAL_STATES:
+                return
+            await changed.wait()
+
+
+class Solve_Service:
+    def __init__(self, host=HOST, port=PORT, concurrency=CONCURRENCY, max_queue=MAX_QUEUE):
+        """
+        :param concurrency: the number of solves running at the same time
+        :param max_queue: the number of requests that may wait for a slot
+        """
+        self.host = host
+        self.port = port
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.jobs = OrderedDict()
+        self.queue = None
+        # Models are built one at a time off the event loop; the session's caches are not shared between threads
+        self.builder = ThreadPoolExecutor(max_workers=1)
+        self.manager = MiniZinc_Mangager()
+
+    def warm_up(self):
+        """
+        Look up every solver and parse every model once, so the first requests do not pay for it.
+        """
+        session = self.manager.session
+        for model_path in self.manager.list_of_paths_of_models:
+            solver, _ = get_solver_name(model_path.split('-')[-1])
+            try:
+                session.base_instance(solver, f"{self.manager.model_parent_directory}/{model_path}")
+            except Exception as error:
+                print(f"{model_path} is not available: {error}")
+
+    def model_path(self, model):
+        """
+        :param model: a model number such as '12', or a model file name
+        :return: the model file name, or None if there is no such model
+        """
+        if model in self.manager.list_of_paths_of_models:
+            return model
+        return self.manager.get_model_path(str(model).zfill(2))
+
+    def submit(self, body):
+        """
+        :param body: the decoded JSON request
+        :return: the queued Solve_Request
+        :raise ValueError: on a malformed request
+        :raise OverflowError: when the queue is full
+        """
+        model_path = self.model_path(body.get("model", DEFAULT_MODEL))
+        if model_path is None:
+            raise ValueError(f"unknown model {body.get('model')!r}")
+        deadline = float(body.get("deadline", TIMELIMIT))
+        if deadline <= 0:
+            raise ValueError("deadline must be positive")
+        if "instance" in body:
+            data = body["instance"]
+            instance = MCP_Instance(data["courier_capacity"], data["item_size"], data["distance_mat"])
+            request = Solve_Request(instance, model_path, deadline, random_seed=body.get("seed"))
+        elif "instance_number" in body:
+            request = Solve_Request(None, model_path, deadline, inst_num=int(body["instance_number"]),
+                                    random_seed=body.get("seed"))
+        else:
+            raise ValueError("send 'instance' data or an 'instance_number'")
+        if self.queue.qsize() >= self.max_queue:
+            raise OverflowError("the queue is full")
+        self.jobs[request.id] = request
+        while len(self.jobs) > KEEP_FINISHED and next(iter(self.jobs.values())).state in FINAL_STATES:
+            self.jobs.popitem(last=False)
+        request.set_state("queued", position=self.queue.qsize())
+        self.queue.put_nowait(request)
+        return request
+
+    def cancel(self, request):
+        """
+        Cancel a queued or running request; a running solve's MiniZinc process is terminated.
+        """
+        if request.state == "queued":
+            request.set_state("cancelled")
+        elif request.state == "running" and request.task is not None:
+            request.task.cancel()
+
+    async def worker(self):
+        while True:
+            request = await self.queue.get()
+            try:
+                if request.state != "queued":
+                    continue
+                remaining = request.deadline - time.monotonic()
+                time_limit = remaining * (1 - SETUP_SHARE)
+                if time_limit < 1:
+                    request.set_state("expired")
+                    continue
+                request.set_state("running", time_limit=time_limit)
+                request.task = asyncio.ensure_future(self.solve(request, time_limit))
+                try:
+                    # The solver's own time limit ends it first; this only guards against a hung process
+                    await asyncio.wait_for(asyncio.shield(request.task), remaining + 5)
+                except asyncio.TimeoutError:
+                    request.task.cancel()
+                    await asyncio.gather(request.task, return_exceptions=True)
+                    request.set_state("expired")
+                except asyncio.CancelledError:
+                    if not request.task.cancelled():
+                        raise
+                    request.set_state("cancelled")
+                except Exception as error:
+                    request.set_state("failed", error=str(error))
+            finally:
+                self.queue.task_done()
+
+    async def solve(self, request, time_limit):
+        solver, _ = get_solver_name(request.model_path.split('-')[-1])
+        manager = MiniZinc_Mangager(solver=solver, solver_name=request.model_path, time_limit=time_limit)
+        loop = asyncio.get_running_loop()
+        model_instance = await loop.run_in_executor(
+            self.builder, lambda: manager.create_model(path_to_model=request.model_path,
+                                                       data_instance_num=request.inst_num or 0,
+                                                       mcp_instance=request.instance))
+
+        def on_solution(step):
+            request.publish({"type": "solution", "time": step["time"], "obj": step["obj"], "sol": step["sol"]})
+        await manager.solve_instance_async(model_instance=model_instance, random_seed=request.random_seed,
+                                           on_solution=on_solution)
+        request.result = manager.solution_to_dict()[request.model_path]
+        request.set_state("done", result=request.result)
+
+    async def handle(self, reader, writer):
+        """
+        One HTTP/1.1 request per connection:
+        POST /solve (add ?stream=1 to stream the events), GET /jobs/<id>, GET /jobs/<id>/events,
+        DELETE /jobs/<id>, GET /health.
+        """
+        try:
+            request_line = (await reader.readline()).decode().split()
+            if len(request_line) < 2:
+                return
+            method, target = request_line[0], urlsplit(request_line[1])
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            parts = [part for part in target.path.split('/') if part]
+            query = parse_qs(target.query)
+
+            if method == "GET" and parts == ["health"]:
+                await self.respond(writer, 200, {"queued": self.queue.qsize(), "concurrency": self.concurrency,
+                                                 "jobs": len(self.jobs)})
+            elif method == "POST" and parts == ["solve"]:
+                try:
+                    request = self.submit(json.loads(body or b"{}"))
+                except OverflowError as error:
+                    await self.respond(writer, 503, {"error": str(error)})
+                except (ValueError, KeyError, TypeError) as error:
+                    await self.respond(writer, 400, {"error": str(error)})
+                else:
+                    if query.get("stream", ["0"])[0] not in ("0", "false"):
+                        await self.stream(writer, request)
+                    else:
+                        await self.respond(writer, 202, request.summary())
+            elif len(parts) >= 2 and parts[0] == "jobs" and parts[1] in self.jobs:
+                request = self.jobs[parts[1]]
+                if method == "GET" and len(parts) == 2:
+                    await self.respond(writer, 200, request.summary())
+                elif method == "GET" and parts[2:] == ["events"]:
+                    await self.stream(writer, request)
+                elif method == "DELETE" and len(parts) == 2:
+                    self.cancel(request)
+                    await self.respond(writer, 202, request.summary())
+                else:
+                    await self.respond(writer, 405, {"error": "method not allowed"})
+            else:
+                await self.respond(writer, 404, {"error": "not found"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload):
+        body = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def stream(self, writer, request):
+        """
+        Send the job's events as newline-delimited JSON in a chunked response, as they happen.
+        """
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        async for event in request.stream():
+            line = json.dumps(event).encode() + b"\n"
+            writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def serve(self):
+        self.queue = asyncio.Queue()
+        workers = [asyncio.ensure_future(self.worker()) for _ in range(self.concurrency)]
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"Solve service listening on http://{self.host}:{self.port} with {self.concurrency} solve slots")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+
+
+if __name__ == "__main__":
+    # python solve_service.py [port] [concurrency]
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else CONCURRENCY
+    service = Solve_Service(port=port, concurrency=concurrency)
+    service.warm_up()
+    asyncio.run(service.serve())
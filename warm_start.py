@@ -0,0 +1,177 @@
+#### This script builds a fast heuristic solution used as upper bound and warm start for the models
+import numpy as np
+
+from model_registry import model_metadata
+
+
+def supports_warm_start(path_to_model):
+    """
+    :param path_to_model: path to the .mzn file
+    :return: whether the model declares '@warm_start: bin', i.e. accepts the warm_bin data parameter
+    """
+    return model_metadata(path_to_model).get("warm_start") == "bin"
+
+
+def route_length(route, distance_mat, depot):
+    """
+    :param route: 0-based item indices in visiting order
+    :return: length of depot -> route -> depot
+    """
+    if len(route) == 0:
+        return 0
+    tour = np.concatenate(([depot], route, [depot]))
+    return int(distance_mat[tour[:-1], tour[1:]].sum())
+
+
+def greedy_bin_packing(instance):
+    """
+    Capacity-aware greedy assignment aimed at the min-max objective: every item goes to the
+    courier whose route stays shortest after cheapest insertion, among couriers with room left.
+    Far items are placed first; if capacity runs out, biggest items first is tried, and
+    plain worst-fit decreasing as last resort.
+    :param instance: the MCP_Instance
+    :return: array of 0-based courier per item, or None if no packing was found
+    """
+    distance_mat, depot = instance.distance_mat, instance.depot
+    round_trip = distance_mat[depot, :-1] + distance_mat[:-1, depot]
+    orders = (np.argsort(-round_trip, kind="stable"), np.argsort(-instance.item_size, kind="stable"))
+
+    for order in orders:
+        remaining = instance.courier_capacity.copy()
+        assignment = np.full(instance.num_item, -1)
+        routes = [np.empty(0, dtype=np.int64) for _ in range(instance.num_courier)]
+        lengths = np.zeros(instance.num_courier, dtype=np.int64)
+        for item in order:
+            best_courier, best_length, best_slot = -1, None, 0
+            for courier in np.flatnonzero(remaining >= instance.item_size[item]):
+                tour = np.concatenate(([depot], routes[courier], [depot]))
+                insertion = (distance_mat[tour[:-1], item] + distance_mat[item, tour[1:]]
+                             - distance_mat[tour[:-1], tour[1:]])
+                slot = int(np.argmin(insertion))
+                new_length = lengths[courier] + insertion[slot]
+                if best_length is None or new_length < best_length:
+                    best_courier, best_length, best_slot = courier, new_length, slot
+            if best_courier < 0:
+                break
+            routes[best_courier] = np.insert(routes[best_courier], best_slot, item)
+            lengths[best_courier] = best_length
+            assignment[item] = best_courier
+            remaining[best_courier] -= instance.item_size[item]
+        else:
+            return assignment
+
+    remaining = instance.courier_capacity.copy()
+    assignment = np.full(instance.num_item, -1)
+    for item in orders[1]:
+        courier = int(np.argmax(remaining))
+        if remaining[courier] < instance.item_size[item]:
+            return None
+        assignment[item] = courier
+        remaining[courier] -= instance.item_size[item]
+    return assignment
+
+
+def nearest_neighbour_route(items, distance_mat, depot):
+    """
+    :param items: 0-based item indices served by one courier
+    :return: the items ordered by repeatedly visiting the closest unvisited one
+    """
+    unvisited = list(items)
+    route = []
+    current = depot
+    while unvisited:
+        closest = int(np.argmin(distance_mat[current, unvisited]))
+        current = unvisited.pop(closest)
+        route.append(current)
+    return np.array(route, dtype=np.int64)
+
+
+def two_opt(route, distance_mat, depot):
+    """
+    Reverse route segments while that shortens the tour. Works for asymmetric matrices:
+    the cost of a reversed segment is taken from prefix sums of the backward arcs.
+    :return: the improved route
+    """
+    route = np.asarray(route, dtype=np.int64)
+    if len(route) < 3:
+        return route
+    while True:
+        tour = np.concatenate(([depot], route, [depot]))
+        forward = np.concatenate(([0], np.cumsum(distance_mat[tour[:-1], tour[1:]])))
+        backward = np.concatenate(([0], np.cumsum(distance_mat[tour[1:], tour[:-1]])))
+        # Reverse tour[i..j] (1 <= i < j <= len(route)); a = tour[i-1], b = tour[j+1]
+        i, j = np.triu_indices(len(tour) - 1, k=1)
+        keep = i >= 1
+        i, j = i[keep], j[keep]
+        delta = (distance_mat[tour[i-1], tour[j]] + distance_mat[tour[i], tour[j+1]]
+                 - distance_mat[tour[i-1], tour[i]] - distance_mat[tour[j], tour[j+1]]
+                 + (backward[j] - backward[i]) - (forward[j] - forward[i]))
+        best = int(np.argmin(delta))
+        if delta[best] >= 0:
+            return route
+        route[i[best]-1:j[best]] = route[i[best]-1:j[best]][::-1]
+
+
+def rebalance(routes, instance, max_moves=200):
+    """
+    Move single items out of the longest route while that lowers the maximum route length.
+    :param routes: list of 0-based item arrays, one per courier
+    :return: the rebalanced routes
+    """
+    distance_mat, depot = instance.distance_mat, instance.depot
+    loads = np.array([instance.item_size[route].sum() for route in routes])
+    lengths = np.array([route_length(route, distance_mat, depot) for route in routes])
+    for _ in range(max_moves):
+        longest = int(np.argmax(lengths))
+        best_move, best_max = None, lengths[longest]
+        for position, item in enumerate(routes[longest]):
+            shorter = np.delete(routes[longest], position)
+            shorter_length = route_length(shorter, distance_mat, depot)
+            for courier in range(instance.num_courier):
+                if courier == longest or loads[courier] + instance.item_size[item] > instance.courier_capacity[courier]:
+                    continue
+                # Cheapest insertion position for the item in the receiving route
+                tour = np.concatenate(([depot], routes[courier], [depot]))
+                insertion = distance_mat[tour[:-1], item] + distance_mat[item, tour[1:]] - distance_mat[tour[:-1], tour[1:]]
+                slot = int(np.argmin(insertion))
+                new_length = lengths[courier] + int(insertion[slot])
+                others = np.delete(lengths, [longest, courier])
+                new_max = max(shorter_length, new_length, others.max() if len(others) else 0)
+                if new_max < best_max:
+                    best_move, best_max = (position, courier, slot, shorter, shorter_length, new_length), new_max
+        if best_move is None:
+            break
+        position, courier, slot, shorter, shorter_length, new_length = best_move
+        item = routes[longest][position]
+        routes[courier] = np.insert(routes[courier], slot, item)
+        routes[longest] = shorter
+        loads[courier] += instance.item_size[item]
+        loads[longest] -= instance.item_size[item]
+        lengths[courier], lengths[longest] = new_length, shorter_length
+    return routes
+
+
+def construct(instance):
+    """
+    Greedy packing, nearest-neighbour routing, 2-opt and rebalancing of the longest route.
+    :param instance: the MCP_Instance
+    :return: dictionary with 'obj', 'sol' (1-based routes) and 'bin' (1-based courier per item), or None
+    """
+    assignment = greedy_bin_packing(instance)
+    if assignment is None:
+        return None
+    distance_mat, depot = instance.distance_mat, instance.depot
+    routes = [two_opt(nearest_neighbour_route(np.flatnonzero(assignment == courier), distance_mat, depot),
+                      distance_mat, depot)
+              for courier in range(instance.num_courier)]
+    routes = rebalance(routes, instance)
+    routes = [two_opt(route, distance_mat, depot) for route in routes]
+
+    courier_of_item = np.empty(instance.num_item, dtype=np.int64)
+    for courier, route in enumerate(routes):
+        courier_of_item[route] = courier + 1
+    return {
+        "obj": max(route_length(route, distance_mat, depot) for route in routes),
+        "sol": [(route + 1).tolist() for route in routes],
+        "bin": courier_of_item.tolist()
+    }